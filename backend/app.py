@@ -1,148 +1,152 @@
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from database.db import init_app, test_connection, close_db, get_cursor
-from routes.auth import auth_bp
-from routes.users import users_bp
-from routes.stores import stores_bp
-from routes.products import products_bp
-from routes.categories import categories_bp
-from routes.wishlist import wishlist_bp
-from routes.orders import orders_bp 
-from routes.cart import cart_bp
-from routes.analytics import analytics_bp
-from routes.admin import admin_bp
-from utils.auth import hash_password
+from database.db import init_app, close_db
+from utils.uploads import send_upload, UploadRequest, UPLOADS_OFFLOAD
+import importlib
+import os
+import threading
 
+# (module, blueprint attribute, URL prefix); modules are imported by register_blueprints()
+BLUEPRINTS = [
+    ('routes.auth', 'auth_bp', '/api/auth'),
+    ('routes.users', 'users_bp', '/api/users'),
+    ('routes.stores', 'stores_bp', '/api/stores'),
+    ('routes.products', 'products_bp', '/api/products'),
+    ('routes.categories', 'categories_bp', '/api/categories'),
+    ('routes.wishlist', 'wishlist_bp', '/api/wishlist'),
+    ('routes.orders', 'orders_bp', '/api/orders'),
+    ('routes.cart', 'cart_bp', '/api/cart'),
+    ('routes.analytics', 'analytics_bp', '/api/analytics'),
+    ('routes.admin', 'admin_bp', '/api/admin'),
+]
 
-import os
+# 'eager' imports every blueprint in create_app(); 'lazy' defers them (and the heavy
+# modules they pull in) to the first request, so a worker is up before any route code loads
+STARTUP_MODE = os.getenv('STARTUP_MODE', 'eager').lower()
+
+def register_blueprints(app):
+    for module_name, attribute, url_prefix in BLUEPRINTS:
+        module = importlib.import_module(module_name)
+        app.register_blueprint(getattr(module, attribute), url_prefix=url_prefix)
+
+def start_background_workers():
+    """Start this process's sweeper threads.
+
+    Kept out of create_app(): threads do not survive a fork, so under a pre-fork
+    server they have to start in each worker, not in the parent that built the app.
+    """
+    if os.getenv('RESERVATION_SWEEPER', 'true').lower() == 'true':
+        from utils.reservations import start_reservation_sweeper
+        start_reservation_sweeper()
+
+    if os.getenv('STORAGE_GC', 'true').lower() == 'true':
+        from utils.storage import start_storage_gc
+        start_storage_gc()
+
+class DeferredStartup:
+    """WSGI middleware that finishes startup on the first request of each process.
+
+    Runs before Flask sees the request, so lazy blueprints can still be registered.
+    """
+
+    def __init__(self, app, lazy_blueprints):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.lazy_blueprints = lazy_blueprints
+        self.done = False
+        self.lock = threading.Lock()
 
-def create_app():
+    def finish(self):
+        with self.lock:
+            if self.done:
+                return
+            if self.lazy_blueprints:
+                register_blueprints(self.app)
+            from utils.categories import preload_categories
+            preload_categories()
+            start_background_workers()
+            self.done = True
+
+    def __call__(self, environ, start_response):
+        if not self.done:
+            self.finish()
+        return self.wsgi_app(environ, start_response)
+
+def create_app(startup_mode=None):
+    """Build the app without touching the database or starting threads"""
+    startup_mode = startup_mode or STARTUP_MODE
     app = Flask(__name__)
-    
+    app.request_class = UploadRequest
+
     # Configuration
     app.config['JWT_SECRET_KEY'] = 'your-secret-key-change-in-production'
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False  # or set a timedelta
-    
+    app.config['USE_X_SENDFILE'] = UPLOADS_OFFLOAD == 'x-sendfile'
+
     # Initialize extensions
     CORS(app)
     jwt = JWTManager(app)
-    
+
     # Initialize database
     init_app(app)
-    
-    # Ensure superadmin exists if configured
-    def ensure_superadmin():
-        import os
-        admin_email = os.getenv('SUPERADMIN_EMAIL')
-        admin_password = os.getenv('SUPERADMIN_PASSWORD')
-        if not admin_email or not admin_password:
-            return
-        first_name = os.getenv('SUPERADMIN_FIRST_NAME', 'Super')
-        last_name = os.getenv('SUPERADMIN_LAST_NAME', 'Admin')
-        try:
-            with get_cursor() as cursor:
-                cursor.execute("SELECT user_id, role FROM users WHERE email = %s", (admin_email,))
-                row = cursor.fetchone()
-                if not row:
-                    import uuid
-                    user_id = str(uuid.uuid4())
-                    cursor.execute(
-                        """
-                        INSERT INTO users (user_id, email, password_hash, first_name, last_name, role, is_active, date_joined)
-                        VALUES (%s, %s, %s, %s, %s, 'admin', TRUE, NOW())
-                        """,
-                        (user_id, admin_email, hash_password(admin_password), first_name, last_name)
-                    )
-                    print(f"Created superadmin user: {admin_email}")
-                elif row['role'] != 'admin':
-                    cursor.execute("UPDATE users SET role = 'admin' WHERE email = %s", (admin_email,))
-                    print(f"Upgraded user to superadmin: {admin_email}")
-        except Exception as e:
-            print(f"Failed to ensure superadmin: {e}")
 
-    ensure_superadmin()
+    # Schema changes and the superadmin account are applied before deploy with
+    # `python -m database.migrate up`; /api/health/ready reports a schema that is behind
 
-    # Ensure analytics schema exists
-    def ensure_analytics_schema():
-        try:
-            with get_cursor() as cursor:
-                # Create enum type if not exists
-                cursor.execute("SELECT 1 FROM pg_type WHERE typname = 'analytics_event_type'")
-                if cursor.fetchone() is None:
-                    cursor.execute("CREATE TYPE analytics_event_type AS ENUM ('view','click','add_to_cart','purchase')")
-
-                # Create table if not exists
-                cursor.execute("SELECT to_regclass('public.analytics_events') AS tbl")
-                row = cursor.fetchone()
-                if not row or not row.get('tbl'):
-                    cursor.execute(
-                        """
-                        CREATE TABLE analytics_events (
-                            event_id VARCHAR(36) PRIMARY KEY,
-                            user_id VARCHAR(36),
-                            store_id VARCHAR(36),
-                            product_id VARCHAR(36),
-                            event_type analytics_event_type NOT NULL,
-                            metadata JSONB,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL,
-                            FOREIGN KEY (store_id) REFERENCES stores(store_id) ON DELETE CASCADE,
-                            FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
-                        )
-                        """
-                    )
-        except Exception as e:
-            print(f"Failed to ensure analytics schema: {e}")
-
-    ensure_analytics_schema()
-    
-    # Register blueprints
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(users_bp, url_prefix='/api/users')
-    app.register_blueprint(stores_bp, url_prefix='/api/stores')
-    app.register_blueprint(products_bp, url_prefix='/api/products')
-    app.register_blueprint(categories_bp, url_prefix='/api/categories')
-    app.register_blueprint(wishlist_bp, url_prefix='/api/wishlist')
-    app.register_blueprint(orders_bp, url_prefix='/api/orders')
-    app.register_blueprint(cart_bp, url_prefix='/api/cart')
-    app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
-    app.register_blueprint(admin_bp, url_prefix='/api/admin')
-    
-    # Add static file serving for uploads
+    if startup_mode != 'lazy':
+        register_blueprints(app)
+
+    app.wsgi_app = DeferredStartup(app, lazy_blueprints=startup_mode == 'lazy')
+
+    # Add static file serving for uploads (see utils/uploads.py for proxy offload modes)
     @app.route('/uploads/<path:subfolder>/<filename>')
     def serve_uploaded_file(subfolder, filename):
         """Serve uploaded files"""
-        try:
-            # Construct the full path to the uploads directory
-            uploads_dir = os.path.join(os.path.dirname(__file__), 'uploads')
-            return send_from_directory(uploads_dir, f"{subfolder}/{filename}")
-        except Exception as e:
-            print(f"Error serving file: {e}")
-            return "File not found", 404
-    
+        return send_upload(f"{subfolder}/{filename}")
+
     @app.route('/')
     def home():
         return {
             'message': 'Sweet Indulgence API',
             'status': 'running'
         }
-    
+
+    @app.route('/api/health/live')
+    def liveness_check():
+        """The process is up and serving; never touches the database"""
+        return {'status': 'alive'}
+
     @app.route('/api/health')
+    @app.route('/api/health/ready')
     def health_check():
+        """Ready to take traffic: database reachable and schema migrated"""
+        from database.migrate import check_schema_version
+
         try:
-            # Test database connection
-            db_status = test_connection()
-            return {
-                'status': 'healthy' if db_status else 'unhealthy',
-                'database': 'connected' if db_status else 'disconnected'
-            }
+            # One query proves the connection and reads the schema version
+            db_version, code_version = check_schema_version()
         except Exception as e:
             return {
                 'status': 'unhealthy',
+                'database': 'disconnected',
                 'error': str(e)
-            }, 500
-    
+            }, 503
+
+        if db_version < code_version:
+            return {
+                'status': 'unhealthy',
+                'database': 'connected',
+                'schema_version': db_version,
+                'expected_schema_version': code_version
+            }, 503
+
+        return {
+            'status': 'healthy',
+            'database': 'connected',
+            'schema_version': db_version
+        }
+
     # Register the function to close the database connection
     app.teardown_appcontext(close_db)
 
@@ -151,4 +155,4 @@ def create_app():
 if __name__ == '__main__':
     app = create_app()
     print("Starting Sweet Indulgence API...")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
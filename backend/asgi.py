@@ -0,0 +1,7 @@
+"""ASGI entry point for the async catalogue server (see async_api/__init__.py).
+
+    hypercorn asgi:app --workers 4 --bind 0.0.0.0:5001
+"""
+from async_api import create_async_app
+
+app = create_async_app()
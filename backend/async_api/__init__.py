@@ -0,0 +1,49 @@
+"""Async (Quart + asyncpg) server for the read-heavy catalogue routes.
+
+Runs beside the Flask app; the proxy sends only the paths in ASYNC_ROUTES here
+and everything else (writes, auth, /api/products/manage, ...) to Flask:
+
+    hypercorn asgi:app --workers 4 --bind 0.0.0.0:5001
+"""
+from quart import Quart
+from quart_cors import cors
+from async_api.db import open_pool, close_pool
+from async_api.catalog import products_bp, stores_bp, categories_bp, refresh_categories
+
+# GET paths served by this app, for the proxy config
+ASYNC_ROUTES = [
+    '/api/products',
+    '/api/products/<product_id>',
+    '/api/stores',
+    '/api/stores/top-stores',
+    '/api/stores/nearby',
+    '/api/stores/<store_id>',
+    '/api/stores/<store_id>/page',
+    '/api/categories',
+]
+
+def create_async_app():
+    app = Quart(__name__)
+    app = cors(app)
+
+    app.register_blueprint(products_bp, url_prefix='/api/products')
+    app.register_blueprint(stores_bp, url_prefix='/api/stores')
+    app.register_blueprint(categories_bp, url_prefix='/api/categories')
+
+    # One pool per worker process, opened on that worker's event loop
+    @app.before_serving
+    async def startup():
+        await open_pool()
+        try:
+            await refresh_categories()
+        except Exception as e:
+            # Deferred to the first request that needs it
+            print(f"Error preloading categories: {e}")
+
+    app.after_serving(close_pool)
+
+    @app.route('/api/health/live')
+    async def liveness_check():
+        return {'status': 'alive'}
+
+    return app
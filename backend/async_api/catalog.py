@@ -0,0 +1,278 @@
+from quart import Blueprint, request, jsonify
+from async_api.db import fetch, fetchrow, fetchval, gather
+from utils.categories import CATEGORIES_SQL, CATEGORY_VERSION_SQL, category_registry
+from routes.products import (
+    PRODUCT_COUNT_SQL, PRODUCT_LIST_SQL, PRODUCT_DETAIL_SQL,
+    product_list_filters, product_facet_query, format_product_card, format_product_detail
+)
+from utils.facets import facet_cache, format_facets
+from utils.geo import NEARBY_STORES_SQL, nearby_query, format_nearby_store
+from routes.stores import (
+    STORE_DETAILS_SQL, STORE_RANKINGS, MAX_TOP_STORES, leaderboard_cache, format_store_details, format_top_store,
+    STORE_PAGE_PRODUCTS_LIMIT, STORE_CATEGORY_FACETS_SQL, STORE_RATING_SUMMARY_SQL,
+    store_page_product_filters, store_page_payload, store_page_cache_headers,
+    store_directory_query, store_directory_page
+)
+
+# Read-only mirrors of the catalogue GET routes. SQL and response shapes come from
+# the Flask blueprints, so both apps answer identically.
+async def refresh_categories():
+    """Async twin of utils.categories.refresh_categories, on the asyncpg pool"""
+    if not category_registry.start_check():
+        return category_registry
+    try:
+        version = await fetchval(CATEGORY_VERSION_SQL) or 0
+        if version != category_registry.version:
+            category_registry.replace(version, await fetch(CATEGORIES_SQL))
+    except Exception as e:
+        if category_registry.version is None:
+            raise
+        print(f"Error checking category version: {e}")
+    return category_registry
+
+products_bp = Blueprint('async_products', __name__)
+stores_bp = Blueprint('async_stores', __name__)
+categories_bp = Blueprint('async_categories', __name__)
+
+@products_bp.route('', methods=['GET'], strict_slashes=False)
+@products_bp.route('/', methods=['GET'], strict_slashes=False)
+async def get_products():
+    """Get all products with pagination and filtering"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        limit = request.args.get('limit', 12, type=int)
+        offset = (page - 1) * limit
+
+        include_facets = request.args.get('facets', 'true') != 'false'
+
+        where_clause, params, order_clause = product_list_filters(request.args)
+        await refresh_categories()
+        queries = [
+            fetchval(PRODUCT_COUNT_SQL.format(where_clause=where_clause), *params),
+            fetch(
+                PRODUCT_LIST_SQL.format(where_clause=where_clause, order_clause=order_clause),
+                *params, limit, offset
+            )
+        ]
+
+        facets = None
+        if include_facets:
+            facet_key, facet_sql, facet_params = product_facet_query(request.args)
+            facets = facet_cache.get(facet_key)
+            if facets is None:
+                queries.append(fetch(facet_sql, *facet_params))
+
+        # The count, the page and the facets do not depend on each other
+        total, products, *facet_rows = await gather(*queries)
+        if facet_rows:
+            facets = format_facets(facet_rows[0])
+            facet_cache.set(facet_key, facets)
+
+        response = {
+            'success': True,
+            'products': [format_product_card(product) for product in products],
+            'pagination': {
+                'total': total,
+                'page': page,
+                'limit': limit,
+                'pages': (total + limit - 1) // limit
+            }
+        }
+        if include_facets:
+            response['facets'] = facets
+        return jsonify(response), 200
+
+    except Exception as e:
+        print(f"Error fetching products: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching products: {str(e)}'
+        }), 500
+
+@products_bp.route('/<product_id>', methods=['GET'])
+async def get_product(product_id):
+    """Get a single product by ID"""
+    try:
+        product = await fetchrow(PRODUCT_DETAIL_SQL, product_id)
+        if not product:
+            return jsonify({
+                'success': False,
+                'message': 'Product not found'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'product': format_product_detail(product)
+        }), 200
+
+    except Exception as e:
+        print(f"Error getting product: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error getting product: {str(e)}'
+        }), 500
+
+@stores_bp.route('', methods=['GET'], strict_slashes=False)
+@stores_bp.route('/', methods=['GET'], strict_slashes=False)
+async def get_stores():
+    """Store directory: city filter, name search, sort=name|rating|products, cursor pagination"""
+    try:
+        try:
+            sql, params, sort, limit = store_directory_query(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        rows = await fetch(sql, *params)
+        return jsonify(store_directory_page(rows, sort, limit)), 200
+
+    except Exception as e:
+        print(f"Error fetching stores: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching stores: {str(e)}'
+        }), 500
+
+@stores_bp.route('/nearby', methods=['GET'])
+async def get_nearby_stores():
+    """Stores within radius km (default 10) of lat/lng, or of a city's centre, nearest first"""
+    try:
+        try:
+            params, origin = nearby_query(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        stores_list = [format_nearby_store(store) for store in await fetch(NEARBY_STORES_SQL, *params)]
+        return jsonify({
+            'success': True,
+            'origin': origin,
+            'stores': stores_list,
+            'total': len(stores_list)
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching nearby stores: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching nearby stores: {str(e)}'
+        }), 500
+
+@stores_bp.route('/top-stores', methods=['GET'])
+async def get_top_stores():
+    """Get top stores by product count, rating (sort=rating) or 30-day orders (sort=orders_30d)"""
+    try:
+        limit = min(request.args.get('limit', 5, type=int), MAX_TOP_STORES)
+        ranking = request.args.get('sort', 'products')
+        if ranking not in STORE_RANKINGS:
+            return jsonify({
+                'success': False,
+                'message': f"sort must be one of: {', '.join(STORE_RANKINGS)}"
+            }), 400
+
+        leaderboard = leaderboard_cache.get(ranking)
+        if leaderboard is None:
+            rows = await fetch(STORE_RANKINGS[ranking], MAX_TOP_STORES)
+            leaderboard = [format_top_store(store) for store in rows]
+            leaderboard_cache.set(ranking, leaderboard)
+        stores_list = leaderboard[:max(limit, 0)]
+
+        return jsonify({
+            'success': True,
+            'stores': stores_list,
+            'total': len(stores_list)
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching top stores: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching stores: {str(e)}'
+        }), 500
+
+@stores_bp.route('/<store_id>', methods=['GET'])
+async def get_store_details(store_id):
+    """Get detailed store information by store ID"""
+    try:
+        result = await fetchrow(STORE_DETAILS_SQL, store_id)
+        if not result:
+            return jsonify({
+                'success': False,
+                'message': 'Store not found'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'store': format_store_details(result)
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching store details: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching store details: {str(e)}'
+        }), 500
+
+@stores_bp.route('/<store_id>/page', methods=['GET'])
+async def get_store_page(store_id):
+    """Store details, the first products page, category facets and rating summary in one response"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        limit = request.args.get('limit', STORE_PAGE_PRODUCTS_LIMIT, type=int)
+        offset = (page - 1) * limit
+        where_clause, params, order_clause = store_page_product_filters(store_id, request.args)
+        await refresh_categories()
+
+        # Five independent queries on five pooled connections; the page costs the slowest one
+        store, total, products, facets, ratings = await gather(
+            fetchrow(STORE_DETAILS_SQL, store_id),
+            fetchval(PRODUCT_COUNT_SQL.format(where_clause=where_clause), *params),
+            fetch(
+                PRODUCT_LIST_SQL.format(where_clause=where_clause, order_clause=order_clause),
+                *params, limit, offset
+            ),
+            fetch(STORE_CATEGORY_FACETS_SQL, store_id),
+            fetch(STORE_RATING_SUMMARY_SQL, store_id)
+        )
+
+        if not store:
+            return jsonify({
+                'success': False,
+                'message': 'Store not found'
+            }), 404
+
+        payload = store_page_payload(store, products, total, facets, ratings, page, limit)
+        etag, headers = store_page_cache_headers(payload)
+        if request.if_none_match.contains(etag):
+            return '', 304, headers
+
+        return jsonify(payload), 200, headers
+
+    except Exception as e:
+        print(f"Error fetching store page: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching store page: {str(e)}'
+        }), 500
+
+@categories_bp.route('', methods=['GET'], strict_slashes=False)
+@categories_bp.route('/', methods=['GET'], strict_slashes=False)
+async def get_categories():
+    """Get all categories"""
+    try:
+        registry = await refresh_categories()
+        return jsonify({
+            'success': True,
+            'categories': registry.categories
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching categories: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching categories: {str(e)}'
+        }), 500
@@ -0,0 +1,60 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import asyncpg
+from database.db import DB_CONFIG
+
+POOL_MIN_SIZE = int(os.getenv('ASYNC_DB_POOL_MIN', '2'))
+POOL_MAX_SIZE = int(os.getenv('ASYNC_DB_POOL_MAX', '10'))
+
+PLACEHOLDER = re.compile(r'%s')
+
+_pool = None
+
+async def _init_connection(connection):
+    # Decode json/jsonb like psycopg2 does, so the shared format_* helpers see dicts
+    for type_name in ('json', 'jsonb'):
+        await connection.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+async def open_pool():
+    """Create this process's connection pool; called once per event loop at startup"""
+    global _pool
+    _pool = await asyncpg.create_pool(
+        host=DB_CONFIG['host'],
+        port=int(DB_CONFIG['port']),
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        database=DB_CONFIG['database'],
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        init=_init_connection
+    )
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+@functools.lru_cache(maxsize=256)
+def to_asyncpg(sql):
+    """Rewrite psycopg2 '%s' placeholders as asyncpg's $1, $2, ... so both apps share the SQL"""
+    counter = iter(range(1, sql.count('%s') + 1))
+    return PLACEHOLDER.sub(lambda _: f"${next(counter)}", sql).replace('%%', '%')
+
+async def fetch(sql, *args):
+    """All rows; each call takes its own pooled connection, so calls can run concurrently"""
+    return await _pool.fetch(to_asyncpg(sql), *args)
+
+async def fetchrow(sql, *args):
+    return await _pool.fetchrow(to_asyncpg(sql), *args)
+
+async def fetchval(sql, *args):
+    return await _pool.fetchval(to_asyncpg(sql), *args)
+
+async def gather(*queries):
+    """Run independent queries at once; each holds a separate connection only while it runs"""
+    return await asyncio.gather(*queries)
@@ -57,15 +57,12 @@ def get_cursor():
             print(f"DEBUG: Connection closed")
 
 def init_app(app):
-    """Initialize database with Flask app"""
+    """Initialize database with Flask app.
+
+    Does not connect: startup stays independent of the database, and
+    /api/health/ready is where connectivity is checked.
+    """
     app.teardown_appcontext(close_db)
-    
-    # Test connection on startup
-    with app.app_context():
-        if test_connection():
-            print("Database connection successful on startup")
-        else:
-            print("Warning: Database connection failed on startup")
 
 def close_db(error):
     """Close database connection"""
@@ -91,7 +88,7 @@ def init_db():
     try:
         with get_cursor() as cursor:
             # Read and execute schema
-            with open('database/schema.sql', 'r') as file:
+            with open(os.path.join(os.path.dirname(__file__), 'schema.sql'), 'r') as file:
                 schema = file.read()
             
             cursor.execute(schema)
@@ -0,0 +1,213 @@
+import os
+import re
+import sys
+import uuid
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor
+from database.db import get_cursor, get_db
+from utils.auth import hash_password
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema.sql')
+
+# pg_advisory_lock key held while migrating, so concurrent deploys apply each migration once
+MIGRATION_LOCK_ID = 727001
+
+# Files starting with this line run outside a transaction, one statement at a
+# time (needed for CREATE INDEX CONCURRENTLY). Such files must be plain
+# statements separated by ';' - no functions or DO blocks.
+NO_TRANSACTION_MARKER = '-- migrate: no-transaction'
+
+MIGRATION_NAME = re.compile(r'^(?P<version>\d{4})_(?P<name>[a-z0-9_]+)\.sql$')
+CONCURRENT_INDEX_NAME = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE)
+
+VERSION_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+def list_migrations():
+    """[(version, name, path)] of every migration file, in order"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_NAME.match(filename)
+        if match:
+            migrations.append((int(match.group('version')), match.group('name'), os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+def split_statements(sql):
+    """Split a no-transaction migration into statements, dropping comment-only lines"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+def _drop_invalid_indexes(cursor, sql):
+    """Drop indexes a failed CONCURRENTLY build left INVALID, so IF NOT EXISTS does not skip them"""
+    for index_name in CONCURRENT_INDEX_NAME.findall(sql):
+        cursor.execute("""
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND NOT i.indisvalid
+        """, (index_name,))
+        if cursor.fetchone():
+            print(f"Dropping invalid index {index_name} from an interrupted build")
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"')
+
+def apply_migration(connection, version, name, path):
+    """Apply one migration and record it in schema_migrations"""
+    with open(path, 'r') as file:
+        sql = file.read()
+
+    if sql.startswith(NO_TRANSACTION_MARKER):
+        connection.autocommit = True
+        try:
+            with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+                _drop_invalid_indexes(cursor, sql)
+                for statement in split_statements(sql):
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+        finally:
+            connection.autocommit = False
+        return
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name)
+            )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+def migrate():
+    """Apply every pending migration in order, under an advisory lock.
+
+    An empty database gets schema.sql instead, which already contains every
+    migration, and all versions are recorded as applied.
+    Returns the versions applied.
+    """
+    connection = get_db()
+    try:
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Session-level lock: survives the commits and autocommit switches below
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            try:
+                cursor.execute("SELECT to_regclass('public.users') AS tbl")
+                fresh = cursor.fetchone()['tbl'] is None
+
+                cursor.execute(VERSION_TABLE_SQL)
+                if fresh:
+                    print("Empty database, creating it from schema.sql")
+                    with open(SCHEMA_PATH, 'r') as file:
+                        cursor.execute(file.read())
+                    for version, name, _ in list_migrations():
+                        cursor.execute(
+                            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (version, name)
+                        )
+                connection.commit()
+
+                done = applied_versions(cursor)
+                connection.commit()
+
+                applied = []
+                for version, name, path in list_migrations():
+                    if version in done:
+                        continue
+                    print(f"Applying migration {version:04d}_{name}")
+                    apply_migration(connection, version, name, path)
+                    applied.append(version)
+                return applied
+            finally:
+                connection.rollback()
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+    finally:
+        connection.close()
+
+def latest_version():
+    migrations = list_migrations()
+    return migrations[-1][0] if migrations else 0
+
+def check_schema_version():
+    """One cheap query at app start: (database version, version this code expects)"""
+    try:
+        with get_cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations")
+            return cursor.fetchone()['version'], latest_version()
+    except psycopg2.errors.UndefinedTable:
+        # Never migrated
+        return 0, latest_version()
+
+def ensure_superadmin():
+    """Create or promote the SUPERADMIN_EMAIL user; run after migrating, not at app start"""
+    admin_email = os.getenv('SUPERADMIN_EMAIL')
+    admin_password = os.getenv('SUPERADMIN_PASSWORD')
+    if not admin_email or not admin_password:
+        return
+    first_name = os.getenv('SUPERADMIN_FIRST_NAME', 'Super')
+    last_name = os.getenv('SUPERADMIN_LAST_NAME', 'Admin')
+
+    with get_cursor() as cursor:
+        cursor.execute("SELECT user_id, role FROM users WHERE email = %s", (admin_email,))
+        row = cursor.fetchone()
+        if not row:
+            cursor.execute(
+                """
+                INSERT INTO users (user_id, email, password_hash, first_name, last_name, role, is_active, date_joined)
+                VALUES (%s, %s, %s, %s, %s, 'admin', TRUE, NOW())
+                """,
+                (str(uuid.uuid4()), admin_email, hash_password(admin_password), first_name, last_name)
+            )
+            print(f"Created superadmin user: {admin_email}")
+        elif row['role'] != 'admin':
+            cursor.execute("UPDATE users SET role = 'admin' WHERE email = %s", (admin_email,))
+            print(f"Upgraded user to superadmin: {admin_email}")
+
+def status():
+    """[(version, name, applied_at or None)] for every migration file"""
+    connection = get_db()
+    try:
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("SELECT to_regclass('public.schema_migrations') AS tbl")
+            applied = {}
+            if cursor.fetchone()['tbl']:
+                cursor.execute("SELECT version, applied_at FROM schema_migrations")
+                applied = {row['version']: row['applied_at'] for row in cursor.fetchall()}
+        connection.rollback()
+        return [(version, name, applied.get(version)) for version, name, _ in list_migrations()]
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'up'
+    if command == 'up':
+        applied = migrate()
+        print(f"Applied {len(applied)} migrations" if applied else "Database is up to date")
+        ensure_superadmin()
+        # Stores created before 0008, or whose city was not in the gazetteer at the time
+        from utils.geo import geocode_stores
+        geocoded, _ = geocode_stores()
+        if geocoded:
+            print(f"Geocoded {geocoded} stores")
+    elif command == 'status':
+        for version, name, applied_at in status():
+            print(f"{version:04d}_{name}: {applied_at or 'pending'}")
+    elif command == 'verify':
+        from database.query_plans import verify_query_plans
+        sys.exit(0 if verify_query_plans() else 1)
+    else:
+        print("Usage: python -m database.migrate [up|status|verify]")
+        sys.exit(1)
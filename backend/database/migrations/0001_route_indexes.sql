@@ -0,0 +1,34 @@
+-- migrate: no-transaction
+-- Indexes for the WHERE/JOIN/ORDER BY shapes used in routes/*.py.
+-- CONCURRENTLY keeps the tables writable while they build; verify with
+-- `python -m database.migrate verify`.
+-- cart_items(cart_id) and wishlist_items(wishlist_id) are already covered by
+-- their UNIQUE (cart_id, product_id) / (wishlist_id, product_id) constraints.
+
+-- Store dashboards list every product of a store, active or not (manage, stats, export, bulk)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_store_id ON products (store_id);
+
+-- Admin listing joins categories; also serves the categories FK check
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_category_id ON products (category_id);
+
+-- "My orders" and the store order list: filter plus ORDER BY date_created DESC in one index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_user_id_date_created ON orders (user_id, date_created DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_store_id_date_created ON orders (store_id, date_created DESC);
+
+-- Order details, store order stats, and the delete/archive order-count check
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_items_order_id ON order_items (order_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_items_product_id ON order_items (product_id);
+
+-- Every listing joins the primary image only; the full index serves the product gallery
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_product_images_primary ON product_images (product_id) WHERE is_primary = true;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_product_images_product_id ON product_images (product_id, display_order);
+
+-- Store lookup by owner runs on almost every supplier request
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_owner_id ON stores (owner_id);
+
+-- Product detail ratings
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_product_id ON reviews (product_id);
+
+-- Store and platform analytics over the last 30 days
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analytics_events_store_id_created_at ON analytics_events (store_id, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analytics_events_created_at ON analytics_events (created_at);
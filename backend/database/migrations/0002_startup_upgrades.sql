@@ -0,0 +1,262 @@
+-- Schema changes that used to be applied on every app start (ensure_analytics_schema()
+-- and schema_upgrades.sql). Every block checks for what it adds, so databases that
+-- already went through those startup upgrades pass through unchanged.
+
+-- Analytics events (was created by ensure_analytics_schema() in app.py)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'analytics_event_type') THEN
+        CREATE TYPE analytics_event_type AS ENUM ('view', 'click', 'add_to_cart', 'purchase');
+    END IF;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS analytics_events (
+    event_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36),
+    store_id VARCHAR(36),
+    product_id VARCHAR(36),
+    event_type analytics_event_type NOT NULL,
+    metadata JSONB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL,
+    FOREIGN KEY (store_id) REFERENCES stores(store_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+);
+
+-- One cart / wishlist per user and one line per product, required by the
+-- ON CONFLICT upserts in routes/cart.py and routes/wishlist.py
+DO $$
+BEGIN
+    IF to_regclass('public.cart_user_id_key') IS NULL THEN
+        -- Fold duplicate carts into the oldest one before adding the constraint
+        UPDATE cart_items ci
+        SET cart_id = keeper.cart_id
+        FROM cart c
+        JOIN (
+            SELECT DISTINCT ON (user_id) user_id, cart_id
+            FROM cart
+            ORDER BY user_id, date_created, cart_id
+        ) keeper ON keeper.user_id = c.user_id
+        WHERE ci.cart_id = c.cart_id AND c.cart_id <> keeper.cart_id;
+
+        DELETE FROM cart c
+        USING cart older
+        WHERE c.user_id = older.user_id
+          AND (older.date_created, older.cart_id) < (c.date_created, c.cart_id);
+
+        ALTER TABLE cart ADD CONSTRAINT cart_user_id_key UNIQUE (user_id);
+    END IF;
+
+    IF to_regclass('public.cart_items_cart_id_product_id_key') IS NULL THEN
+        -- Merge duplicate lines, keeping the quantity of all of them
+        UPDATE cart_items ci
+        SET quantity = dup.total_quantity
+        FROM (
+            SELECT cart_id, product_id, MIN(cart_item_id) AS keep_id, SUM(quantity) AS total_quantity
+            FROM cart_items
+            GROUP BY cart_id, product_id
+            HAVING COUNT(*) > 1
+        ) dup
+        WHERE ci.cart_item_id = dup.keep_id;
+
+        DELETE FROM cart_items ci
+        USING cart_items other
+        WHERE ci.cart_id = other.cart_id
+          AND ci.product_id = other.product_id
+          AND ci.cart_item_id > other.cart_item_id;
+
+        ALTER TABLE cart_items ADD CONSTRAINT cart_items_cart_id_product_id_key UNIQUE (cart_id, product_id);
+    END IF;
+
+    IF to_regclass('public.wishlist_user_id_key') IS NULL THEN
+        UPDATE wishlist_items wi
+        SET wishlist_id = keeper.wishlist_id
+        FROM wishlist w
+        JOIN (
+            SELECT DISTINCT ON (user_id) user_id, wishlist_id
+            FROM wishlist
+            ORDER BY user_id, date_created, wishlist_id
+        ) keeper ON keeper.user_id = w.user_id
+        WHERE wi.wishlist_id = w.wishlist_id AND w.wishlist_id <> keeper.wishlist_id;
+
+        DELETE FROM wishlist w
+        USING wishlist older
+        WHERE w.user_id = older.user_id
+          AND (older.date_created, older.wishlist_id) < (w.date_created, w.wishlist_id);
+
+        ALTER TABLE wishlist ADD CONSTRAINT wishlist_user_id_key UNIQUE (user_id);
+    END IF;
+
+    IF to_regclass('public.wishlist_items_wishlist_id_product_id_key') IS NULL THEN
+        DELETE FROM wishlist_items wi
+        USING wishlist_items other
+        WHERE wi.wishlist_id = other.wishlist_id
+          AND wi.product_id = other.product_id
+          AND wi.wishlist_item_id > other.wishlist_item_id;
+
+        ALTER TABLE wishlist_items ADD CONSTRAINT wishlist_items_wishlist_id_product_id_key UNIQUE (wishlist_id, product_id);
+    END IF;
+END
+$$;
+
+-- Stock reservations: maintained per-product counter plus the holds themselves
+ALTER TABLE products ADD COLUMN IF NOT EXISTS reserved_quantity INTEGER NOT NULL DEFAULT 0 CHECK (reserved_quantity >= 0);
+
+CREATE TABLE IF NOT EXISTS stock_reservations (
+    reservation_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    product_id VARCHAR(36) NOT NULL,
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    expires_at TIMESTAMP NOT NULL,
+    date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_reservations_expires_at ON stock_reservations (expires_at);
+CREATE INDEX IF NOT EXISTS idx_stock_reservations_user_id ON stock_reservations (user_id);
+
+-- Resized WebP/JPEG renditions of product images
+ALTER TABLE product_images ADD COLUMN IF NOT EXISTS renditions JSONB;
+
+-- Content-addressed, reference-counted upload storage
+CREATE TABLE IF NOT EXISTS stored_files (
+    content_hash VARCHAR(64) PRIMARY KEY,
+    file_url VARCHAR(255) NOT NULL,
+    size_bytes BIGINT,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    orphaned_at TIMESTAMP,
+    date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_stored_files_orphaned_at ON stored_files (orphaned_at) WHERE ref_count <= 0;
+
+ALTER TABLE product_images ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+CREATE OR REPLACE FUNCTION product_images_refcount() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.content_hash IS NOT DISTINCT FROM NEW.content_hash THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.content_hash IS NOT NULL THEN
+        UPDATE stored_files
+        SET ref_count = ref_count + 1, orphaned_at = NULL
+        WHERE content_hash = NEW.content_hash;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.content_hash IS NOT NULL THEN
+        UPDATE stored_files
+        SET ref_count = ref_count - 1,
+            orphaned_at = CASE WHEN ref_count - 1 <= 0 THEN CURRENT_TIMESTAMP ELSE orphaned_at END
+        WHERE content_hash = OLD.content_hash;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_images_refcount ON product_images;
+CREATE TRIGGER product_images_refcount
+AFTER INSERT OR DELETE OR UPDATE OF content_hash ON product_images
+FOR EACH ROW EXECUTE PROCEDURE product_images_refcount();
+
+-- Deleting a product cascades to cart lines too, so it is a single DELETE (order_items still blocks it)
+DO $$
+DECLARE
+    fk_name TEXT;
+BEGIN
+    SELECT conname INTO fk_name
+    FROM pg_constraint
+    WHERE conrelid = 'cart_items'::regclass
+      AND confrelid = 'products'::regclass
+      AND contype = 'f'
+      AND confdeltype <> 'c';
+
+    IF fk_name IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE cart_items DROP CONSTRAINT %I', fk_name);
+        ALTER TABLE cart_items ADD CONSTRAINT cart_items_product_id_fkey
+            FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE;
+    END IF;
+END
+$$;
+
+-- Partial indexes over live inventory
+CREATE INDEX IF NOT EXISTS idx_products_active_store_id ON products (store_id, date_created DESC) WHERE is_active = true;
+CREATE INDEX IF NOT EXISTS idx_products_active_category_id ON products (category_id, date_created DESC) WHERE is_active = true;
+CREATE INDEX IF NOT EXISTS idx_products_active_featured ON products (date_created DESC) WHERE is_active = true AND is_featured = true;
+
+-- Archive tier for retired products
+CREATE TABLE IF NOT EXISTS archived_products (
+    product_id VARCHAR(36) PRIMARY KEY,
+    store_id VARCHAR(36) NOT NULL,
+    category_id VARCHAR(36),
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    price DECIMAL(10,2) NOT NULL,
+    sale_price DECIMAL(10,2),
+    stock_quantity INTEGER DEFAULT 0,
+    is_featured BOOLEAN DEFAULT FALSE,
+    avg_rating DECIMAL(3,2) DEFAULT 0,
+    loyalty_points_earned INTEGER DEFAULT 0,
+    date_created TIMESTAMP,
+    date_updated TIMESTAMP,
+    date_archived TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (store_id) REFERENCES stores(store_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_archived_products_store_id ON archived_products (store_id, date_archived DESC);
+
+CREATE TABLE IF NOT EXISTS archived_product_images (
+    image_id VARCHAR(36) PRIMARY KEY,
+    product_id VARCHAR(36) NOT NULL,
+    image_url VARCHAR(255) NOT NULL,
+    content_hash VARCHAR(64),
+    renditions JSONB,
+    is_primary BOOLEAN DEFAULT FALSE,
+    display_order INTEGER DEFAULT 0,
+    FOREIGN KEY (product_id) REFERENCES archived_products(product_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_archived_product_images_product_id ON archived_product_images (product_id);
+
+DROP TRIGGER IF EXISTS archived_product_images_refcount ON archived_product_images;
+CREATE TRIGGER archived_product_images_refcount
+AFTER INSERT OR DELETE OR UPDATE OF content_hash ON archived_product_images
+FOR EACH ROW EXECUTE PROCEDURE product_images_refcount();
+
+CREATE TABLE IF NOT EXISTS archived_reviews (
+    review_id VARCHAR(36) PRIMARY KEY,
+    product_id VARCHAR(36) NOT NULL,
+    user_id VARCHAR(36) NOT NULL,
+    rating INTEGER NOT NULL,
+    comment TEXT,
+    date_created TIMESTAMP,
+    is_verified_purchase BOOLEAN DEFAULT FALSE,
+    FOREIGN KEY (product_id) REFERENCES archived_products(product_id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_archived_reviews_product_id ON archived_reviews (product_id);
+
+CREATE OR REPLACE VIEW product_history AS
+SELECT product_id, store_id, category_id, name, description, price, FALSE AS is_archived
+FROM products
+UNION ALL
+SELECT product_id, store_id, category_id, name, description, price, TRUE AS is_archived
+FROM archived_products;
+
+-- order_items may now point at archived products, so its FK to products goes
+DO $$
+DECLARE
+    fk_name TEXT;
+BEGIN
+    FOR fk_name IN
+        SELECT conname
+        FROM pg_constraint
+        WHERE conrelid = 'order_items'::regclass
+          AND confrelid = 'products'::regclass
+          AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE order_items DROP CONSTRAINT %I', fk_name);
+    END LOOP;
+END
+$$;
@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- GET /api/stores/<id>/page: the rating summary groups a store's reviews by
+-- rating, which this index answers without touching the table.
+-- The category facets use idx_products_active_store_id.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_store_reviews_store_id_rating ON store_reviews (store_id, rating);
@@ -0,0 +1,21 @@
+-- Version counter for the in-memory category registry (utils/categories.py):
+-- any change to categories bumps it, and app processes reload on their next check.
+CREATE TABLE IF NOT EXISTS registry_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO registry_versions (name, version) VALUES ('categories', 1)
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_categories_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE registry_versions SET version = version + 1 WHERE name = 'categories';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS categories_version ON categories;
+CREATE TRIGGER categories_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categories
+FOR EACH STATEMENT EXECUTE PROCEDURE bump_categories_version();
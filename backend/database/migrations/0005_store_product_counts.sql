@@ -0,0 +1,37 @@
+-- stores.active_product_count, kept by a trigger on products so the top-stores
+-- leaderboard no longer groups every active product on each call.
+ALTER TABLE stores ADD COLUMN IF NOT EXISTS active_product_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION products_active_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.is_active IS NOT DISTINCT FROM NEW.is_active AND OLD.store_id = NEW.store_id THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.is_active IS TRUE THEN
+        UPDATE stores SET active_product_count = active_product_count - 1 WHERE store_id = OLD.store_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active IS TRUE THEN
+        UPDATE stores SET active_product_count = active_product_count + 1 WHERE store_id = NEW.store_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Hold product writes until the backfill commits, so no change falls between
+-- the count and the trigger taking over
+LOCK TABLE products IN SHARE MODE;
+
+DROP TRIGGER IF EXISTS products_active_count ON products;
+CREATE TRIGGER products_active_count
+AFTER INSERT OR DELETE OR UPDATE OF is_active, store_id ON products
+FOR EACH ROW EXECUTE PROCEDURE products_active_count();
+
+UPDATE stores s
+SET active_product_count = counts.product_count
+FROM (
+    SELECT s2.store_id, COUNT(p.product_id) AS product_count
+    FROM stores s2
+    LEFT JOIN products p ON p.store_id = s2.store_id AND p.is_active = true
+    GROUP BY s2.store_id
+) counts
+WHERE s.store_id = counts.store_id AND s.active_product_count <> counts.product_count;
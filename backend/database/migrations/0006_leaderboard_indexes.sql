@@ -0,0 +1,9 @@
+-- migrate: no-transaction
+-- GET /api/stores/top-stores rankings (routes/stores.py STORE_RANKINGS).
+
+-- sort=products and sort=rating: read the top K straight off the index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_leaderboard_products ON stores (active_product_count DESC, date_created DESC) WHERE is_active = true;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_leaderboard_rating ON stores (avg_rating DESC NULLS LAST, date_created DESC) WHERE is_active = true;
+
+-- sort=orders_30d: index-only scan of the last 30 days of orders
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_date_created ON orders (date_created) INCLUDE (store_id, status);
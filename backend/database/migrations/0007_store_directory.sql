@@ -0,0 +1,15 @@
+-- migrate: no-transaction
+-- GET /api/stores directory (routes/stores.py STORE_DIRECTORY_SORTS): every
+-- sort reads its keyset page straight off an index, so deep pages cost the same
+-- as the first.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_directory_name ON stores (name, store_id) WHERE is_active = true;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_directory_rating ON stores ((COALESCE(avg_rating, 0)) DESC, store_id DESC) WHERE is_active = true;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_directory_products ON stores (active_product_count DESC, store_id DESC) WHERE is_active = true;
+
+-- city=... filter, already in name order for the default sort
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_directory_city ON stores (lower(city), name, store_id) WHERE is_active = true;
+
+-- search=... substring match (ILIKE '%term%')
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_name_trgm ON stores USING gin (name gin_trgm_ops) WHERE is_active = true;
@@ -0,0 +1,8 @@
+-- migrate: no-transaction
+-- Store coordinates for GET /api/stores/nearby. `python -m database.migrate up`
+-- fills missing ones afterwards from the offline gazetteer (utils/geo.py).
+ALTER TABLE stores ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE stores ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
+-- Bounding-box prefilter: a latitude band, with longitude checked from the index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stores_location ON stores (latitude, longitude) WHERE is_active = true;
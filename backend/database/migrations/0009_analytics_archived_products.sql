@@ -0,0 +1,18 @@
+-- Archiving deletes from products, and the analytics_events FK cascaded that
+-- delete to the product's events. Like order_items, product_id may now point
+-- at archived_products (see product_history), so the FK goes.
+DO $$
+DECLARE
+    fk_name TEXT;
+BEGIN
+    FOR fk_name IN
+        SELECT conname
+        FROM pg_constraint
+        WHERE conrelid = 'analytics_events'::regclass
+          AND confrelid = 'products'::regclass
+          AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE analytics_events DROP CONSTRAINT %I', fk_name);
+    END LOOP;
+END
+$$;
@@ -0,0 +1,137 @@
+import json
+from psycopg2.extras import RealDictCursor
+from database.db import get_db
+
+# Any id works for planning; the point is which access path the planner can use
+PLACEHOLDER_ID = 'query-plan-check'
+PLACEHOLDER_LIMIT = 10
+
+def product_listing_queries(name, args, facets=False):
+    """Count and page (and optionally facet) queries of GET /api/products for one set of query parameters"""
+    from routes.products import PRODUCT_COUNT_SQL, PRODUCT_LIST_SQL, product_list_filters, product_facet_query
+
+    where_clause, params, order_clause = product_list_filters(args)
+    queries = [
+        (f'{name} count', PRODUCT_COUNT_SQL.format(where_clause=where_clause), tuple(params), set()),
+        (f'{name} page', PRODUCT_LIST_SQL.format(where_clause=where_clause, order_clause=order_clause),
+         (*params, PLACEHOLDER_LIMIT, 0), set()),
+    ]
+    if facets:
+        # Facets leave the category filter out, so only a store filter narrows them through an index
+        _, facet_sql, facet_params = product_facet_query(args)
+        queries.append((f'{name} facets', facet_sql, tuple(facet_params), set()))
+    return queries
+
+# (name, sql, params, tables allowed to be scanned sequentially) for the hot
+# route queries. Queries defined as module constants are imported so the check
+# follows the code; inline ones are copied in their route's shape.
+def route_queries():
+    from routes.cart import CART_ITEMS_SQL, CART_SUMMARY_SQL
+    from routes.products import DELETE_STATUS_SQL, MANAGE_PRODUCTS_SQL, PRODUCT_DETAIL_SQL
+    from utils.product_transfer import EXPORT_SQL
+    from utils.geo import NEARBY_STORES_SQL, bounding_box
+    from routes.stores import STORE_CATEGORY_FACETS_SQL, STORE_RATING_SUMMARY_SQL, STORE_RANKINGS, STORE_DIRECTORY_SORTS, STORE_DIRECTORY_SQL
+
+    return [
+        ('cart.get_cart', CART_ITEMS_SQL, (PLACEHOLDER_ID,), set()),
+        ('cart.summary', CART_SUMMARY_SQL, (PLACEHOLDER_ID,), set()),
+        *product_listing_queries('products.get_products (by store)', {'store_id': PLACEHOLDER_ID}, facets=True),
+        *product_listing_queries('products.get_products (by category)', {'category_id': PLACEHOLDER_ID}),
+        ('products.get_product', PRODUCT_DETAIL_SQL, (PLACEHOLDER_ID,), set()),
+        ('products.get_manage_products', MANAGE_PRODUCTS_SQL, (PLACEHOLDER_ID,), set()),
+        ('products.delete_check', DELETE_STATUS_SQL,
+         {'product_id': PLACEHOLDER_ID, 'user_id': PLACEHOLDER_ID}, set()),
+        ('products.export', EXPORT_SQL, (PLACEHOLDER_ID,), {'categories'}),
+        ('stores.page_facets', STORE_CATEGORY_FACETS_SQL, (PLACEHOLDER_ID,), set()),
+        ('stores.page_ratings', STORE_RATING_SUMMARY_SQL, (PLACEHOLDER_ID,), set()),
+        ('stores.top_by_products', STORE_RANKINGS['products'], (PLACEHOLDER_LIMIT,), set()),
+        ('stores.top_by_rating', STORE_RANKINGS['rating'], (PLACEHOLDER_LIMIT,), set()),
+        ('stores.top_by_orders_30d', STORE_RANKINGS['orders_30d'], (PLACEHOLDER_LIMIT,), set()),
+        *[
+            (f'stores.directory (sort={sort})',
+             STORE_DIRECTORY_SQL.format(where_clause=f"s.is_active = true AND {after_clause}", order_clause=order_clause),
+             (value_type(0) if value_type is not str else PLACEHOLDER_ID, PLACEHOLDER_ID, PLACEHOLDER_LIMIT), set())
+            for sort, (order_clause, after_clause, _, value_type) in STORE_DIRECTORY_SORTS.items()
+        ],
+        ('stores.directory (city)',
+         STORE_DIRECTORY_SQL.format(where_clause="s.is_active = true AND lower(s.city) = lower(%s)", order_clause=STORE_DIRECTORY_SORTS['name'][0]),
+         (PLACEHOLDER_ID, PLACEHOLDER_LIMIT), set()),
+        ('stores.directory (search)',
+         STORE_DIRECTORY_SQL.format(where_clause="s.is_active = true AND s.name ILIKE %s", order_clause=STORE_DIRECTORY_SORTS['name'][0]),
+         ('%bakery%', PLACEHOLDER_LIMIT), set()),
+        ('stores.nearby', NEARBY_STORES_SQL,
+         (6.93, 6.93, 79.86, *bounding_box(6.93, 79.86, 10), 10, PLACEHOLDER_LIMIT), set()),
+        ('stores.by_owner', "SELECT store_id FROM stores WHERE owner_id = %s", (PLACEHOLDER_ID,), set()),
+        ('orders.get_user_orders', """
+            SELECT o.order_id, s.name as store_name
+            FROM orders o
+            LEFT JOIN stores s ON o.store_id = s.store_id
+            WHERE o.user_id = %s
+            ORDER BY o.date_created DESC
+            LIMIT 10 OFFSET 0
+        """, (PLACEHOLDER_ID,), set()),
+        ('orders.get_store_orders', """
+            SELECT o.order_id, u.email as customer_email
+            FROM orders o
+            JOIN users u ON o.user_id = u.user_id
+            WHERE o.store_id = %s
+            ORDER BY o.date_created DESC
+            LIMIT 10 OFFSET 0
+        """, (PLACEHOLDER_ID,), set()),
+        ('orders.get_order_items', """
+            SELECT oi.quantity, p.name as product_name
+            FROM order_items oi
+            JOIN product_history p ON oi.product_id = p.product_id
+            WHERE oi.order_id = %s
+        """, (PLACEHOLDER_ID,), set()),
+        ('wishlist.get_wishlist', """
+            SELECT wi.product_id, p.name
+            FROM wishlist w
+            JOIN wishlist_items wi ON w.wishlist_id = wi.wishlist_id
+            JOIN products p ON wi.product_id = p.product_id
+            WHERE w.user_id = %s
+        """, (PLACEHOLDER_ID,), set()),
+        ('analytics.store_summary', """
+            SELECT COUNT(*) FILTER (WHERE event_type='view') AS views
+            FROM analytics_events
+            WHERE store_id = %s AND created_at >= NOW() - INTERVAL '30 days'
+        """, (PLACEHOLDER_ID,), set()),
+    ]
+
+def seq_scans(plan):
+    """Relation names of every Seq Scan node in an EXPLAIN (FORMAT JSON) plan"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+def verify_query_plans():
+    """EXPLAIN every route query and report sequential scans.
+
+    Sequential scans are disabled for planning, so a Seq Scan that remains means
+    no index can serve the query at all - not merely that the table is small.
+    Returns True when no query has an unexpected sequential scan.
+    """
+    connection = get_db()
+    ok = True
+    try:
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, sql, params, allowed in route_queries():
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()['QUERY PLAN']
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+
+                unexpected = sorted(set(seq_scans(plan[0]['Plan'])) - allowed)
+                if unexpected:
+                    ok = False
+                    print(f"SEQ SCAN  {name}: {', '.join(unexpected)}")
+                else:
+                    print(f"ok        {name}")
+    finally:
+        connection.rollback()
+        connection.close()
+    return ok
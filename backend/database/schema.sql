@@ -1,3 +1,6 @@
+-- Trigram matching for the store directory's name search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- First, create the custom ENUM types needed
 CREATE TYPE user_role AS ENUM ('customer', 'supplier', 'admin');
 CREATE TYPE order_status AS ENUM ('pending', 'processing', 'shipped', 'delivered', 'cancelled');
@@ -37,6 +40,9 @@ CREATE TABLE stores (
     is_active BOOLEAN DEFAULT TRUE,
     date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     avg_rating DECIMAL(3,2) DEFAULT 0,
+    active_product_count INTEGER NOT NULL DEFAULT 0, -- kept by the products_active_count trigger
+    latitude DOUBLE PRECISION, -- geocoded from city/address by utils/geo.py
+    longitude DOUBLE PRECISION,
     FOREIGN KEY (owner_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
@@ -47,6 +53,26 @@ CREATE TABLE categories (
     image_url VARCHAR(255)
 );
 
+-- Bumped on every change to a cached reference table; app processes compare it
+-- to their in-memory copy (utils/categories.py) and reload when it moved
+CREATE TABLE registry_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO registry_versions (name, version) VALUES ('categories', 0);
+
+CREATE FUNCTION bump_categories_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE registry_versions SET version = version + 1 WHERE name = 'categories';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER categories_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categories
+FOR EACH STATEMENT EXECUTE PROCEDURE bump_categories_version();
+
 CREATE TABLE products (
     product_id VARCHAR(36) PRIMARY KEY,
     store_id VARCHAR(36) NOT NULL,
@@ -56,6 +82,7 @@ CREATE TABLE products (
     price DECIMAL(10,2) NOT NULL,
     sale_price DECIMAL(10,2),
     stock_quantity INTEGER DEFAULT 0,
+    reserved_quantity INTEGER NOT NULL DEFAULT 0 CHECK (reserved_quantity >= 0), -- sum of active stock_reservations
     is_featured BOOLEAN DEFAULT FALSE,
     is_active BOOLEAN DEFAULT TRUE,
     date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -66,15 +93,73 @@ CREATE TABLE products (
     FOREIGN KEY (category_id) REFERENCES categories(category_id)
 );
 
+-- Content-addressed upload storage; ref_count is kept by the product_images trigger below
+CREATE TABLE stored_files (
+    content_hash VARCHAR(64) PRIMARY KEY, -- SHA-256 of the file contents
+    file_url VARCHAR(255) NOT NULL,
+    size_bytes BIGINT,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    orphaned_at TIMESTAMP, -- set when ref_count drops to 0, for utils/storage.py GC
+    date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_stored_files_orphaned_at ON stored_files (orphaned_at) WHERE ref_count <= 0;
+
 CREATE TABLE product_images (
     image_id VARCHAR(36) PRIMARY KEY,
     product_id VARCHAR(36) NOT NULL,
     image_url VARCHAR(255) NOT NULL,
+    content_hash VARCHAR(64),
+    renditions JSONB, -- {size: {format: url}} written by utils/images.py
     is_primary BOOLEAN DEFAULT FALSE,
     display_order INTEGER DEFAULT 0,
     FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
 );
 
+CREATE FUNCTION product_images_refcount() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.content_hash IS NOT DISTINCT FROM NEW.content_hash THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.content_hash IS NOT NULL THEN
+        UPDATE stored_files
+        SET ref_count = ref_count + 1, orphaned_at = NULL
+        WHERE content_hash = NEW.content_hash;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.content_hash IS NOT NULL THEN
+        UPDATE stored_files
+        SET ref_count = ref_count - 1,
+            orphaned_at = CASE WHEN ref_count - 1 <= 0 THEN CURRENT_TIMESTAMP ELSE orphaned_at END
+        WHERE content_hash = OLD.content_hash;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_images_refcount
+AFTER INSERT OR DELETE OR UPDATE OF content_hash ON product_images
+FOR EACH ROW EXECUTE PROCEDURE product_images_refcount();
+
+-- stores.active_product_count follows every insert, delete, activation and store move
+CREATE FUNCTION products_active_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.is_active IS NOT DISTINCT FROM NEW.is_active AND OLD.store_id = NEW.store_id THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.is_active IS TRUE THEN
+        UPDATE stores SET active_product_count = active_product_count - 1 WHERE store_id = OLD.store_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active IS TRUE THEN
+        UPDATE stores SET active_product_count = active_product_count + 1 WHERE store_id = NEW.store_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_active_count
+AFTER INSERT OR DELETE OR UPDATE OF is_active, store_id ON products
+FOR EACH ROW EXECUTE PROCEDURE products_active_count();
+
 CREATE TABLE orders (
     order_id VARCHAR(36) PRIMARY KEY,
     user_id VARCHAR(36) NOT NULL,
@@ -102,13 +187,13 @@ CREATE TABLE order_items (
     quantity INTEGER NOT NULL,
     unit_price DECIMAL(10,2) NOT NULL,
     total_price DECIMAL(10,2) NOT NULL,
-    FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE,
-    FOREIGN KEY (product_id) REFERENCES products(product_id)
+    FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE
+    -- product_id points at products or, once retired, archived_products (see product_history)
 );
 
 CREATE TABLE cart (
     cart_id VARCHAR(36) PRIMARY KEY,
-    user_id VARCHAR(36) NOT NULL,
+    user_id VARCHAR(36) NOT NULL UNIQUE,
     date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
@@ -119,8 +204,9 @@ CREATE TABLE cart_items (
     product_id VARCHAR(36) NOT NULL,
     quantity INTEGER NOT NULL DEFAULT 1,
     date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (cart_id, product_id),
     FOREIGN KEY (cart_id) REFERENCES cart(cart_id) ON DELETE CASCADE,
-    FOREIGN KEY (product_id) REFERENCES products(product_id)
+    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
 );
 
 CREATE TABLE reviews (
@@ -173,7 +259,7 @@ CREATE TABLE suppliers (
 
 CREATE TABLE wishlist (
     wishlist_id VARCHAR(36) PRIMARY KEY,
-    user_id VARCHAR(36) NOT NULL,
+    user_id VARCHAR(36) NOT NULL UNIQUE,
     date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
@@ -183,10 +269,92 @@ CREATE TABLE wishlist_items (
     wishlist_id VARCHAR(36) NOT NULL,
     product_id VARCHAR(36) NOT NULL,
     date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (wishlist_id, product_id),
     FOREIGN KEY (wishlist_id) REFERENCES wishlist(wishlist_id) ON DELETE CASCADE,
     FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
 );
 
+-- Short-lived stock holds taken when checkout begins; released on checkout or expiry
+CREATE TABLE stock_reservations (
+    reservation_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    product_id VARCHAR(36) NOT NULL,
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    expires_at TIMESTAMP NOT NULL,
+    date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_stock_reservations_expires_at ON stock_reservations (expires_at);
+CREATE INDEX idx_stock_reservations_user_id ON stock_reservations (user_id);
+
+-- Hot-table indexes only cover live inventory, which is all catalogue queries read
+CREATE INDEX idx_products_active_store_id ON products (store_id, date_created DESC) WHERE is_active = true;
+CREATE INDEX idx_products_active_category_id ON products (category_id, date_created DESC) WHERE is_active = true;
+CREATE INDEX idx_products_active_featured ON products (date_created DESC) WHERE is_active = true AND is_featured = true;
+
+-- Archive tier: retired products with their images and reviews, moved out by utils/archive.py
+CREATE TABLE archived_products (
+    product_id VARCHAR(36) PRIMARY KEY,
+    store_id VARCHAR(36) NOT NULL,
+    category_id VARCHAR(36),
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    price DECIMAL(10,2) NOT NULL,
+    sale_price DECIMAL(10,2),
+    stock_quantity INTEGER DEFAULT 0,
+    is_featured BOOLEAN DEFAULT FALSE,
+    avg_rating DECIMAL(3,2) DEFAULT 0,
+    loyalty_points_earned INTEGER DEFAULT 0,
+    date_created TIMESTAMP,
+    date_updated TIMESTAMP,
+    date_archived TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (store_id) REFERENCES stores(store_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_archived_products_store_id ON archived_products (store_id, date_archived DESC);
+
+CREATE TABLE archived_product_images (
+    image_id VARCHAR(36) PRIMARY KEY,
+    product_id VARCHAR(36) NOT NULL,
+    image_url VARCHAR(255) NOT NULL,
+    content_hash VARCHAR(64),
+    renditions JSONB,
+    is_primary BOOLEAN DEFAULT FALSE,
+    display_order INTEGER DEFAULT 0,
+    FOREIGN KEY (product_id) REFERENCES archived_products(product_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_archived_product_images_product_id ON archived_product_images (product_id);
+
+-- Archived images keep their files referenced, so storage GC leaves them alone
+CREATE TRIGGER archived_product_images_refcount
+AFTER INSERT OR DELETE OR UPDATE OF content_hash ON archived_product_images
+FOR EACH ROW EXECUTE PROCEDURE product_images_refcount();
+
+CREATE TABLE archived_reviews (
+    review_id VARCHAR(36) PRIMARY KEY,
+    product_id VARCHAR(36) NOT NULL,
+    user_id VARCHAR(36) NOT NULL,
+    rating INTEGER NOT NULL,
+    comment TEXT,
+    date_created TIMESTAMP,
+    is_verified_purchase BOOLEAN DEFAULT FALSE,
+    FOREIGN KEY (product_id) REFERENCES archived_products(product_id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_archived_reviews_product_id ON archived_reviews (product_id);
+
+-- Every product an order can refer to, live or archived; order history reads names from here
+CREATE VIEW product_history AS
+SELECT product_id, store_id, category_id, name, description, price, FALSE AS is_archived
+FROM products
+UNION ALL
+SELECT product_id, store_id, category_id, name, description, price, TRUE AS is_archived
+FROM archived_products;
+
 -- Analytics events for tracking views, clicks, and actions
 CREATE TYPE analytics_event_type AS ENUM ('view', 'click', 'add_to_cart', 'purchase');
 
@@ -199,11 +367,35 @@ CREATE TABLE IF NOT EXISTS analytics_events (
     metadata JSONB,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL,
-    FOREIGN KEY (store_id) REFERENCES stores(store_id) ON DELETE CASCADE,
-    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+    FOREIGN KEY (store_id) REFERENCES stores(store_id) ON DELETE CASCADE
+    -- product_id points at products or, once retired, archived_products (see product_history)
 );
 
 
+-- Indexes matching route queries; kept in sync with migrations/0001_route_indexes.sql and later index migrations
+CREATE INDEX idx_products_store_id ON products (store_id);
+CREATE INDEX idx_products_category_id ON products (category_id);
+CREATE INDEX idx_orders_user_id_date_created ON orders (user_id, date_created DESC);
+CREATE INDEX idx_orders_store_id_date_created ON orders (store_id, date_created DESC);
+CREATE INDEX idx_order_items_order_id ON order_items (order_id);
+CREATE INDEX idx_order_items_product_id ON order_items (product_id);
+CREATE INDEX idx_product_images_primary ON product_images (product_id) WHERE is_primary = true;
+CREATE INDEX idx_product_images_product_id ON product_images (product_id, display_order);
+CREATE INDEX idx_stores_owner_id ON stores (owner_id);
+CREATE INDEX idx_reviews_product_id ON reviews (product_id);
+CREATE INDEX idx_analytics_events_store_id_created_at ON analytics_events (store_id, created_at);
+CREATE INDEX idx_analytics_events_created_at ON analytics_events (created_at);
+CREATE INDEX idx_store_reviews_store_id_rating ON store_reviews (store_id, rating);
+CREATE INDEX idx_stores_leaderboard_products ON stores (active_product_count DESC, date_created DESC) WHERE is_active = true;
+CREATE INDEX idx_stores_leaderboard_rating ON stores (avg_rating DESC NULLS LAST, date_created DESC) WHERE is_active = true;
+CREATE INDEX idx_orders_date_created ON orders (date_created) INCLUDE (store_id, status);
+CREATE INDEX idx_stores_directory_name ON stores (name, store_id) WHERE is_active = true;
+CREATE INDEX idx_stores_directory_rating ON stores ((COALESCE(avg_rating, 0)) DESC, store_id DESC) WHERE is_active = true;
+CREATE INDEX idx_stores_directory_products ON stores (active_product_count DESC, store_id DESC) WHERE is_active = true;
+CREATE INDEX idx_stores_directory_city ON stores (lower(city), name, store_id) WHERE is_active = true;
+CREATE INDEX idx_stores_name_trgm ON stores USING gin (name gin_trgm_ops) WHERE is_active = true;
+CREATE INDEX idx_stores_location ON stores (latitude, longitude) WHERE is_active = true;
+
 INSERT INTO categories (category_id, name, description) VALUES 
 ('cat1', 'Cakes', 'Traditional and custom cakes'),
 ('cat2', 'Cupcakes', 'Individual portion cakes'),
@@ -0,0 +1,57 @@
+# Production server settings: gunicorn -c gunicorn.conf.py wsgi:app
+# Every value can be overridden from the environment (or on the command line).
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+# Requests block on psycopg2, so each core gets 2 processes plus one, and each
+# process a few threads to overlap database waits
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', '4'))
+worker_class = 'gthread'
+
+# Import the app once in the master; workers fork with route modules already
+# loaded and share those pages copy-on-write
+preload_app = os.getenv('PRELOAD_APP', 'true').lower() == 'true'
+
+# Recycle workers now and then so slow leaks cannot build up; jitter keeps
+# them from all restarting at once
+max_requests = int(os.getenv('MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', '100'))
+
+# On SIGTERM workers stop accepting, finish in-flight requests for up to
+# graceful_timeout seconds, then run worker_exit below
+timeout = int(os.getenv('WORKER_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('KEEPALIVE', '5'))
+
+accesslog = os.getenv('ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+# Startup (lazy blueprints, category preload, sweeper threads) runs on each
+# worker's first request; 'true' runs it at fork instead, costing every worker
+# its database round trips at boot
+warm_workers = os.getenv('WARM_WORKERS', 'false').lower() == 'true'
+
+
+def post_fork(server, worker):
+    """Drop per-process state inherited from the master.
+
+    There is no connection pool to reset: database.db opens a connection per
+    cursor, and create_app() no longer connects, so the master holds no sockets.
+    """
+    from utils.images import reset_image_workers
+    reset_image_workers()
+
+    if warm_workers:
+        from wsgi import app
+        app.wsgi_app.finish()
+    server.log.info(f"Worker {worker.pid} ready")
+
+
+def worker_exit(server, worker):
+    """Flush background work after the worker has drained its requests"""
+    from utils.images import shutdown_image_workers
+    shutdown_image_workers(wait=True)
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from utils.auth import role_required
+from utils.auth import role_required, get_owner_context
 from database.db import get_cursor
 import uuid
 import json
@@ -42,11 +42,10 @@ def supplier_overview():
     current_user_id = get_jwt_identity()
     try:
         with get_cursor() as cursor:
-            cursor.execute("SELECT store_id FROM stores WHERE owner_id = %s", (current_user_id,))
-            store = cursor.fetchone()
-            if not store:
+            owner = get_owner_context(cursor, current_user_id)
+            if not owner or not owner['store_id']:
                 return jsonify({"success": False, "message": "Store not found"}), 404
-            store_id = store['store_id']
+            store_id = owner['store_id']
 
             cursor.execute(
                 """
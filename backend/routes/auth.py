@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from database.db import get_cursor, get_db
 from utils.auth import hash_password
+from utils.geo import store_location
 from models.user import User
 import json
 import uuid
@@ -155,8 +156,8 @@ def register_supplier():
             cursor.execute("""
                 INSERT INTO stores (
                     store_id, owner_id, name, description, address, city,
-                    phone, opening_hours, is_active, date_created
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                    phone, opening_hours, is_active, latitude, longitude, date_created
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
             """, (
                 store_id,
                 user_id,
@@ -166,7 +167,8 @@ def register_supplier():
                 data.get('city', 'Not specified'),
                 data['business_phone'],
                 json.dumps(opening_hours_data),
-                True
+                True,
+                *store_location(data.get('city'), data['business_address'])
             ))
             
             print(f"DEBUG: Store insert affected {cursor.rowcount} rows")
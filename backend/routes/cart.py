@@ -1,95 +1,128 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database.db import get_cursor, get_db
+from utils.reservations import release_user_reservations, reserve_cart
+from utils.images import rendition_sql
 import uuid
 from datetime import datetime
 
 cart_bp = Blueprint('cart', __name__)
 
+CART_ITEMS_SQL = f"""
+    SELECT
+        c.cart_id,
+        ci.cart_item_id,
+        ci.product_id,
+        ci.quantity,
+        ci.date_added,
+        p.name,
+        p.description,
+        p.price,
+        p.sale_price,
+        p.stock_quantity,
+        GREATEST(p.stock_quantity - p.reserved_quantity, 0) as available_quantity,
+        s.name as store_name,
+        s.store_id,
+        {rendition_sql('card')} as primary_image_url,
+        COALESCE(NULLIF(p.sale_price, 0), p.price) as effective_price,
+        COALESCE(NULLIF(p.sale_price, 0), p.price) * ci.quantity as item_total,
+        COALESCE(SUM(ci.quantity) OVER (), 0) as total_items,
+        COALESCE(SUM(COALESCE(NULLIF(p.sale_price, 0), p.price) * ci.quantity) OVER (), 0) as total_amount
+    FROM cart c
+    LEFT JOIN (
+        cart_items ci
+        JOIN products p ON ci.product_id = p.product_id AND p.is_active = true
+        JOIN stores s ON p.store_id = s.store_id
+        LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = true
+    ) ON ci.cart_id = c.cart_id
+    WHERE c.user_id = %s
+    ORDER BY ci.date_added DESC
+"""
+
+CART_SUMMARY_SQL = """
+    SELECT
+        COALESCE(SUM(ci.quantity), 0) as total_items,
+        COALESCE(SUM(COALESCE(NULLIF(p.sale_price, 0), p.price) * ci.quantity), 0) as total_amount
+    FROM cart c
+    JOIN cart_items ci ON c.cart_id = ci.cart_id
+    JOIN products p ON ci.product_id = p.product_id AND p.is_active = true
+    WHERE c.user_id = %s
+"""
+
+def fetch_cart(cursor, user_id):
+    """Load the user's cart, items and SQL-computed totals in one statement.
+
+    Does not create a cart; users without one get an empty cart with no id.
+    """
+    cursor.execute(CART_ITEMS_SQL, (user_id,))
+    rows = cursor.fetchall()
+
+    cart_id = rows[0]['cart_id'] if rows else None
+    total_items = int(rows[0]['total_items']) if rows else 0
+    total_amount = float(rows[0]['total_amount']) if rows else 0.0
+
+    items_list = []
+    for item in rows:
+        if not item['cart_item_id']:
+            # Cart exists but has no live items
+            continue
+
+        items_list.append({
+            'cart_item_id': item['cart_item_id'],
+            'product_id': item['product_id'],
+            'name': item['name'],
+            'description': item['description'],
+            'price': float(item['price']),
+            'sale_price': float(item['sale_price']) if item['sale_price'] else None,
+            'effective_price': float(item['effective_price']),
+            'quantity': item['quantity'],
+            'item_total': float(item['item_total']),
+            'stock_quantity': item['stock_quantity'],
+            'available_quantity': item['available_quantity'],
+            'store_name': item['store_name'],
+            'store_id': item['store_id'],
+            'image_url': item['primary_image_url'],
+            'date_added': item['date_added'].isoformat() if item['date_added'] else None
+        })
+
+    return {
+        'cart_id': cart_id,
+        'items': items_list,
+        'total_items': total_items,
+        'total_amount': total_amount
+    }
+
+def fetch_cart_summary(cursor, user_id):
+    """Get item count and total amount of the user's cart without item rows"""
+    cursor.execute(CART_SUMMARY_SQL, (user_id,))
+    result = cursor.fetchone()
+
+    return {
+        'total_items': int(result['total_items']) if result else 0,
+        'total_amount': float(result['total_amount']) if result else 0.0
+    }
+
 @cart_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_cart():
-    """Get user's cart with items"""
+    """Get user's cart with items, or only its totals with ?summary=true"""
     try:
         user_id = get_jwt_identity()
+        summary_only = request.args.get('summary', 'false').lower() == 'true'
         
         with get_cursor() as cursor:
-            # Get or create cart for user
-            cursor.execute("SELECT cart_id FROM cart WHERE user_id = %s", (user_id,))
-            cart = cursor.fetchone()
-            
-            if not cart:
-                # Create cart if it doesn't exist
-                cart_id = str(uuid.uuid4())
-                cursor.execute(
-                    "INSERT INTO cart (cart_id, user_id, date_created) VALUES (%s, %s, %s)",
-                    (cart_id, user_id, datetime.utcnow())
-                )
-                cart_id = cart_id
-            else:
-                cart_id = cart['cart_id']
-            
-            # Get cart items with product details
-            cursor.execute("""
-                SELECT 
-                    ci.cart_item_id,
-                    ci.product_id,
-                    ci.quantity,
-                    ci.date_added,
-                    p.name,
-                    p.description,
-                    p.price,
-                    p.sale_price,
-                    p.stock_quantity,
-                    s.name as store_name,
-                    s.store_id,
-                    pi.image_url as primary_image_url
-                FROM cart_items ci
-                JOIN products p ON ci.product_id = p.product_id
-                JOIN stores s ON p.store_id = s.store_id
-                LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = true
-                WHERE ci.cart_id = %s AND p.is_active = true
-                ORDER BY ci.date_added DESC
-            """, (cart_id,))
-            
-            cart_items = cursor.fetchall()
-            
-            # Calculate totals
-            total_amount = 0
-            total_items = 0
+            if summary_only:
+                summary = fetch_cart_summary(cursor, user_id)
+                return jsonify({
+                    'success': True,
+                    'summary': summary
+                }), 200
             
-            items_list = []
-            for item in cart_items:
-                effective_price = item['sale_price'] if item['sale_price'] else item['price']
-                item_total = float(effective_price) * item['quantity']
-                total_amount += item_total
-                total_items += item['quantity']
-                
-                items_list.append({
-                    'cart_item_id': item['cart_item_id'],
-                    'product_id': item['product_id'],
-                    'name': item['name'],
-                    'description': item['description'],
-                    'price': float(item['price']),
-                    'sale_price': float(item['sale_price']) if item['sale_price'] else None,
-                    'effective_price': float(effective_price),
-                    'quantity': item['quantity'],
-                    'item_total': item_total,
-                    'stock_quantity': item['stock_quantity'],
-                    'store_name': item['store_name'],
-                    'store_id': item['store_id'],
-                    'image_url': item['primary_image_url'],
-                    'date_added': item['date_added'].isoformat() if item['date_added'] else None
-                })
+            cart = fetch_cart(cursor, user_id)
         
         return jsonify({
             'success': True,
-            'cart': {
-                'cart_id': cart_id,
-                'items': items_list,
-                'total_items': total_items,
-                'total_amount': total_amount
-            }
+            'cart': cart
         }), 200
         
     except Exception as e:
@@ -99,6 +132,34 @@ def get_cart():
             'message': f'Error getting cart: {str(e)}'
         }), 500
 
+ADD_TO_CART_SQL = """
+    WITH user_cart AS (
+        INSERT INTO cart (cart_id, user_id, date_created)
+        VALUES (%(new_cart_id)s, %(user_id)s, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id) DO UPDATE SET user_id = EXCLUDED.user_id
+        RETURNING cart_id
+    ),
+    product AS (
+        SELECT product_id, name, stock_quantity - reserved_quantity as available_quantity
+        FROM products
+        WHERE product_id = %(product_id)s AND is_active = true
+    ),
+    upserted AS (
+        INSERT INTO cart_items (cart_item_id, cart_id, product_id, quantity, date_added)
+        SELECT %(new_item_id)s, user_cart.cart_id, product.product_id, %(quantity)s, CURRENT_TIMESTAMP
+        FROM user_cart, product
+        WHERE product.available_quantity >= %(quantity)s
+        ON CONFLICT (cart_id, product_id) DO UPDATE
+        SET quantity = cart_items.quantity + EXCLUDED.quantity,
+            date_added = EXCLUDED.date_added
+        WHERE (SELECT available_quantity FROM product) >= cart_items.quantity + EXCLUDED.quantity
+        RETURNING cart_item_id, product_id, quantity
+    )
+    SELECT upserted.cart_item_id, upserted.quantity, product.name
+    FROM upserted
+    JOIN product ON upserted.product_id = product.product_id
+"""
+
 @cart_bp.route('/items', methods=['POST'])
 @jwt_required()
 def add_to_cart():
@@ -123,95 +184,231 @@ def add_to_cart():
                 'message': 'Quantity must be greater than 0'
             }), 400
         
-        db = get_db()
-        
         with get_cursor() as cursor:
-            # Check if product exists and is active
-            cursor.execute("""
-                SELECT product_id, name, stock_quantity, is_active 
-                FROM products 
-                WHERE product_id = %s
-            """, (product_id,))
-            product = cursor.fetchone()
+            # Create the cart if needed and insert or increment the line in one statement
+            cursor.execute(ADD_TO_CART_SQL, {
+                'new_cart_id': str(uuid.uuid4()),
+                'new_item_id': str(uuid.uuid4()),
+                'user_id': user_id,
+                'product_id': product_id,
+                'quantity': quantity
+            })
+            added = cursor.fetchone()
             
-            if not product:
-                return jsonify({
-                    'success': False,
-                    'message': 'Product not found'
-                }), 404
-            
-            if not product['is_active']:
-                return jsonify({
-                    'success': False,
-                    'message': 'Product is not available'
-                }), 400
-            
-            if product['stock_quantity'] < quantity:
+            if not added:
+                # Nothing was written - work out why for the error message
+                cursor.execute("""
+                    SELECT p.name, p.is_active, COALESCE(ci.quantity, 0) as in_cart,
+                           GREATEST(p.stock_quantity - p.reserved_quantity, 0) as available_quantity
+                    FROM products p
+                    LEFT JOIN cart c ON c.user_id = %s
+                    LEFT JOIN cart_items ci ON ci.cart_id = c.cart_id AND ci.product_id = p.product_id
+                    WHERE p.product_id = %s
+                """, (user_id, product_id))
+                product = cursor.fetchone()
+                
+                if not product:
+                    return jsonify({
+                        'success': False,
+                        'message': 'Product not found'
+                    }), 404
+                
+                if not product['is_active']:
+                    return jsonify({
+                        'success': False,
+                        'message': 'Product is not available'
+                    }), 400
+                
+                if product['in_cart']:
+                    return jsonify({
+                        'success': False,
+                        'message': f'Cannot add {quantity} more items. Only {max(product["available_quantity"] - product["in_cart"], 0)} more available'
+                    }), 400
+                
                 return jsonify({
                     'success': False,
-                    'message': f'Only {product["stock_quantity"]} items available in stock'
+                    'message': f'Only {product["available_quantity"]} items available in stock'
                 }), 400
+        
+        return jsonify({
+            'success': True,
+            'message': f'{added["name"]} added to cart successfully',
+            'cart_item_id': added['cart_item_id'],
+            'quantity': added['quantity']
+        }), 201
+        
+    except Exception as e:
+        print(f"Error adding to cart: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error adding to cart: {str(e)}'
+        }), 500
+
+CART_OPERATIONS = ('set', 'increment', 'remove')
+
+def normalize_cart_operations(operations):
+    """Fold a list of cart operations into one net operation per product.
+
+    Returns ({product_id: (op, quantity)}, None) or (None, error message).
+    Operations apply in order, so a later 'set' overrides earlier ones and
+    a 'set' to 0 is a 'remove'.
+    """
+    if not isinstance(operations, list) or not operations:
+        return None, 'operations must be a non-empty list'
+    
+    net = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or not operation.get('product_id'):
+            return None, f'Operation {index}: product_id is required'
+        
+        op = operation.get('op', 'set')
+        if op not in CART_OPERATIONS:
+            return None, f'Operation {index}: op must be one of {", ".join(CART_OPERATIONS)}'
+        
+        quantity = 0
+        if op != 'remove':
+            try:
+                quantity = int(operation.get('quantity', 1))
+            except (TypeError, ValueError):
+                return None, f'Operation {index}: quantity must be an integer'
             
-            # Get or create cart
-            cursor.execute("SELECT cart_id FROM cart WHERE user_id = %s", (user_id,))
-            cart = cursor.fetchone()
-            
-            if not cart:
-                cart_id = str(uuid.uuid4())
-                cursor.execute(
-                    "INSERT INTO cart (cart_id, user_id, date_created) VALUES (%s, %s, %s)",
-                    (cart_id, user_id, datetime.utcnow())
-                )
+            if quantity < 0 or (op == 'increment' and quantity == 0):
+                return None, f'Operation {index}: invalid quantity {quantity}'
+        
+        product_id = operation['product_id']
+        previous = net.get(product_id)
+        
+        if op == 'increment' and previous:
+            previous_op, previous_quantity = previous
+            if previous_op == 'remove':
+                net[product_id] = ('set', quantity)
             else:
-                cart_id = cart['cart_id']
-            
-            # Check if item already exists in cart
+                net[product_id] = (previous_op, previous_quantity + quantity)
+        elif op == 'set' and quantity == 0:
+            net[product_id] = ('remove', 0)
+        else:
+            net[product_id] = (op, quantity)
+    
+    return net, None
+
+@cart_bp.route('/items', methods=['PATCH'])
+@jwt_required()
+def bulk_update_cart():
+    """Apply set/increment/remove operations to many cart items in one transaction.
+
+    Body: {"operations": [{"product_id": ..., "op": "set|increment|remove", "quantity": n}]}
+    Returns the updated cart. If any operation is invalid nothing is applied.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.json or {}
+        
+        net, error = normalize_cart_operations(data.get('operations'))
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        removed_ids = [pid for pid, (op, _) in net.items() if op == 'remove']
+        upserts = [(pid, op, quantity) for pid, (op, quantity) in net.items() if op != 'remove']
+        
+        with get_cursor() as cursor:
+            # Lock (or lazily create) the cart row so concurrent edits of the same cart serialize
             cursor.execute("""
-                SELECT cart_item_id, quantity 
-                FROM cart_items 
-                WHERE cart_id = %s AND product_id = %s
-            """, (cart_id, product_id))
-            existing_item = cursor.fetchone()
+                INSERT INTO cart (cart_id, user_id, date_created)
+                VALUES (%s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO UPDATE SET user_id = EXCLUDED.user_id
+                RETURNING cart_id
+            """, (str(uuid.uuid4()), user_id))
+            cart_id = cursor.fetchone()['cart_id']
             
-            if existing_item:
-                # Update existing item quantity
-                new_quantity = existing_item['quantity'] + quantity
+            if upserts:
+                params = {
+                    'cart_id': cart_id,
+                    'item_ids': [str(uuid.uuid4()) for _ in upserts],
+                    'product_ids': [pid for pid, _, _ in upserts],
+                    'quantities': [quantity for _, _, quantity in upserts],
+                    'increments': [op == 'increment' for _, op, _ in upserts]
+                }
+                targets_cte = """
+                    WITH ops AS (
+                        SELECT *
+                        FROM unnest(%(item_ids)s::varchar[], %(product_ids)s::varchar[],
+                                    %(quantities)s::integer[], %(increments)s::boolean[])
+                             AS o(new_item_id, product_id, quantity, is_increment)
+                    ),
+                    targets AS (
+                        SELECT
+                            ops.new_item_id,
+                            ops.product_id,
+                            p.product_id IS NOT NULL as product_exists,
+                            COALESCE(p.is_active, false) as is_active,
+                            p.stock_quantity - p.reserved_quantity as available_quantity,
+                            CASE WHEN ops.is_increment
+                                 THEN COALESCE(ci.quantity, 0) + ops.quantity
+                                 ELSE ops.quantity
+                            END as quantity
+                        FROM ops
+                        LEFT JOIN products p ON p.product_id = ops.product_id
+                        LEFT JOIN cart_items ci ON ci.cart_id = %(cart_id)s AND ci.product_id = ops.product_id
+                    )
+                """
                 
-                if product['stock_quantity'] < new_quantity:
+                # Validate every operation against current stock in one query
+                cursor.execute(targets_cte + """
+                    SELECT product_id, product_exists, is_active, available_quantity, quantity
+                    FROM targets
+                    WHERE NOT is_active OR available_quantity < quantity
+                """, params)
+                problems = cursor.fetchall()
+                
+                if problems:
+                    errors = []
+                    for problem in problems:
+                        if not problem['product_exists']:
+                            message = 'Product not found'
+                        elif not problem['is_active']:
+                            message = 'Product is not available'
+                        else:
+                            message = f'Only {max(problem["available_quantity"], 0)} items available in stock'
+                        errors.append({'product_id': problem['product_id'], 'message': message})
+                    
+                    cursor.connection.rollback()
                     return jsonify({
                         'success': False,
-                        'message': f'Cannot add {quantity} more items. Only {product["stock_quantity"] - existing_item["quantity"]} more available'
+                        'message': 'Some cart operations could not be applied',
+                        'errors': errors
                     }), 400
                 
-                cursor.execute("""
-                    UPDATE cart_items 
-                    SET quantity = %s, date_added = %s 
-                    WHERE cart_item_id = %s
-                """, (new_quantity, datetime.utcnow(), existing_item['cart_item_id']))
-                
-                cart_item_id = existing_item['cart_item_id']
-            else:
-                # Add new item to cart
-                cart_item_id = str(uuid.uuid4())
-                cursor.execute("""
+                cursor.execute(targets_cte + """
                     INSERT INTO cart_items (cart_item_id, cart_id, product_id, quantity, date_added)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (cart_item_id, cart_id, product_id, quantity, datetime.utcnow()))
-        
-        db.commit()
+                    SELECT new_item_id, %(cart_id)s, product_id, quantity, CURRENT_TIMESTAMP
+                    FROM targets
+                    ON CONFLICT (cart_id, product_id) DO UPDATE
+                    SET quantity = EXCLUDED.quantity,
+                        date_added = EXCLUDED.date_added
+                """, params)
+            
+            if removed_ids:
+                cursor.execute("""
+                    DELETE FROM cart_items
+                    WHERE cart_id = %s AND product_id = ANY(%s)
+                """, (cart_id, removed_ids))
+            
+            cart = fetch_cart(cursor, user_id)
         
         return jsonify({
             'success': True,
-            'message': f'{product["name"]} added to cart successfully',
-            'cart_item_id': cart_item_id
-        }), 201
+            'message': 'Cart updated successfully',
+            'cart': cart
+        }), 200
         
     except Exception as e:
-        db.rollback()
-        print(f"Error adding to cart: {e}")
+        print(f"Error bulk updating cart: {e}")
         return jsonify({
             'success': False,
-            'message': f'Error adding to cart: {str(e)}'
+            'message': f'Error updating cart: {str(e)}'
         }), 500
 
 @cart_bp.route('/items/<item_id>', methods=['PUT'])
@@ -241,7 +438,8 @@ def update_cart_item(item_id):
         with get_cursor() as cursor:
             # Verify user owns this cart item
             cursor.execute("""
-                SELECT ci.cart_item_id, ci.product_id, p.name, p.stock_quantity
+                SELECT ci.cart_item_id, ci.product_id, p.name,
+                       GREATEST(p.stock_quantity - p.reserved_quantity, 0) as available_quantity
                 FROM cart_items ci
                 JOIN cart c ON ci.cart_id = c.cart_id
                 JOIN products p ON ci.product_id = p.product_id
@@ -256,10 +454,10 @@ def update_cart_item(item_id):
                     'message': 'Cart item not found'
                 }), 404
             
-            if cart_item['stock_quantity'] < quantity:
+            if cart_item['available_quantity'] < quantity:
                 return jsonify({
                     'success': False,
-                    'message': f'Only {cart_item["stock_quantity"]} items available in stock'
+                    'message': f'Only {cart_item["available_quantity"]} items available in stock'
                 }), 400
             
             # Update quantity
@@ -362,6 +560,238 @@ def clear_cart():
             'message': f'Error clearing cart: {str(e)}'
         }), 500
 
+@cart_bp.route('/checkout/begin', methods=['POST'])
+@jwt_required()
+def begin_checkout():
+    """Hold stock for every item in the cart while the user completes payment.
+
+    Holds expire after RESERVATION_TTL_MINUTES and are released by the sweeper;
+    POST /checkout converts them into orders.
+    """
+    try:
+        user_id = get_jwt_identity()
+        
+        with get_cursor() as cursor:
+            cursor.execute("SELECT cart_id FROM cart WHERE user_id = %s FOR UPDATE", (user_id,))
+            cart = cursor.fetchone()
+            
+            if not cart:
+                return jsonify({
+                    'success': False,
+                    'message': 'Your cart is empty'
+                }), 400
+            
+            reserved, result = reserve_cart(cursor, user_id, cart['cart_id'])
+            
+            if not reserved:
+                cursor.connection.rollback()
+                return jsonify({
+                    'success': False,
+                    'message': 'Some items are unavailable or out of stock',
+                    'unavailable': result
+                }), 409
+            
+            if result is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'Your cart is empty'
+                }), 400
+        
+        return jsonify({
+            'success': True,
+            'message': 'Items reserved for checkout',
+            'expires_at': result.isoformat()
+        }), 200
+        
+    except Exception as e:
+        print(f"Error beginning checkout: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error beginning checkout: {str(e)}'
+        }), 500
+
+@cart_bp.route('/checkout', methods=['POST'])
+@jwt_required()
+def checkout_cart():
+    """Turn the user's cart into orders, one per store, in a single transaction.
+
+    Prices, totals and stock come from the database, never from the client.
+    The statement count is fixed regardless of how many items are in the cart.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.json or {}
+        
+        required_fields = ['shipping_address', 'shipping_city', 'shipping_phone']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({
+                    'success': False,
+                    'message': f'{field} is required'
+                }), 400
+        
+        with get_cursor() as cursor:
+            # Lock the cart so a concurrent add or second checkout waits for us
+            cursor.execute("SELECT cart_id FROM cart WHERE user_id = %s FOR UPDATE", (user_id,))
+            cart = cursor.fetchone()
+            
+            if not cart:
+                return jsonify({
+                    'success': False,
+                    'message': 'Your cart is empty'
+                }), 400
+            
+            cart_id = cart['cart_id']
+            
+            # Group the cart by store and collect anything that cannot be ordered;
+            # this user's own holds (from /checkout/begin) count as available to them
+            cursor.execute("""
+                SELECT
+                    p.store_id,
+                    s.name as store_name,
+                    s.owner_id,
+                    COUNT(*) as line_count,
+                    array_agg(p.name) FILTER (
+                        WHERE NOT p.is_active
+                           OR p.stock_quantity - p.reserved_quantity + COALESCE(held.quantity, 0) < ci.quantity
+                    ) as unavailable
+                FROM cart_items ci
+                JOIN products p ON ci.product_id = p.product_id
+                JOIN stores s ON p.store_id = s.store_id
+                LEFT JOIN (
+                    SELECT product_id, SUM(quantity) as quantity
+                    FROM stock_reservations
+                    WHERE user_id = %s
+                    GROUP BY product_id
+                ) held ON held.product_id = p.product_id
+                WHERE ci.cart_id = %s
+                GROUP BY p.store_id, s.name, s.owner_id
+            """, (user_id, cart_id))
+            stores = cursor.fetchall()
+            
+            if not stores:
+                return jsonify({
+                    'success': False,
+                    'message': 'Your cart is empty'
+                }), 400
+            
+            for store in stores:
+                if store['owner_id'] == user_id:
+                    return jsonify({
+                        'success': False,
+                        'message': f'You cannot order products from your own store "{store["store_name"]}". Please remove them from your cart.'
+                    }), 403
+            
+            unavailable = [name for store in stores for name in (store['unavailable'] or [])]
+            if unavailable:
+                return jsonify({
+                    'success': False,
+                    'message': 'Some items are unavailable or out of stock',
+                    'unavailable': unavailable
+                }), 400
+            
+            line_count = sum(store['line_count'] for store in stores)
+            params = {
+                'user_id': user_id,
+                'cart_id': cart_id,
+                'order_ids': [str(uuid.uuid4()) for _ in stores],
+                'store_ids': [store['store_id'] for store in stores],
+                'item_ids': [str(uuid.uuid4()) for _ in range(line_count)],
+                'payment_method': data.get('payment_method', 'Credit Card'),
+                'shipping_address': data['shipping_address'],
+                'shipping_city': data['shipping_city'],
+                'shipping_phone': data['shipping_phone'],
+                'order_notes': data.get('order_notes', '')
+            }
+            
+            # Validation passed: hand back this user's holds so the units count as available to them
+            release_user_reservations(cursor, user_id)
+            
+            # Decrement stock for every line; a short count means stock moved since validation
+            cursor.execute("""
+                UPDATE products p
+                SET stock_quantity = p.stock_quantity - ci.quantity,
+                    date_updated = CURRENT_TIMESTAMP
+                FROM cart_items ci
+                WHERE ci.cart_id = %(cart_id)s
+                  AND ci.product_id = p.product_id
+                  AND p.is_active = true
+                  AND p.stock_quantity - p.reserved_quantity >= ci.quantity
+            """, params)
+            
+            if cursor.rowcount != line_count:
+                cursor.connection.rollback()
+                return jsonify({
+                    'success': False,
+                    'message': 'Stock changed while checking out. Please review your cart and try again.'
+                }), 409
+            
+            cursor.execute("""
+                INSERT INTO orders (
+                    order_id, user_id, store_id, total_amount, status, payment_status,
+                    payment_method, shipping_address, shipping_city, shipping_phone,
+                    order_notes, loyalty_points_earned, date_created, date_updated
+                )
+                SELECT
+                    o.order_id, %(user_id)s, o.store_id,
+                    SUM(COALESCE(NULLIF(p.sale_price, 0), p.price) * ci.quantity),
+                    'pending', 'paid',
+                    %(payment_method)s, %(shipping_address)s, %(shipping_city)s, %(shipping_phone)s,
+                    %(order_notes)s, COALESCE(SUM(p.loyalty_points_earned * ci.quantity), 0),
+                    CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+                FROM unnest(%(order_ids)s::varchar[], %(store_ids)s::varchar[]) AS o(order_id, store_id)
+                JOIN products p ON p.store_id = o.store_id
+                JOIN cart_items ci ON ci.product_id = p.product_id AND ci.cart_id = %(cart_id)s
+                GROUP BY o.order_id, o.store_id
+                RETURNING order_id, store_id, total_amount, loyalty_points_earned
+            """, params)
+            orders = cursor.fetchall()
+            
+            cursor.execute("""
+                INSERT INTO order_items (
+                    order_item_id, order_id, product_id, quantity, unit_price, total_price
+                )
+                SELECT
+                    (%(item_ids)s::varchar[])[row_number() OVER (ORDER BY ci.cart_item_id)],
+                    o.order_id, ci.product_id, ci.quantity,
+                    COALESCE(NULLIF(p.sale_price, 0), p.price),
+                    COALESCE(NULLIF(p.sale_price, 0), p.price) * ci.quantity
+                FROM cart_items ci
+                JOIN products p ON ci.product_id = p.product_id
+                JOIN unnest(%(order_ids)s::varchar[], %(store_ids)s::varchar[]) AS o(order_id, store_id)
+                     ON o.store_id = p.store_id
+                WHERE ci.cart_id = %(cart_id)s
+            """, params)
+            
+            cursor.execute("DELETE FROM cart_items WHERE cart_id = %(cart_id)s", params)
+        
+        store_names = {store['store_id']: store['store_name'] for store in stores}
+        orders_list = [{
+            'order_id': order['order_id'],
+            'store_id': order['store_id'],
+            'store_name': store_names.get(order['store_id']),
+            'total_amount': float(order['total_amount']),
+            'loyalty_points_earned': order['loyalty_points_earned'],
+            'status': 'pending',
+            'payment_status': 'paid'
+        } for order in orders]
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(orders_list)} order(s) created successfully',
+            'orders': orders_list,
+            'total_amount': sum(order['total_amount'] for order in orders_list)
+        }), 201
+        
+    except Exception as e:
+        print(f"Error checking out cart: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'message': f'Error checking out: {str(e)}'
+        }), 500
+
 @cart_bp.route('/count', methods=['GET'])
 @jwt_required()
 def get_cart_count():
@@ -370,19 +800,12 @@ def get_cart_count():
         user_id = get_jwt_identity()
         
         with get_cursor() as cursor:
-            cursor.execute("""
-                SELECT COALESCE(SUM(ci.quantity), 0) as total_items
-                FROM cart c
-                LEFT JOIN cart_items ci ON c.cart_id = ci.cart_id
-                WHERE c.user_id = %s
-            """, (user_id,))
-            
-            result = cursor.fetchone()
-            total_items = result['total_items'] if result else 0
+            summary = fetch_cart_summary(cursor, user_id)
         
         return jsonify({
             'success': True,
-            'count': total_items
+            'count': summary['total_items'],
+            'total_amount': summary['total_amount']
         }), 200
         
     except Exception as e:
@@ -390,4 +813,4 @@ def get_cart_count():
         return jsonify({
             'success': False,
             'message': f'Error getting cart count: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from database.db import get_cursor
+from utils.categories import refresh_categories
 
 categories_bp = Blueprint('categories', __name__)
 
@@ -9,18 +9,8 @@ categories_bp = Blueprint('categories', __name__)
 def get_categories():
     """Get all categories"""
     try:
-        with get_cursor() as cursor:
-            sql = "SELECT category_id, name, description FROM categories ORDER BY name"
-            cursor.execute(sql)
-            categories = cursor.fetchall()
-            
-            categories_list = []
-            for category in categories:
-                categories_list.append({
-                    'category_id': category['category_id'],
-                    'name': category['name'],
-                    'description': category['description']
-                })
+        # Served from the in-memory registry; see utils/categories.py
+        categories_list = refresh_categories().categories
         
         return jsonify({
             'success': True,
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from utils.auth import role_required
+from psycopg2.extras import RealDictCursor
+from utils.auth import role_required, get_owner_context
+from utils.reservations import release_user_reservations
 from database.db import get_cursor, get_db  # Use your existing database functions
 from datetime import datetime, date
 import uuid
@@ -122,12 +124,8 @@ def get_supplier_orders():
         
         with get_cursor() as cursor:
             # First, get the supplier's store
-            cursor.execute("""
-                SELECT store_id, name FROM stores 
-                WHERE owner_id = %s AND is_active = TRUE
-            """, (user_id,))
-            
-            store = cursor.fetchone()
+            owner = get_owner_context(cursor, user_id)
+            store = {'store_id': owner['store_id'], 'name': owner['store_name']} if owner and owner['store_is_active'] else None
             print(f"DEBUG: Supplier store: {store}")
             
             if not store:
@@ -291,7 +289,7 @@ def get_order_details(order_id):
                     p.name as product_name,
                     p.description
                 FROM order_items oi
-                JOIN products p ON oi.product_id = p.product_id
+                JOIN product_history p ON oi.product_id = p.product_id
                 WHERE oi.order_id = %s
             """, (order_id,))
             
@@ -371,8 +369,7 @@ def create_order():
         
         with get_cursor() as cursor:
             # Check if user exists (but don't restrict by role yet)
-            cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
-            user_result = cursor.fetchone()
+            user_result = get_owner_context(cursor, user_id)
             
             if not user_result:
                 return jsonify({
@@ -455,9 +452,12 @@ def create_order():
         order_notes = data.get('order_notes', '')
         
         db = get_db()
-        with db.cursor() as cursor:
+        with db.cursor(cursor_factory=RealDictCursor) as cursor:
             print(f"DEBUG: Creating order for store: {store_id}")
             
+            # Hand back this user's checkout holds so they don't block their own order
+            release_user_reservations(cursor, user_id)
+            
             # Create the order
             cursor.execute("""
                 INSERT INTO orders (
@@ -493,16 +493,17 @@ def create_order():
                 
                 print(f"DEBUG: Order item {i+1} inserted, affected rows: {cursor.rowcount}")
                 
-                # Update product stock
+                # Update product stock, leaving units held by other shoppers' checkouts alone
                 cursor.execute("""
                     UPDATE products 
                     SET stock_quantity = stock_quantity - %s 
-                    WHERE product_id = %s AND stock_quantity >= %s
+                    WHERE product_id = %s AND stock_quantity - reserved_quantity >= %s
                 """, (quantity, item['product_id'], quantity))
                 
                 print(f"DEBUG: Stock update affected rows: {cursor.rowcount}")
                 
                 if cursor.rowcount == 0:
+                    db.rollback()
                     return jsonify({
                         'success': False,
                         'message': f'Insufficient stock for product {item["product_id"]}'
@@ -696,21 +697,17 @@ def get_store_orders(store_id):
 def get_order_stats():
     """Get order statistics for the authenticated store"""
     try:
-        current_user_id = get_jwt_identity()
-        
         with get_cursor() as cursor:
             # Get the store_id for this user
-            store_query = "SELECT store_id FROM stores WHERE owner_id = %s"
-            cursor.execute(store_query, (current_user_id,))
-            store_result = cursor.fetchone()
+            owner = get_owner_context(cursor)
             
-            if not store_result:
+            if not owner or not owner['store_id']:
                 return jsonify({
                     'success': False,
                     'message': 'Store not found for this user'
                 }), 404
             
-            store_id = store_result['store_id']
+            store_id = owner['store_id']
             
             # First, let's check what enum values exist for order_status
             cursor.execute("""
@@ -733,7 +730,7 @@ def get_order_stats():
                     COUNT(DISTINCT CASE WHEN DATE(o.date_created) = CURRENT_DATE THEN o.order_id END) as orders_today
                 FROM orders o
                 JOIN order_items oi ON o.order_id = oi.order_id
-                JOIN products p ON oi.product_id = p.product_id
+                JOIN product_history p ON oi.product_id = p.product_id
                 WHERE p.store_id = %s
             """
             
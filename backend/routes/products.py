@@ -1,92 +1,106 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database.db import get_cursor, get_db  # Use your existing database functions
+from psycopg2 import DataError
+from psycopg2.extras import execute_values
+from utils.reservations import AVAILABLE_STOCK_SQL
+from utils.images import queue_product_image, rendition_sql
+from utils.storage import store_stream, normalize_extension
+from utils.uploads import UploadStream, stream_uploads
+from utils.archive import archive_products, restore_products
+from utils.product_transfer import import_products, export_rows, export_header, format_export_row
+from utils.facets import facet_cache, facet_cache_key, facet_query, format_facets, normalize_filters
+from utils.categories import category_name, refresh_categories
+from utils.auth import get_owner_context
+from werkzeug.exceptions import UnsupportedMediaType
 from datetime import datetime
-import os
-from werkzeug.utils import secure_filename
+import csv
+import io
 import uuid
 
 products_bp = Blueprint('products', __name__)
 
 # Configuration for file uploads
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', 'products')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_IMPORT_SIZE = 20 * 1024 * 1024  # 20MB
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+MAX_BULK_UPDATES = 500
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def save_product_image(image_file):
-    """Save uploaded image and return the file path"""
-    if not image_file or not allowed_file(image_file.filename):
+    """Save uploaded image to content-addressed storage.
+
+    Returns {'content_hash', 'url', 'size_bytes', 'deduplicated'}, or None for an invalid file.
+    Identical uploads share one file on disk. The file is registered in stored_files
+    as an orphan, so GC reclaims it if the product_images insert never commits.
+    """
+    if not image_file:
         return None
     
-    # Create upload directory if it doesn't exist
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    
-    # Generate unique filename
-    filename = secure_filename(image_file.filename)
-    unique_filename = f"{uuid.uuid4()}_{filename}"
-    file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
+    if isinstance(image_file.stream, UploadStream):
+        # Already streamed, hashed and type-checked by @stream_uploads
+        try:
+            return image_file.stream.commit()
+        except UnsupportedMediaType:
+            return None
     
-    # Save the file
-    image_file.save(file_path)
+    if not allowed_file(image_file.filename):
+        return None
     
-    # Return relative path for database storage
-    return f"/uploads/products/{unique_filename}"
+    return store_stream(image_file.stream, normalize_extension(image_file.filename))
+
+# Every product of a store, active or not, with image and review counts
+MANAGE_PRODUCTS_SQL = """
+    SELECT 
+        p.*,
+        s.name as store_name,
+        COUNT(DISTINCT pi.image_id) as image_count,
+        COALESCE(AVG(r.rating), 0) as avg_rating,
+        COUNT(DISTINCT r.review_id) as review_count
+    FROM products p
+    LEFT JOIN stores s ON p.store_id = s.store_id
+    LEFT JOIN product_images pi ON p.product_id = pi.product_id
+    LEFT JOIN reviews r ON p.product_id = r.product_id
+    WHERE p.store_id = %s
+    GROUP BY p.product_id, s.name, p.name, p.description, p.price, p.sale_price, 
+             p.stock_quantity, p.is_featured, p.is_active, p.date_created, p.date_updated,
+             p.category_id, p.loyalty_points_earned
+    ORDER BY p.date_created DESC
+"""
 
 @products_bp.route('/manage', methods=['GET'])
 @jwt_required()
 def get_manage_products():
     """Get products for the authenticated store (for manage products)"""
     try:
-        current_user_id = get_jwt_identity()
-        
         with get_cursor() as cursor:
             # First, get the store_id for this user
-            store_query = "SELECT store_id FROM stores WHERE owner_id = %s"
-            cursor.execute(store_query, (current_user_id,))
-            store_result = cursor.fetchone()
+            owner = get_owner_context(cursor)
             
-            if not store_result:
+            if not owner or not owner['store_id']:
                 return jsonify({
                     'success': False,
                     'message': 'Store not found for this user'
                 }), 404
             
-            store_id = store_result['store_id']
+            store_id = owner['store_id']
             
             # Get all products for this store with detailed information
-            query = """
-                SELECT 
-                    p.*,
-                    s.name as store_name,
-                    COUNT(DISTINCT pi.image_id) as image_count,
-                    COALESCE(AVG(r.rating), 0) as avg_rating,
-                    COUNT(DISTINCT r.review_id) as review_count
-                FROM products p
-                LEFT JOIN stores s ON p.store_id = s.store_id
-                LEFT JOIN product_images pi ON p.product_id = pi.product_id
-                LEFT JOIN reviews r ON p.product_id = r.product_id
-                WHERE p.store_id = %s
-                GROUP BY p.product_id, s.name, p.name, p.description, p.price, p.sale_price, 
-                         p.stock_quantity, p.is_featured, p.is_active, p.date_created, p.date_updated,
-                         p.category_id, p.loyalty_points_earned
-                ORDER BY p.date_created DESC
-            """
-            
-            cursor.execute(query, (store_id,))
+            cursor.execute(MANAGE_PRODUCTS_SQL, (store_id,))
             products = cursor.fetchall()
             
             # Convert to list of dictionaries and get primary image for each product
             products_list = []
             for product in products:
                 # Get the first image for this product
-                image_query = """
-                    SELECT image_url 
-                    FROM product_images 
-                    WHERE product_id = %s 
-                    ORDER BY is_primary DESC, image_id ASC 
+                image_query = f"""
+                    SELECT {rendition_sql('card')} as image_url
+                    FROM product_images pi
+                    WHERE pi.product_id = %s 
+                    ORDER BY pi.is_primary DESC, pi.image_id ASC 
                     LIMIT 1
                 """
                 cursor.execute(image_query, (product['product_id'],))
@@ -134,34 +148,26 @@ def get_manage_products():
 @products_bp.route('', methods=['POST'], strict_slashes=False)
 @products_bp.route('/', methods=['POST'], strict_slashes=False)
 @jwt_required()
+@stream_uploads(MAX_FILE_SIZE)
 def create_product():
     """Create a new product"""
     try:
-        user_id = get_jwt_identity()
+        # Check if user is a supplier and get their store
+        owner = get_owner_context()
         
-        # Check if user is a supplier
-        with get_cursor() as cursor:
-            cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
-            user = cursor.fetchone()
-            
-            if not user or user['role'] != 'supplier':
-                return jsonify({
-                    'success': False,
-                    'message': 'Only suppliers can add products'
-                }), 403
+        if not owner or owner['role'] != 'supplier':
+            return jsonify({
+                'success': False,
+                'message': 'Only suppliers can add products'
+            }), 403
         
-        # Get supplier's store
-        with get_cursor() as cursor:
-            cursor.execute("SELECT store_id FROM stores WHERE owner_id = %s", (user_id,))
-            store = cursor.fetchone()
-            
-            if not store:
-                return jsonify({
-                    'success': False,
-                    'message': 'You need to create a store first'
-                }), 400
-            
-            store_id = store['store_id']
+        if not owner['store_id']:
+            return jsonify({
+                'success': False,
+                'message': 'You need to create a store first'
+            }), 400
+        
+        store_id = owner['store_id']
         
         # Get form data
         name = request.form.get('name', '').strip()
@@ -202,15 +208,17 @@ def create_product():
         
         # Handle image upload
         image_url = None
+        stored_image = None
         if 'image' in request.files:
             image_file = request.files['image']
             if image_file.filename:
-                image_url = save_product_image(image_file)
-                if not image_url:
+                stored_image = save_product_image(image_file)
+                if not stored_image:
                     return jsonify({
                         'success': False,
                         'message': 'Invalid image file'
                     }), 400
+                image_url = stored_image['url']
         
         # Generate product ID
         product_id = str(uuid.uuid4())
@@ -236,13 +244,17 @@ def create_product():
                 image_id = str(uuid.uuid4())
                 image_sql = """
                     INSERT INTO product_images (
-                        image_id, product_id, image_url, is_primary, display_order
-                    ) VALUES (%s, %s, %s, %s, %s)
+                        image_id, product_id, image_url, content_hash, is_primary, display_order
+                    ) VALUES (%s, %s, %s, %s, %s, %s)
                 """
-                cursor.execute(image_sql, (image_id, product_id, image_url, True, 0))
+                cursor.execute(image_sql, (image_id, product_id, image_url, stored_image['content_hash'], True, 0))
             
             db.commit()
         
+        # Resize/convert in the background; list endpoints fall back to the original until done
+        if image_url:
+            queue_product_image(image_id, image_url)
+        
         return jsonify({
             'success': True,
             'message': 'Product added successfully',
@@ -263,6 +275,163 @@ def create_product():
             'message': f'Error creating product: {str(e)}'
         }), 500
 
+PRODUCT_SORTS = {
+    'price_asc': "p.price ASC",
+    'price_desc': "p.price DESC",
+    'name_asc': "p.name ASC",
+    'name_desc': "p.name DESC",
+    'date_desc': "p.date_created DESC",
+}
+
+PRODUCT_COUNT_SQL = """
+    SELECT COUNT(*) as total
+    FROM products p
+    WHERE {where_clause}
+"""
+
+# Products with store info and primary image; category names come from the registry
+PRODUCT_LIST_SQL = f"""
+    SELECT 
+        p.product_id, p.name, p.description, p.price, p.sale_price,
+        p.stock_quantity, p.is_featured, p.loyalty_points_earned,
+        {AVAILABLE_STOCK_SQL} as available_quantity,
+        p.date_created, p.date_updated,
+        p.category_id,
+        s.name as store_name, s.store_id,
+        {rendition_sql('card')} as primary_image_url,
+        pi.renditions as image_renditions
+    FROM products p
+    LEFT JOIN stores s ON p.store_id = s.store_id
+    LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = true
+    WHERE {{where_clause}}
+    ORDER BY {{order_clause}}
+    LIMIT %s OFFSET %s
+"""
+
+PRODUCT_DETAIL_SQL = f"""
+    SELECT 
+        p.product_id,
+        p.name,
+        p.description,
+        p.price,
+        p.sale_price,
+        p.stock_quantity,
+        {AVAILABLE_STOCK_SQL} as available_quantity,
+        p.is_featured,
+        p.is_active,
+        p.date_created,
+        p.date_updated,
+        p.category_id,
+        c.name as category_name,
+        p.store_id,
+        s.name as store_name,
+        s.description as store_description,
+        s.address as store_address,
+        s.phone as store_phone,
+        COALESCE(AVG(r.rating), 0) as avg_rating,
+        COUNT(r.review_id) as review_count,
+        {rendition_sql('detail')} as image_url,
+        pi.renditions as image_renditions
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.category_id
+    LEFT JOIN stores s ON p.store_id = s.store_id
+    LEFT JOIN reviews r ON p.product_id = r.product_id
+    LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = true
+    WHERE p.product_id = %s AND p.is_active = true
+    GROUP BY p.product_id, c.name, s.name, s.description, s.address, s.phone, pi.image_url, pi.renditions
+"""
+
+def product_list_filters(args):
+    """(where_clause, params, order_clause) for the listing's query parameters"""
+    category_id = args.get('category_id')
+    store_id = args.get('store_id')
+    search = args.get('search', '').strip()
+    is_featured = args.get('is_featured')
+
+    where_conditions = ["p.is_active = true"]
+    params = []
+
+    if category_id:
+        where_conditions.append("p.category_id = %s")
+        params.append(category_id)
+
+    if store_id:
+        where_conditions.append("p.store_id = %s")
+        params.append(store_id)
+
+    if search:
+        where_conditions.append("(p.name ILIKE %s OR p.description ILIKE %s)")
+        params.extend([f"%{search}%", f"%{search}%"])
+
+    if is_featured == 'true':
+        where_conditions.append("p.is_featured = true")
+
+    order_clause = PRODUCT_SORTS.get(args.get('sort', 'date_desc'), PRODUCT_SORTS['date_desc'])
+    return " AND ".join(where_conditions), params, order_clause
+
+def product_facet_query(args):
+    """(cache key, sql, params) for the facet counts of the listing's filter set"""
+    filters = normalize_filters(args)
+    where_clause, params, _ = product_list_filters({**filters, 'category_id': None})
+    sql, params = facet_query(where_clause, params, filters['category_id'])
+    return facet_cache_key(filters), sql, params
+
+def load_product_facets(cursor, args):
+    """Category, price-range and featured counts for the listing, cached per filter set"""
+    key, sql, params = product_facet_query(args)
+    facets = facet_cache.get(key)
+    if facets is None:
+        cursor.execute(sql, params)
+        facets = format_facets(cursor.fetchall())
+        facet_cache.set(key, facets)
+    return facets
+
+def format_product_card(product):
+    return {
+        'product_id': product['product_id'],
+        'name': product['name'],
+        'description': product['description'],
+        'price': float(product['price']),
+        'sale_price': float(product['sale_price']) if product['sale_price'] else None,
+        'stock_quantity': product['stock_quantity'],
+        'available_quantity': product['available_quantity'],
+        'image_url': product['primary_image_url'],  # Card-size rendition of the primary image
+        'image_renditions': product['image_renditions'],
+        'is_featured': product['is_featured'],
+        'loyalty_points_earned': product['loyalty_points_earned'],
+        'date_created': product['date_created'],
+        'date_updated': product['date_updated'],
+        'category_name': category_name(product['category_id']),
+        'store_name': product['store_name'],
+        'store_id': product['store_id']
+    }
+
+def format_product_detail(product):
+    return {
+        'product_id': product['product_id'],
+        'name': product['name'],
+        'description': product['description'],
+        'price': float(product['price']),
+        'sale_price': float(product['sale_price']) if product['sale_price'] else None,
+        'stock_quantity': product['stock_quantity'],
+        'available_quantity': product['available_quantity'],
+        'is_featured': product['is_featured'],
+        'is_active': product['is_active'],
+        'date_created': product['date_created'].isoformat() if product['date_created'] else None,
+        'date_updated': product['date_updated'].isoformat() if product['date_updated'] else None,
+        'category_id': product['category_id'],
+        'category_name': product['category_name'],
+        'store_id': product['store_id'],
+        'store_name': product['store_name'],
+        'store_description': product['store_description'],
+        'store_address': product['store_address'],
+        'store_phone': product['store_phone'],
+        'avg_rating': float(product['avg_rating']) if product['avg_rating'] else 0.0,
+        'review_count': product['review_count'] if product['review_count'] else 0,
+        'image_url': product['image_url'],  # Detail-size rendition of the primary image
+        'image_renditions': product['image_renditions']
+    }
+
 # Handle both / and without trailing slash for GET
 @products_bp.route('', methods=['GET'], strict_slashes=False)
 @products_bp.route('/', methods=['GET'], strict_slashes=False)
@@ -272,100 +441,30 @@ def get_products():
         # Get query parameters
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 12, type=int)
-        category_id = request.args.get('category_id')
-        store_id = request.args.get('store_id')
-        search = request.args.get('search', '').strip()
-        sort = request.args.get('sort', 'date_desc')
-        is_featured = request.args.get('is_featured')
         
         # Calculate offset
         offset = (page - 1) * limit
         
-        # Build WHERE clause
-        where_conditions = ["p.is_active = true"]
-        params = []
-        
-        if category_id:
-            where_conditions.append("p.category_id = %s")
-            params.append(category_id)
-        
-        if store_id:
-            where_conditions.append("p.store_id = %s")
-            params.append(store_id)
-        
-        if search:
-            where_conditions.append("(p.name ILIKE %s OR p.description ILIKE %s)")
-            params.extend([f"%{search}%", f"%{search}%"])
+        # Pages after the first can skip facets with facets=false
+        include_facets = request.args.get('facets', 'true') != 'false'
         
-        if is_featured == 'true':
-            where_conditions.append("p.is_featured = true")
-        
-        where_clause = " AND ".join(where_conditions)
-        
-        # Build ORDER BY clause
-        if sort == 'price_asc':
-            order_clause = "p.price ASC"
-        elif sort == 'price_desc':
-            order_clause = "p.price DESC"
-        elif sort == 'name_asc':
-            order_clause = "p.name ASC"
-        elif sort == 'name_desc':
-            order_clause = "p.name DESC"
-        else:  # date_desc (default)
-            order_clause = "p.date_created DESC"
+        where_clause, params, order_clause = product_list_filters(request.args)
+        refresh_categories()
         
         with get_cursor() as cursor:
             # Get total count
-            count_sql = f"""
-                SELECT COUNT(*) as total
-                FROM products p
-                WHERE {where_clause}
-            """
-            cursor.execute(count_sql, params)
+            cursor.execute(PRODUCT_COUNT_SQL.format(where_clause=where_clause), params)
             total = cursor.fetchone()['total']
             
-            # Get products with store, category info, and primary image
-            sql = f"""
-                SELECT 
-                    p.product_id, p.name, p.description, p.price, p.sale_price,
-                    p.stock_quantity, p.is_featured, p.loyalty_points_earned,
-                    p.date_created, p.date_updated,
-                    c.name as category_name,
-                    s.name as store_name, s.store_id,
-                    pi.image_url as primary_image_url
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN stores s ON p.store_id = s.store_id
-                LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = true
-                WHERE {where_clause}
-                ORDER BY {order_clause}
-                LIMIT %s OFFSET %s
-            """
-            
-            cursor.execute(sql, params + [limit, offset])
-            products = cursor.fetchall()
+            cursor.execute(
+                PRODUCT_LIST_SQL.format(where_clause=where_clause, order_clause=order_clause),
+                params + [limit, offset]
+            )
+            products_list = [format_product_card(product) for product in cursor.fetchall()]
             
-            # Convert to list of dictionaries
-            products_list = []
-            for product in products:
-                products_list.append({
-                    'product_id': product['product_id'],
-                    'name': product['name'],
-                    'description': product['description'],
-                    'price': float(product['price']),
-                    'sale_price': float(product['sale_price']) if product['sale_price'] else None,
-                    'stock_quantity': product['stock_quantity'],
-                    'image_url': product['primary_image_url'],  # Primary image from product_images table
-                    'is_featured': product['is_featured'],
-                    'loyalty_points_earned': product['loyalty_points_earned'],
-                    'date_created': product['date_created'],
-                    'date_updated': product['date_updated'],
-                    'category_name': product['category_name'],
-                    'store_name': product['store_name'],
-                    'store_id': product['store_id']
-                })
+            facets = load_product_facets(cursor, request.args) if include_facets else None
         
-        return jsonify({
+        response = {
             'success': True,
             'products': products_list,
             'pagination': {
@@ -374,7 +473,10 @@ def get_products():
                 'limit': limit,
                 'pages': (total + limit - 1) // limit
             }
-        }), 200
+        }
+        if include_facets:
+            response['facets'] = facets
+        return jsonify(response), 200
         
     except Exception as e:
         print(f"Error fetching products: {e}")
@@ -388,81 +490,18 @@ def get_product(product_id):
     """Get a single product by ID"""
     try:
         with get_cursor() as cursor:
-            # Updated query to include the primary image
-            cursor.execute("""
-                SELECT 
-                    p.product_id,
-                    p.name,
-                    p.description,
-                    p.price,
-                    p.sale_price,
-                    p.stock_quantity,
-                    p.is_featured,
-                    p.is_active,
-                    p.date_created,
-                    p.date_updated,
-                    p.category_id,
-                    c.name as category_name,
-                    p.store_id,
-                    s.name as store_name,
-                    s.description as store_description,
-                    s.address as store_address,
-                    s.phone as store_phone,
-                    COALESCE(AVG(r.rating), 0) as avg_rating,
-                    COUNT(r.review_id) as review_count,
-                    pi.image_url as image_url
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN stores s ON p.store_id = s.store_id
-                LEFT JOIN reviews r ON p.product_id = r.product_id
-                LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = true
-                WHERE p.product_id = %s AND p.is_active = true
-                GROUP BY p.product_id, c.name, s.name, s.description, s.address, s.phone, pi.image_url
-            """, (product_id,))
-            
-            product_data = cursor.fetchone()
+            cursor.execute(PRODUCT_DETAIL_SQL, (product_id,))
+            product = cursor.fetchone()
             
-            if not product_data:
+            if not product:
                 return jsonify({
                     'success': False,
                     'message': 'Product not found'
                 }), 404
             
-            # Handle both dict and tuple returns
-            if isinstance(product_data, dict):
-                product = product_data
-            else:
-                # Convert tuple to dict
-                columns = [desc[0] for desc in cursor.description]
-                product = dict(zip(columns, product_data))
-            
-            # Convert to proper format
-            product_response = {
-                'product_id': product['product_id'],
-                'name': product['name'],
-                'description': product['description'],
-                'price': float(product['price']),
-                'sale_price': float(product['sale_price']) if product['sale_price'] else None,
-                'stock_quantity': product['stock_quantity'],
-                'is_featured': product['is_featured'],
-                'is_active': product['is_active'],
-                'date_created': product['date_created'].isoformat() if product['date_created'] else None,
-                'date_updated': product['date_updated'].isoformat() if product['date_updated'] else None,
-                'category_id': product['category_id'],
-                'category_name': product['category_name'],
-                'store_id': product['store_id'],
-                'store_name': product['store_name'],
-                'store_description': product['store_description'],
-                'store_address': product['store_address'],
-                'store_phone': product['store_phone'],
-                'avg_rating': float(product['avg_rating']) if product['avg_rating'] else 0.0,
-                'review_count': product['review_count'] if product['review_count'] else 0,
-                'image_url': product['image_url']  # This is the key addition
-            }
-            
         return jsonify({
             'success': True,
-            'product': product_response
+            'product': format_product_detail(product)
         }), 200
         
     except Exception as e:
@@ -474,6 +513,7 @@ def get_product(product_id):
 
 @products_bp.route('/<product_id>', methods=['PUT'])
 @jwt_required()
+@stream_uploads(MAX_FILE_SIZE)
 def update_product(product_id):
     """Update a product"""
     try:
@@ -549,13 +589,15 @@ def update_product(product_id):
         
         # Handle image upload if provided
         image_url = None
+        stored_image = None
         if image_file and image_file.filename:
-            image_url = save_product_image(image_file)
-            if not image_url:
+            stored_image = save_product_image(image_file)
+            if not stored_image:
                 return jsonify({
                     'success': False,
                     'message': 'Invalid image file'
                 }), 400
+            image_url = stored_image['url']
         
         # Add updated timestamp
         update_fields.append("date_updated = CURRENT_TIMESTAMP")
@@ -569,20 +611,23 @@ def update_product(product_id):
             
             # Handle image update if new image was uploaded
             if image_url:
-                # First, delete existing images for this product
+                # First, delete existing images for this product (their files become orphans for GC)
                 cursor.execute('DELETE FROM product_images WHERE product_id = %s', (product_id,))
                 
                 # Add new image
                 image_id = str(uuid.uuid4())
                 image_sql = """
                     INSERT INTO product_images (
-                        image_id, product_id, image_url, is_primary, display_order
-                    ) VALUES (%s, %s, %s, %s, %s)
+                        image_id, product_id, image_url, content_hash, is_primary, display_order
+                    ) VALUES (%s, %s, %s, %s, %s, %s)
                 """
-                cursor.execute(image_sql, (image_id, product_id, image_url, True, 0))
+                cursor.execute(image_sql, (image_id, product_id, image_url, stored_image['content_hash'], True, 0))
             
             db.commit()
         
+        if image_url:
+            queue_product_image(image_id, image_url)
+        
         return jsonify({
             'success': True,
             'message': 'Product updated successfully'
@@ -597,93 +642,271 @@ def update_product(product_id):
             'message': f'Error updating product: {str(e)}'
         }), 500
 
+# Ownership and order count in one query, shared by the delete check and the delete itself
+DELETE_STATUS_SQL = """
+    SELECT
+        p.product_id,
+        p.name,
+        (SELECT COUNT(*) FROM order_items oi WHERE oi.product_id = p.product_id) as order_count
+    FROM products p
+    JOIN stores s ON p.store_id = s.store_id
+    WHERE p.product_id = %(product_id)s AND s.owner_id = %(user_id)s
+"""
+
+# Images, reviews, wishlist/cart lines and reservations go with the product through
+# ON DELETE CASCADE; the product_images trigger marks their files orphaned for storage GC
+DELETE_PRODUCT_SQL = f"""
+    WITH target AS ({DELETE_STATUS_SQL}),
+    deleted AS (
+        DELETE FROM products p
+        USING target t
+        WHERE p.product_id = t.product_id AND t.order_count = 0
+        RETURNING p.product_id
+    )
+    SELECT t.name, t.order_count, EXISTS (SELECT 1 FROM deleted) as deleted
+    FROM target t
+"""
+
 @products_bp.route('/<product_id>', methods=['DELETE'])
 @jwt_required()
 def delete_product(product_id):
-    """Delete product with proper foreign key handling"""
+    """Delete a product in a single statement, or archive it if it has been ordered"""
     try:
         current_user_id = get_jwt_identity()
         
-        # Verify the product belongs to the user's store
         with get_cursor() as cursor:
-            verify_query = """
-                SELECT p.product_id, p.name
-                FROM products p 
-                JOIN stores s ON p.store_id = s.store_id 
-                WHERE p.product_id = %s AND s.owner_id = %s
-            """
-            cursor.execute(verify_query, (product_id, current_user_id))
-            verify_result = cursor.fetchone()
+            cursor.execute(DELETE_PRODUCT_SQL, {'product_id': product_id, 'user_id': current_user_id})
+            result = cursor.fetchone()
             
-            if not verify_result:
+            if result and not result['deleted']:
+                # Ordered products move to the archive so order history can still name them
+                archive_products(cursor, [product_id])
+        
+        if not result:
+            return jsonify({
+                'success': False,
+                'message': 'Product not found or you do not have permission to delete it'
+            }), 403
+        
+        if not result['deleted']:
+            return jsonify({
+                'success': True,
+                'archived': True,
+                'message': f'Product "{result["name"]}" has been ordered by customers, so it was archived instead of deleted',
+                'order_count': result['order_count']
+            })
+        
+        return jsonify({
+            'success': True,
+            'archived': False,
+            'message': f'Product "{result["name"]}" deleted successfully'
+        })
+    
+    except Exception as e:
+        print(f"Error deleting product: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Error deleting product',
+            'error': str(e)
+        }), 500
+
+@products_bp.route('/archived', methods=['GET'])
+@jwt_required()
+def get_archived_products():
+    """List the authenticated store's archived products"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        with get_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT
+                    ap.product_id,
+                    ap.name,
+                    ap.price,
+                    ap.category_id,
+                    ap.date_created,
+                    ap.date_archived,
+                    (SELECT {rendition_sql('card', alias='ai')}
+                     FROM archived_product_images ai
+                     WHERE ai.product_id = ap.product_id
+                     ORDER BY ai.is_primary DESC, ai.display_order
+                     LIMIT 1) as image_url
+                FROM archived_products ap
+                JOIN stores s ON ap.store_id = s.store_id
+                WHERE s.owner_id = %s
+                ORDER BY ap.date_archived DESC
+            """, (current_user_id,))
+            products = cursor.fetchall()
+        
+        return jsonify({
+            'success': True,
+            'products': [{**product, 'price': float(product['price'])} for product in products]
+        })
+    
+    except Exception as e:
+        print(f"Error fetching archived products: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Error fetching archived products',
+            'error': str(e)
+        }), 500
+
+@products_bp.route('/archived/<product_id>/restore', methods=['POST'])
+@jwt_required()
+def restore_archived_product(product_id):
+    """Move an archived product back into the catalogue (inactive)"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        with get_cursor() as cursor:
+            cursor.execute("""
+                SELECT ap.product_id
+                FROM archived_products ap
+                JOIN stores s ON ap.store_id = s.store_id
+                WHERE ap.product_id = %s AND s.owner_id = %s
+            """, (product_id, current_user_id))
+            if not cursor.fetchone():
                 return jsonify({
                     'success': False,
-                    'message': 'Product not found or you do not have permission to delete it'
-                }), 403
-            
-            product_name = verify_result['name']
+                    'message': 'Archived product not found'
+                }), 404
             
-            # Check if product has been ordered
-            cursor.execute("""
-                SELECT COUNT(*) as order_count 
-                FROM order_items 
-                WHERE product_id = %s
-            """, (product_id,))
-            order_check = cursor.fetchone()
+            restored = restore_products(cursor, [product_id])
+        
+        return jsonify({
+            'success': True,
+            'message': f'Product "{restored[0]["name"]}" restored; activate it to list it again'
+        })
+    
+    except Exception as e:
+        print(f"Error restoring product: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Error restoring product',
+            'error': str(e)
+        }), 500
+
+def get_supplier_store(cursor, user_id):
+    """The store of a supplier, or None for other roles"""
+    owner = get_owner_context(cursor, user_id)
+    return owner['store_id'] if owner and owner['role'] == 'supplier' else None
+
+@products_bp.route('/import', methods=['POST'])
+@jwt_required()
+@stream_uploads(MAX_IMPORT_SIZE, allowed_types=None)
+def import_store_products():
+    """Create or update many products from a CSV or JSON Lines file.
+
+    Rows are matched to the store's products by name. Valid rows are imported
+    and invalid ones are listed in the report; ?dry_run=true only validates.
+    """
+    try:
+        user_id = get_jwt_identity()
+        upload = request.files.get('file')
+        
+        if not upload or not upload.filename:
+            return jsonify({
+                'success': False,
+                'message': 'A CSV or JSON Lines file is required'
+            }), 400
+        
+        file_format = request.form.get('format') or (
+            'jsonl' if upload.filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+        )
+        if file_format not in EXPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'message': 'Format must be csv or jsonl'
+            }), 400
+        
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+        
+        with get_cursor() as cursor:
+            store_id = get_supplier_store(cursor, user_id)
+            if not store_id:
+                return jsonify({
+                    'success': False,
+                    'message': 'Only suppliers with a store can import products'
+                }), 403
             
-            if order_check['order_count'] > 0:
-                # Product has orders - don't delete, just deactivate
+            upload.stream.seek(0)
+            text_stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+            try:
+                report = import_products(cursor, store_id, text_stream, file_format)
+            except (UnicodeDecodeError, ValueError, csv.Error, DataError) as e:
+                cursor.connection.rollback()
                 return jsonify({
                     'success': False,
-                    'message': f'Cannot delete "{product_name}" because it has been ordered by customers. You can deactivate it instead.',
-                    'can_deactivate': True,
-                    'order_count': order_check['order_count']
+                    'message': f'Could not read file: {str(e)}'
                 }), 400
+            finally:
+                text_stream.detach()
+            
+            if dry_run:
+                cursor.connection.rollback()
         
-        # If no orders, proceed with deletion
-        db = get_db()
-        with db.cursor() as cursor:
+        return jsonify({
+            'success': True,
+            'message': 'Import validated' if dry_run else 'Import completed',
+            'dry_run': dry_run,
+            **report
+        }), 200
+        
+    except Exception as e:
+        print(f"Error importing products: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error importing products: {str(e)}'
+        }), 500
+
+@products_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_store_products():
+    """Stream the store's catalogue as CSV or JSON Lines from a server-side cursor"""
+    try:
+        user_id = get_jwt_identity()
+        file_format = request.args.get('format', 'csv').lower()
+        
+        if file_format not in EXPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'message': 'Format must be csv or jsonl'
+            }), 400
+        
+        with get_cursor() as cursor:
+            store_id = get_supplier_store(cursor, user_id)
+        
+        if not store_id:
+            return jsonify({
+                'success': False,
+                'message': 'Only suppliers with a store can export products'
+            }), 403
+        
+        def generate():
+            connection = get_db()
             try:
-                # Start transaction
-                db.autocommit = False
-                
-                # Delete in correct order due to foreign key constraints
-                # 1. Delete product images
-                cursor.execute('DELETE FROM product_images WHERE product_id = %s', (product_id,))
-                
-                # 2. Delete reviews
-                cursor.execute('DELETE FROM reviews WHERE product_id = %s', (product_id,))
-                
-                # 3. Delete from wishlists
-                cursor.execute('DELETE FROM wishlist_items WHERE product_id = %s', (product_id,))
-                
-                # 4. Delete from carts
-                cursor.execute('DELETE FROM cart_items WHERE product_id = %s', (product_id,))
-                
-                # 5. Finally delete the product
-                cursor.execute('DELETE FROM products WHERE product_id = %s', (product_id,))
-                
-                # Commit transaction
-                db.commit()
-                
-                return jsonify({
-                    'success': True,
-                    'message': f'Product "{product_name}" deleted successfully'
-                })
-                
-            except Exception as e:
-                # Rollback transaction on error
-                db.rollback()
-                raise e
+                chunk = [export_header(file_format)]
+                for product in export_rows(connection, store_id):
+                    chunk.append(format_export_row(product, file_format))
+                    if len(chunk) >= 500:
+                        yield ''.join(chunk)
+                        chunk = []
+                yield ''.join(chunk)
             finally:
-                db.autocommit = True
-    
+                connection.rollback()
+                connection.close()
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype=EXPORT_FORMATS[file_format],
+            headers={'Content-Disposition': f'attachment; filename=products.{file_format}'}
+        )
+        
     except Exception as e:
-        print(f"Error deleting product: {e}")
+        print(f"Error exporting products: {e}")
         return jsonify({
             'success': False,
-            'message': 'Error deleting product',
-            'error': str(e)
+            'message': f'Error exporting products: {str(e)}'
         }), 500
 
 @products_bp.route('/stats', methods=['GET'])
@@ -691,21 +914,17 @@ def delete_product(product_id):
 def get_product_stats():
     """Get product statistics for the authenticated store"""
     try:
-        current_user_id = get_jwt_identity()
-        
         with get_cursor() as cursor:
             # Get the store_id for this user
-            store_query = "SELECT store_id FROM stores WHERE owner_id = %s"
-            cursor.execute(store_query, (current_user_id,))
-            store_result = cursor.fetchone()
+            owner = get_owner_context(cursor)
             
-            if not store_result:
+            if not owner or not owner['store_id']:
                 return jsonify({
                     'success': False,
                     'message': 'Store not found for this user'
                 }), 404
             
-            store_id = store_result['store_id']
+            store_id = owner['store_id']
             
             # Get product statistics
             stats_query = """
@@ -803,6 +1022,167 @@ def update_product_status(product_id):
             'error': str(e)
         }), 500
 
+BULK_UPDATE_SQL = """
+    UPDATE products p
+    SET price = COALESCE(v.price, p.price),
+        sale_price = CASE WHEN v.set_sale_price THEN v.sale_price ELSE p.sale_price END,
+        stock_quantity = COALESCE(v.stock_quantity, p.stock_quantity),
+        is_featured = COALESCE(v.is_featured, p.is_featured),
+        is_active = COALESCE(v.is_active, p.is_active),
+        date_updated = CURRENT_TIMESTAMP
+    FROM (VALUES %s) AS v(product_id, price, sale_price, set_sale_price, stock_quantity, is_featured, is_active)
+    WHERE p.product_id = v.product_id
+    RETURNING p.product_id, p.price, p.sale_price, p.stock_quantity, p.is_featured, p.is_active
+"""
+BULK_UPDATE_TEMPLATE = "(%s, %s::numeric, %s::numeric, %s::boolean, %s::integer, %s::boolean, %s::boolean)"
+BULK_BOOLEAN_STRINGS = {'true': True, '1': True, 'on': True, 'false': False, '0': False, 'off': False}
+
+def normalize_bulk_changes(updates):
+    """Validate a list of per-product field changes.
+
+    Returns ({product_id: changes}, None) or (None, error message). Only the
+    fields present in an entry change; "status" is accepted like in
+    update_product_status() and "sale_price": null clears a sale.
+    """
+    if not isinstance(updates, list) or not updates:
+        return None, 'updates must be a non-empty list'
+    if len(updates) > MAX_BULK_UPDATES:
+        return None, f'At most {MAX_BULK_UPDATES} products can be updated at once'
+    
+    changes = {}
+    for index, update in enumerate(updates):
+        if not isinstance(update, dict) or not update.get('product_id'):
+            return None, f'Update {index}: product_id is required'
+        if update['product_id'] in changes:
+            return None, f'Update {index}: product {update["product_id"]} is listed twice'
+        
+        change = {}
+        try:
+            if update.get('price') is not None:
+                change['price'] = float(update['price'])
+                if change['price'] <= 0:
+                    return None, f'Update {index}: price must be greater than 0'
+            if 'sale_price' in update:
+                change['sale_price'] = float(update['sale_price']) if update['sale_price'] not in (None, '') else None
+            if update.get('stock_quantity') is not None:
+                change['stock_quantity'] = int(update['stock_quantity'])
+                if change['stock_quantity'] < 0:
+                    return None, f'Update {index}: stock_quantity cannot be negative'
+        except (TypeError, ValueError):
+            return None, f'Update {index}: invalid numeric value'
+        
+        for field in ['is_featured', 'is_active']:
+            if update.get(field) is None:
+                continue
+            value = update[field]
+            # Strings as update_product() reads them from FormData; anything else is rejected
+            if isinstance(value, str) and value.lower() in BULK_BOOLEAN_STRINGS:
+                value = BULK_BOOLEAN_STRINGS[value.lower()]
+            if not isinstance(value, bool):
+                return None, f'Update {index}: {field} must be true or false'
+            change[field] = value
+        if 'status' in update:
+            if update['status'] not in ['active', 'inactive']:
+                return None, f'Update {index}: status must be "active" or "inactive"'
+            change['is_active'] = update['status'] == 'active'
+        
+        if not change:
+            return None, f'Update {index}: no valid fields to update'
+        changes[update['product_id']] = change
+    
+    return changes, None
+
+def invalidate_bulk_caches(changes):
+    """Drop this process's cached listings a committed batch made stale, once per batch"""
+    from routes.stores import leaderboard_cache
+    
+    # Prices, featured flags and active products all feed the facet counts
+    facet_cache.invalidate()
+    if any('is_active' in change for change in changes.values()):
+        # The products ranking orders by the active product count
+        leaderboard_cache.invalidate('products')
+
+@products_bp.route('/bulk', methods=['PATCH'])
+@jwt_required()
+def bulk_update_products():
+    """Change price, sale price, stock or status of many products in one statement.
+
+    Body: {"updates": [{"product_id": ..., "price": ..., "sale_price": ..., "stock_quantity": ...,
+    "is_featured": ..., "is_active": ... | "status": "active|inactive"}]}
+    All products must belong to the caller's store; if any update is invalid nothing is applied.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        
+        changes, error = normalize_bulk_changes(data.get('updates'))
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        with get_cursor() as cursor:
+            # Ownership and current prices for the whole batch in one query, locked until commit
+            cursor.execute("""
+                SELECT p.product_id, p.price, p.sale_price
+                FROM products p
+                JOIN stores s ON p.store_id = s.store_id
+                WHERE p.product_id = ANY(%s) AND s.owner_id = %s
+                FOR UPDATE OF p
+            """, (list(changes), current_user_id))
+            owned = {row['product_id']: row for row in cursor.fetchall()}
+            
+            errors = []
+            for product_id, change in changes.items():
+                if product_id not in owned:
+                    errors.append({'product_id': product_id, 'message': 'Product not found or you do not have permission to modify it'})
+                    continue
+                
+                price = change.get('price', float(owned[product_id]['price']))
+                sale_price = change['sale_price'] if 'sale_price' in change else owned[product_id]['sale_price']
+                if sale_price is not None and float(sale_price) >= price:
+                    errors.append({'product_id': product_id, 'message': 'Sale price must be less than regular price'})
+            
+            if errors:
+                cursor.connection.rollback()
+                return jsonify({
+                    'success': False,
+                    'message': 'No products were updated',
+                    'errors': errors
+                }), 400
+            
+            rows = [
+                (product_id, change.get('price'), change.get('sale_price'), 'sale_price' in change,
+                 change.get('stock_quantity'), change.get('is_featured'), change.get('is_active'))
+                for product_id, change in changes.items()
+            ]
+            updated = execute_values(cursor, BULK_UPDATE_SQL, rows, template=BULK_UPDATE_TEMPLATE,
+                                     page_size=len(rows), fetch=True)
+        
+        invalidate_bulk_caches(changes)
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(updated)} products updated successfully',
+            'products': [
+                {
+                    **product,
+                    'price': float(product['price']),
+                    'sale_price': float(product['sale_price']) if product['sale_price'] is not None else None
+                }
+                for product in updated
+            ]
+        }), 200
+    
+    except Exception as e:
+        print(f"Error bulk updating products: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Error updating products',
+            'error': str(e)
+        }), 500
+
 @products_bp.route('/<product_id>/delete-check', methods=['GET'])
 @jwt_required()
 def check_delete_product(product_id):
@@ -811,30 +1191,18 @@ def check_delete_product(product_id):
         current_user_id = get_jwt_identity()
         
         with get_cursor() as cursor:
-            # Verify ownership
-            verify_query = """
-                SELECT p.product_id 
-                FROM products p 
-                JOIN stores s ON p.store_id = s.store_id 
-                WHERE p.product_id = %s AND s.owner_id = %s
-            """
-            cursor.execute(verify_query, (product_id, current_user_id))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Product not found'}), 404
-            
-            # Check for orders
-            cursor.execute("""
-                SELECT COUNT(*) as order_count 
-                FROM order_items 
-                WHERE product_id = %s
-            """, (product_id,))
+            cursor.execute(DELETE_STATUS_SQL, {'product_id': product_id, 'user_id': current_user_id})
             order_result = cursor.fetchone()
+            if not order_result:
+                return jsonify({'success': False, 'message': 'Product not found'}), 404
             
             return jsonify({
                 'success': True,
                 'has_orders': order_result['order_count'] > 0,
                 'order_count': order_result['order_count'],
-                'can_delete': order_result['order_count'] == 0
+                'can_delete': order_result['order_count'] == 0,
+                # DELETE archives ordered products instead of refusing
+                'can_archive': order_result['order_count'] > 0
             })
     
     except Exception as e:
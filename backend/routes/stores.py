@@ -1,8 +1,17 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from database.db import get_cursor, get_db
+from routes.products import PRODUCT_COUNT_SQL, PRODUCT_LIST_SQL, product_list_filters, format_product_card
+from utils.categories import category_name, refresh_categories
+from utils.cache import TTLCache
+from utils.auth import invalidate_owner_context
+from utils.geo import NEARBY_STORES_SQL, nearby_query, format_nearby_store, store_location
+import base64
+import hashlib
+import os
 import uuid
 from datetime import datetime
+from decimal import Decimal
 import json
 
 stores_bp = Blueprint('stores', __name__)
@@ -77,9 +86,10 @@ def create_store():
             sql = """
                 INSERT INTO stores (
                     store_id, owner_id, name, description, address, city, 
-                    phone, email, logo_url, hero_image_url, opening_hours, is_active
+                    phone, email, logo_url, hero_image_url, opening_hours, is_active,
+                    latitude, longitude
                 ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
                 )
             """
             
@@ -95,7 +105,8 @@ def create_store():
                 data.get('logo_url', '').strip() if data.get('logo_url') else None,
                 data.get('banner_url', '').strip() if data.get('banner_url') else None,
                 json.dumps(opening_hours_data),
-                data.get('is_active', True)
+                data.get('is_active', True),
+                *store_location(data['city'].strip(), data['address'].strip())
             )
             
             print(f"DEBUG: SQL: {sql}")
@@ -118,6 +129,7 @@ def create_store():
         # Commit the transaction after the cursor context is closed
         db.commit()
         print("DEBUG: Transaction committed")
+        invalidate_owner_context(user_id)
         
         # Verify again AFTER committing with a fresh cursor
         with get_cursor() as cursor:
@@ -351,6 +363,53 @@ def test_db_connection():
         })
 
 # SINGLE ROUTE for store details - works for both authenticated and public access
+STORE_DETAILS_SQL = """
+    SELECT s.store_id, s.owner_id, s.name, s.description, s.address, s.city, 
+           s.phone, s.email, s.logo_url, s.hero_image_url, s.opening_hours, 
+           s.is_active, s.date_created, s.avg_rating
+    FROM stores s
+    WHERE s.store_id = %s AND s.is_active = true
+"""
+
+DEFAULT_OPENING_HOURS = {
+    "Monday": "9:00 AM - 6:00 PM",
+    "Tuesday": "9:00 AM - 6:00 PM",
+    "Wednesday": "9:00 AM - 6:00 PM",
+    "Thursday": "9:00 AM - 6:00 PM",
+    "Friday": "9:00 AM - 6:00 PM",
+    "Saturday": "10:00 AM - 4:00 PM",
+    "Sunday": "Closed"
+}
+
+def parse_opening_hours(opening_hours):
+    """Opening hours from JSONB (or legacy text), with the default week when unset"""
+    if not opening_hours:
+        return dict(DEFAULT_OPENING_HOURS)
+    if isinstance(opening_hours, str):
+        try:
+            return json.loads(opening_hours)
+        except:
+            return {"general": opening_hours}
+    return opening_hours
+
+def format_store_details(result):
+    return {
+        'store_id': result['store_id'],
+        'owner_id': result['owner_id'],
+        'name': result['name'],
+        'description': result['description'],
+        'address': result['address'],
+        'city': result['city'],
+        'phone': result['phone'],
+        'email': result['email'],
+        'logo_url': result['logo_url'],
+        'hero_image_url': result['hero_image_url'],
+        'opening_hours': parse_opening_hours(result['opening_hours']),
+        'is_active': result['is_active'],
+        'date_created': result['date_created'].isoformat() if result['date_created'] else None,
+        'avg_rating': float(result['avg_rating']) if result['avg_rating'] else 0.0
+    }
+
 @stores_bp.route('/<store_id>', methods=['GET'])
 def get_store_details(store_id):
     """Get detailed store information by store ID - Works for both authenticated and public access"""
@@ -369,14 +428,7 @@ def get_store_details(store_id):
         
         with get_cursor() as cursor:
             # Get store information
-            sql = """
-                SELECT s.store_id, s.owner_id, s.name, s.description, s.address, s.city, 
-                       s.phone, s.email, s.logo_url, s.hero_image_url, s.opening_hours, 
-                       s.is_active, s.date_created, s.avg_rating
-                FROM stores s
-                WHERE s.store_id = %s AND s.is_active = true
-            """
-            cursor.execute(sql, (store_id,))
+            cursor.execute(STORE_DETAILS_SQL, (store_id,))
             result = cursor.fetchone()
             
             print(f"DEBUG: Store query result: {result}")
@@ -387,42 +439,7 @@ def get_store_details(store_id):
                     'message': 'Store not found'
                 }), 404
             
-            # Parse opening hours from JSONB
-            opening_hours = result['opening_hours']
-            if opening_hours:
-                if isinstance(opening_hours, str):
-                    try:
-                        opening_hours = json.loads(opening_hours)
-                    except:
-                        opening_hours = {"general": opening_hours}
-            else:
-                opening_hours = {
-                    "Monday": "9:00 AM - 6:00 PM",
-                    "Tuesday": "9:00 AM - 6:00 PM",
-                    "Wednesday": "9:00 AM - 6:00 PM",
-                    "Thursday": "9:00 AM - 6:00 PM",
-                    "Friday": "9:00 AM - 6:00 PM",
-                    "Saturday": "10:00 AM - 4:00 PM",
-                    "Sunday": "Closed"
-                }
-            
-            # Prepare store data
-            store_data = {
-                'store_id': result['store_id'],
-                'owner_id': result['owner_id'],
-                'name': result['name'],
-                'description': result['description'],
-                'address': result['address'],
-                'city': result['city'],
-                'phone': result['phone'],
-                'email': result['email'],
-                'logo_url': result['logo_url'],
-                'hero_image_url': result['hero_image_url'],
-                'opening_hours': opening_hours,
-                'is_active': result['is_active'],
-                'date_created': result['date_created'].isoformat() if result['date_created'] else None,
-                'avg_rating': float(result['avg_rating']) if result['avg_rating'] else 0.0
-            }
+            store_data = format_store_details(result)
             
             print(f"DEBUG: Returning store data: {store_data}")
             
@@ -452,7 +469,7 @@ def update_store(store_id):
         
         with get_cursor() as cursor:
             # Verify ownership
-            sql = "SELECT owner_id FROM stores WHERE store_id = %s"
+            sql = "SELECT owner_id, city, address FROM stores WHERE store_id = %s"
             cursor.execute(sql, (store_id,))
             store = cursor.fetchone()
             
@@ -501,6 +518,11 @@ def update_store(store_id):
                     'message': 'No valid fields to update'
                 }), 400
             
+            # Re-geocode when the location changes
+            if 'city' in data or 'address' in data:
+                update_fields.extend(["latitude = %s", "longitude = %s"])
+                values.extend(store_location(data.get('city', store['city']), data.get('address', store['address'])))
+            
             values.append(store_id)
             
             # Execute update
@@ -508,6 +530,7 @@ def update_store(store_id):
             cursor.execute(sql, values)
             
         db.commit()
+        invalidate_owner_context(user_id)
         
         return jsonify({
             'success': True,
@@ -557,56 +580,103 @@ def get_store_schema():
             'message': f'Error: {str(e)}'
         })
 
+MAX_TOP_STORES = 500  # Prevent excessive queries
+
+# Each ranking's top MAX_TOP_STORES is precomputed and cached for this long;
+# requests slice the cached list, so any limit costs no query while it is fresh
+LEADERBOARD_TTL = int(os.getenv('LEADERBOARD_TTL', '30'))
+leaderboard_cache = TTLCache(LEADERBOARD_TTL, max_entries=8)
+
+TOP_STORE_COLUMNS = """
+    s.store_id, s.name, s.description, s.address, s.city, 
+    s.phone, s.email, s.logo_url, s.hero_image_url, 
+    s.avg_rating, s.date_created,
+    s.active_product_count as product_count
+"""
+
+# ranking -> query for its top stores. active_product_count is kept by the
+# products_active_count trigger; both column rankings read a partial index in order.
+STORE_RANKINGS = {
+    'products': f"""
+        SELECT {TOP_STORE_COLUMNS}
+        FROM stores s
+        WHERE s.is_active = true
+        ORDER BY s.active_product_count DESC, s.date_created DESC
+        LIMIT %s
+    """,
+    'rating': f"""
+        SELECT {TOP_STORE_COLUMNS}
+        FROM stores s
+        WHERE s.is_active = true
+        ORDER BY s.avg_rating DESC NULLS LAST, s.date_created DESC
+        LIMIT %s
+    """,
+    'orders_30d': f"""
+        SELECT {TOP_STORE_COLUMNS}, recent.order_count as recent_order_count
+        FROM (
+            SELECT store_id, COUNT(*) as order_count
+            FROM orders
+            WHERE date_created >= CURRENT_TIMESTAMP - INTERVAL '30 days'
+              AND status <> 'cancelled'
+            GROUP BY store_id
+        ) recent
+        JOIN stores s ON s.store_id = recent.store_id
+        WHERE s.is_active = true
+        ORDER BY recent.order_count DESC, s.date_created DESC
+        LIMIT %s
+    """,
+}
+
+def format_top_store(store):
+    top_store = {
+        'store_id': store['store_id'],
+        'name': store['name'],
+        'description': store['description'],
+        'address': store['address'],
+        'city': store['city'],
+        'phone': store['phone'],
+        'email': store['email'],
+        'logo_url': store['logo_url'],
+        'hero_image_url': store['hero_image_url'],
+        'avg_rating': float(store['avg_rating']) if store['avg_rating'] else 0.0,
+        'date_created': store['date_created'].isoformat() if store['date_created'] else None,
+        'product_count': store['product_count']
+    }
+    if 'recent_order_count' in store.keys():
+        top_store['recent_order_count'] = store['recent_order_count']
+    return top_store
+
+def load_leaderboard(ranking):
+    """The cached top MAX_TOP_STORES stores for a ranking, recomputed when stale"""
+    leaderboard = leaderboard_cache.get(ranking)
+    if leaderboard is None:
+        with get_cursor() as cursor:
+            cursor.execute(STORE_RANKINGS[ranking], (MAX_TOP_STORES,))
+            leaderboard = [format_top_store(store) for store in cursor.fetchall()]
+        leaderboard_cache.set(ranking, leaderboard)
+    return leaderboard
+
 @stores_bp.route('/top-stores', methods=['GET'])
 def get_top_stores():
-    """Get top stores by product count"""
+    """Get top stores by product count, rating (sort=rating) or 30-day orders (sort=orders_30d)"""
     try:
         limit = request.args.get('limit', 5, type=int)
         # Add a reasonable maximum limit
-        limit = min(limit, 500)  # Prevent excessive queries
+        limit = min(limit, MAX_TOP_STORES)
+        ranking = request.args.get('sort', 'products')
         
-        with get_cursor() as cursor:
-            # Get stores with their product count, ordered by product count desc
-            sql = """
-                SELECT s.store_id, s.name, s.description, s.address, s.city, 
-                       s.phone, s.email, s.logo_url, s.hero_image_url, 
-                       s.avg_rating, s.date_created,
-                       COUNT(p.product_id) as product_count
-                FROM stores s
-                LEFT JOIN products p ON s.store_id = p.store_id AND p.is_active = true
-                WHERE s.is_active = true
-                GROUP BY s.store_id, s.name, s.description, s.address, s.city, 
-                         s.phone, s.email, s.logo_url, s.hero_image_url, 
-                         s.avg_rating, s.date_created
-                ORDER BY product_count DESC, s.date_created DESC
-                LIMIT %s
-            """
-            cursor.execute(sql, (limit,))
-            stores = cursor.fetchall()
-            
-            # Convert to list of dictionaries
-            stores_list = []
-            for store in stores:
-                stores_list.append({
-                    'store_id': store['store_id'],
-                    'name': store['name'],
-                    'description': store['description'],
-                    'address': store['address'],
-                    'city': store['city'],
-                    'phone': store['phone'],
-                    'email': store['email'],
-                    'logo_url': store['logo_url'],
-                    'hero_image_url': store['hero_image_url'],
-                    'avg_rating': float(store['avg_rating']) if store['avg_rating'] else 0.0,
-                    'date_created': store['date_created'].isoformat() if store['date_created'] else None,
-                    'product_count': store['product_count']
-                })
-            
+        if ranking not in STORE_RANKINGS:
             return jsonify({
-                'success': True,
-                'stores': stores_list,
-                'total': len(stores_list)
-            }), 200
+                'success': False,
+                'message': f"sort must be one of: {', '.join(STORE_RANKINGS)}"
+            }), 400
+        
+        stores_list = load_leaderboard(ranking)[:max(limit, 0)]
+        return jsonify({
+            'success': True,
+            'stores': stores_list,
+            'total': len(stores_list)
+        }), 200
             
     except Exception as e:
         print(f"Error fetching top stores: {e}")
@@ -617,6 +687,284 @@ def get_top_stores():
             'message': f'Error fetching stores: {str(e)}'
         }), 500
 
+@stores_bp.route('/nearby', methods=['GET'])
+def get_nearby_stores():
+    """Stores within radius km (default 10) of lat/lng, or of a city's centre, nearest first"""
+    try:
+        try:
+            params, origin = nearby_query(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        with get_cursor() as cursor:
+            cursor.execute(NEARBY_STORES_SQL, params)
+            stores_list = [format_nearby_store(store) for store in cursor.fetchall()]
+        
+        return jsonify({
+            'success': True,
+            'origin': origin,
+            'stores': stores_list,
+            'total': len(stores_list)
+        }), 200
+        
+    except Exception as e:
+        print(f"Error fetching nearby stores: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching nearby stores: {str(e)}'
+        }), 500
+
+STORE_DIRECTORY_LIMIT = 20
+MAX_STORE_DIRECTORY_LIMIT = 100
+STORE_CARD_DESCRIPTION_CHARS = 200
+
+# sort -> (ORDER BY, keyset condition after the cursor row, card field holding the
+# sort value, type of that value). store_id breaks ties so every position is unique;
+# each ORDER BY matches a partial index from migrations/0007_store_directory.sql.
+STORE_DIRECTORY_SORTS = {
+    'name': (
+        "s.name ASC, s.store_id ASC",
+        "(s.name, s.store_id) > (%s, %s)",
+        'name', str
+    ),
+    'rating': (
+        "COALESCE(s.avg_rating, 0) DESC, s.store_id DESC",
+        "(COALESCE(s.avg_rating, 0), s.store_id) < (%s, %s)",
+        'avg_rating', Decimal
+    ),
+    'products': (
+        "s.active_product_count DESC, s.store_id DESC",
+        "(s.active_product_count, s.store_id) < (%s, %s)",
+        'product_count', int
+    ),
+}
+
+# Only what a store card shows; fetches one row past the page to know if there is more
+STORE_DIRECTORY_SQL = f"""
+    SELECT s.store_id, s.name, LEFT(s.description, {STORE_CARD_DESCRIPTION_CHARS}) as description,
+           s.address, s.city, s.phone, s.logo_url,
+           COALESCE(s.avg_rating, 0) as avg_rating,
+           s.active_product_count as product_count
+    FROM stores s
+    WHERE {{where_clause}}
+    ORDER BY {{order_clause}}
+    LIMIT %s
+"""
+
+def encode_directory_cursor(sort_value, store_id):
+    payload = json.dumps([str(sort_value), store_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_directory_cursor(cursor, value_type):
+    """(sort value, store_id) from a cursor; ValueError when it was not one of ours"""
+    try:
+        sort_value, store_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value_type(sort_value), str(store_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def store_directory_query(args):
+    """(sql, params, sort, limit) for a directory page; ValueError for a bad sort or cursor"""
+    sort = args.get('sort', 'name')
+    if sort not in STORE_DIRECTORY_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(STORE_DIRECTORY_SORTS)}")
+    order_clause, after_clause, _, value_type = STORE_DIRECTORY_SORTS[sort]
+
+    limit = args.get('limit', STORE_DIRECTORY_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_STORE_DIRECTORY_LIMIT))
+
+    where_conditions = ["s.is_active = true"]
+    params = []
+
+    city = args.get('city', '').strip()
+    if city:
+        where_conditions.append("lower(s.city) = lower(%s)")
+        params.append(city)
+
+    search = args.get('search', '').strip()
+    if search:
+        # Substring match served by the trigram index on name
+        where_conditions.append("s.name ILIKE %s")
+        params.append(f"%{search}%")
+
+    cursor = args.get('cursor')
+    if cursor:
+        where_conditions.append(after_clause)
+        params.extend(decode_directory_cursor(cursor, value_type))
+
+    sql = STORE_DIRECTORY_SQL.format(where_clause=" AND ".join(where_conditions), order_clause=order_clause)
+    return sql, params + [limit + 1], sort, limit
+
+def format_store_card(store):
+    return {
+        'store_id': store['store_id'],
+        'name': store['name'],
+        'description': store['description'],
+        'address': store['address'],
+        'city': store['city'],
+        'phone': store['phone'],
+        'logo_url': store['logo_url'],
+        'avg_rating': float(store['avg_rating']),
+        'product_count': store['product_count']
+    }
+
+def store_directory_page(rows, sort, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        value_field = STORE_DIRECTORY_SORTS[sort][2]
+        next_cursor = encode_directory_cursor(rows[-1][value_field], rows[-1]['store_id'])
+    return {
+        'success': True,
+        'stores': [format_store_card(store) for store in rows],
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }
+
+@stores_bp.route('', methods=['GET'], strict_slashes=False)
+@stores_bp.route('/', methods=['GET'], strict_slashes=False)
+def get_stores():
+    """Store directory: city filter, name search, sort=name|rating|products, cursor pagination"""
+    try:
+        try:
+            sql, params, sort, limit = store_directory_query(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        with get_cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        
+        return jsonify(store_directory_page(rows, sort, limit)), 200
+        
+    except Exception as e:
+        print(f"Error fetching stores: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching stores: {str(e)}'
+        }), 500
+
+STORE_PAGE_PRODUCTS_LIMIT = 12
+# Browser/CDN cache lifetime for the aggregated store page; revalidated with its ETag
+STORE_PAGE_MAX_AGE = int(os.getenv('STORE_PAGE_MAX_AGE', '60'))
+
+STORE_CATEGORY_FACETS_SQL = """
+    SELECT p.category_id, COUNT(*) as product_count
+    FROM products p
+    WHERE p.store_id = %s AND p.is_active = true
+    GROUP BY p.category_id
+"""
+
+STORE_RATING_SUMMARY_SQL = """
+    SELECT rating, COUNT(*) as review_count
+    FROM store_reviews
+    WHERE store_id = %s
+    GROUP BY rating
+"""
+
+def store_page_product_filters(store_id, args):
+    """Product listing filters for a store page; the store comes from the URL, not the query"""
+    return product_list_filters({**args.to_dict(), 'store_id': store_id})
+
+def format_rating_summary(rows):
+    distribution = {str(rating): 0 for rating in range(1, 6)}
+    for row in rows:
+        distribution[str(row['rating'])] = row['review_count']
+    review_count = sum(distribution.values())
+    total = sum(int(rating) * count for rating, count in distribution.items())
+    return {
+        'avg_rating': round(total / review_count, 2) if review_count else 0.0,
+        'review_count': review_count,
+        'distribution': distribution
+    }
+
+def store_page_payload(store, products, total, facets, ratings, page, limit):
+    return {
+        'success': True,
+        'store': format_store_details(store),
+        'products': [format_product_card(product) for product in products],
+        'pagination': {
+            'total': total,
+            'page': page,
+            'limit': limit,
+            'pages': (total + limit - 1) // limit
+        },
+        'categories': sorted((
+            {
+                'category_id': facet['category_id'],
+                'name': category_name(facet['category_id']),
+                'product_count': facet['product_count']
+            }
+            for facet in facets
+        ), key=lambda category: category['name'] or ''),
+        'rating_summary': format_rating_summary(ratings)
+    }
+
+def store_page_cache_headers(payload):
+    """(etag, headers) so the whole page is cached, and revalidated, as one unit"""
+    etag = hashlib.md5(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return etag, {
+        'ETag': f'"{etag}"',
+        'Cache-Control': f'public, max-age={STORE_PAGE_MAX_AGE}'
+    }
+
+@stores_bp.route('/<store_id>/page', methods=['GET'])
+def get_store_page(store_id):
+    """Store details, the first products page, category facets and rating summary in one response"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        limit = request.args.get('limit', STORE_PAGE_PRODUCTS_LIMIT, type=int)
+        offset = (page - 1) * limit
+        where_clause, params, order_clause = store_page_product_filters(store_id, request.args)
+        refresh_categories()
+        
+        # One connection for all five queries; the async server runs them concurrently
+        with get_cursor() as cursor:
+            cursor.execute(STORE_DETAILS_SQL, (store_id,))
+            store = cursor.fetchone()
+            
+            if not store:
+                return jsonify({
+                    'success': False,
+                    'message': 'Store not found'
+                }), 404
+            
+            cursor.execute(PRODUCT_COUNT_SQL.format(where_clause=where_clause), params)
+            total = cursor.fetchone()['total']
+            
+            cursor.execute(
+                PRODUCT_LIST_SQL.format(where_clause=where_clause, order_clause=order_clause),
+                params + [limit, offset]
+            )
+            products = cursor.fetchall()
+            
+            cursor.execute(STORE_CATEGORY_FACETS_SQL, (store_id,))
+            facets = cursor.fetchall()
+            
+            cursor.execute(STORE_RATING_SUMMARY_SQL, (store_id,))
+            ratings = cursor.fetchall()
+        
+        payload = store_page_payload(store, products, total, facets, ratings, page, limit)
+        etag, headers = store_page_cache_headers(payload)
+        if request.if_none_match.contains(etag):
+            return '', 304, headers
+        
+        return jsonify(payload), 200, headers
+        
+    except Exception as e:
+        print(f"Error fetching store page: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching store page: {str(e)}'
+        }), 500
+
 @stores_bp.route('/test-api/<store_id>', methods=['GET'])
 def test_store_api(store_id):
     """Test endpoint to debug store API issues"""
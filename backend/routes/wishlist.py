@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database.db import get_cursor, get_db
+from utils.categories import category_name, refresh_categories
+from utils.images import rendition_sql
 import uuid
-from datetime import datetime
 
 wishlist_bp = Blueprint('wishlist', __name__)
 
@@ -14,10 +15,11 @@ def get_wishlist():
     try:
         user_id = get_jwt_identity()
         print(f"DEBUG: Getting wishlist for user: {user_id}")
+        refresh_categories()
         
         with get_cursor() as cursor:
             # Simple query to get wishlist items
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT 
                     wi.wishlist_item_id,
                     wi.product_id,
@@ -29,13 +31,12 @@ def get_wishlist():
                     p.stock_quantity,
                     p.is_featured,
                     s.name as store_name,
-                    COALESCE(c.name, 'Uncategorized') as category_name,
-                    COALESCE(pi.image_url, '') as image_url
+                    p.category_id,
+                    COALESCE({rendition_sql('card')}, '') as image_url
                 FROM wishlist w
                 JOIN wishlist_items wi ON w.wishlist_id = wi.wishlist_id
                 JOIN products p ON wi.product_id = p.product_id
                 JOIN stores s ON p.store_id = s.store_id
-                LEFT JOIN categories c ON p.category_id = c.category_id
                 LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = true
                 WHERE w.user_id = %s AND p.is_active = true
                 ORDER BY wi.date_added DESC
@@ -64,7 +65,7 @@ def get_wishlist():
                     'stock_quantity': item_data['stock_quantity'],
                     'is_featured': item_data['is_featured'],
                     'store_name': item_data['store_name'],
-                    'category_name': item_data['category_name'],
+                    'category_name': category_name(item_data['category_id'], 'Uncategorized'),
                     'image_url': item_data['image_url'],
                     'date_added': item_data['date_added'].isoformat() if item_data['date_added'] else None
                 })
@@ -85,6 +86,31 @@ def get_wishlist():
             'message': f'Error getting wishlist: {str(e)}'
         }), 500
 
+ADD_TO_WISHLIST_SQL = """
+    WITH user_wishlist AS (
+        INSERT INTO wishlist (wishlist_id, user_id, date_created)
+        VALUES (%(new_wishlist_id)s, %(user_id)s, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id) DO UPDATE SET user_id = EXCLUDED.user_id
+        RETURNING wishlist_id
+    ),
+    product AS (
+        SELECT product_id, name
+        FROM products
+        WHERE product_id = %(product_id)s AND is_active = true
+    ),
+    upserted AS (
+        INSERT INTO wishlist_items (wishlist_item_id, wishlist_id, product_id, date_added)
+        SELECT %(new_item_id)s, user_wishlist.wishlist_id, product.product_id, CURRENT_TIMESTAMP
+        FROM user_wishlist, product
+        ON CONFLICT (wishlist_id, product_id) DO UPDATE
+        SET date_added = wishlist_items.date_added
+        RETURNING wishlist_item_id, product_id, (xmax = 0) as inserted
+    )
+    SELECT upserted.wishlist_item_id, upserted.inserted, product.name
+    FROM upserted
+    JOIN product ON upserted.product_id = product.product_id
+"""
+
 @wishlist_bp.route('/add', methods=['POST'])
 @jwt_required()
 def add_to_wishlist():
@@ -104,119 +130,46 @@ def add_to_wishlist():
         
         product_id = data['product_id']
         
-        # Use manual transaction handling like the clear function
-        db = get_db()
-        cursor = db.cursor()
-        
-        try:
-            # Check if product exists and is active
-            cursor.execute("""
-                SELECT product_id, name, is_active 
-                FROM products 
-                WHERE product_id = %s
-            """, (product_id,))
-            product_row = cursor.fetchone()
-            
-            if not product_row:
-                return jsonify({
-                    'success': False,
-                    'message': 'Product not found'
-                }), 404
-            
-            # Handle both dict and tuple returns
-            if isinstance(product_row, dict):
-                product_name = product_row['name']
-                is_active = product_row['is_active']
-            else:
-                product_name = product_row[1]
-                is_active = product_row[2]
-            
-            print(f"DEBUG: Product found: {product_name}, active: {is_active}")
-            
-            if not is_active:
+        with get_cursor() as cursor:
+            # Create the wishlist if needed and add the item in one statement;
+            # an existing item is matched by the unique (wishlist_id, product_id) key
+            cursor.execute(ADD_TO_WISHLIST_SQL, {
+                'new_wishlist_id': str(uuid.uuid4()),
+                'new_item_id': str(uuid.uuid4()),
+                'user_id': user_id,
+                'product_id': product_id
+            })
+            added = cursor.fetchone()
+            
+            if not added:
+                cursor.execute("SELECT is_active FROM products WHERE product_id = %s", (product_id,))
+                product = cursor.fetchone()
+                
+                if not product:
+                    return jsonify({
+                        'success': False,
+                        'message': 'Product not found'
+                    }), 404
+                
                 return jsonify({
                     'success': False,
                     'message': 'Product is not available'
                 }), 400
-            
-            # Get or create user's wishlist
-            cursor.execute("""
-                SELECT wishlist_id FROM wishlist WHERE user_id = %s
-            """, (user_id,))
-            wishlist_row = cursor.fetchone()
-            
-            if wishlist_row:
-                wishlist_id = wishlist_row[0] if isinstance(wishlist_row, tuple) else wishlist_row['wishlist_id']
-                print(f"DEBUG: Using existing wishlist: {wishlist_id}")
-            else:
-                # Create wishlist for user
-                wishlist_id = str(uuid.uuid4())
-                cursor.execute("""
-                    INSERT INTO wishlist (wishlist_id, user_id, date_created)
-                    VALUES (%s, %s, %s)
-                """, (wishlist_id, user_id, datetime.utcnow()))
-                print(f"DEBUG: Created new wishlist {wishlist_id} for user {user_id}")
-            
-            # Check if item already exists in wishlist
-            cursor.execute("""
-                SELECT wishlist_item_id 
-                FROM wishlist_items 
-                WHERE wishlist_id = %s AND product_id = %s
-            """, (wishlist_id, product_id))
-            existing_item = cursor.fetchone()
-            
-            if existing_item:
-                print(f"DEBUG: Product already in wishlist")
-                return jsonify({
-                    'success': True,
-                    'message': f'{product_name} is already in your wishlist',
-                    'already_exists': True
-                }), 200
-            
-            # Add new item to wishlist
-            wishlist_item_id = str(uuid.uuid4())
-            cursor.execute("""
-                INSERT INTO wishlist_items (wishlist_item_id, wishlist_id, product_id, date_added)
-                VALUES (%s, %s, %s, %s)
-            """, (wishlist_item_id, wishlist_id, product_id, datetime.utcnow()))
-            
-            rows_affected = cursor.rowcount
-            print(f"DEBUG: Insert affected {rows_affected} rows")
-            
-            # Commit the transaction manually
-            db.commit()
-            print(f"DEBUG: Add wishlist transaction committed")
-            
-            # Verify the item was actually added
-            cursor.execute("""
-                SELECT COUNT(*) FROM wishlist_items 
-                WHERE wishlist_item_id = %s
-            """, (wishlist_item_id,))
-            verification_count = cursor.fetchone()[0]
-            print(f"DEBUG: Verification - items with new ID: {verification_count}")
-            
-            if verification_count == 0:
-                print(f"ERROR: Item was not actually added to database!")
-                return jsonify({
-                    'success': False,
-                    'message': 'Database error: Item was not added'
-                }), 500
-            
-            cursor.close()
-            
-            print(f"DEBUG: Successfully added {product_name} to wishlist")
+        
+        if not added['inserted']:
+            print(f"DEBUG: Product already in wishlist")
             return jsonify({
                 'success': True,
-                'message': f'{product_name} added to wishlist successfully!',
-                'wishlist_item_id': wishlist_item_id
-            }), 201
-            
-        except Exception as e:
-            # Rollback on error
-            db.rollback()
-            print(f"DEBUG: Rolling back add transaction due to error: {e}")
-            cursor.close()
-            raise e
+                'message': f'{added["name"]} is already in your wishlist',
+                'already_exists': True
+            }), 200
+        
+        print(f"DEBUG: Successfully added {added['name']} to wishlist")
+        return jsonify({
+            'success': True,
+            'message': f'{added["name"]} added to wishlist successfully!',
+            'wishlist_item_id': added['wishlist_item_id']
+        }), 201
         
     except Exception as e:
         print(f"Error adding to wishlist: {e}")
@@ -226,13 +179,6 @@ def add_to_wishlist():
             'success': False,
             'message': f'Error adding to wishlist: {str(e)}'
         }), 500
-    finally:
-        # Clean up database connection
-        if 'db' in locals():
-            try:
-                db.close()
-            except:
-                pass
 
 @wishlist_bp.route('/remove/<item_id>', methods=['DELETE'])
 @jwt_required()
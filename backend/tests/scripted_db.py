@@ -0,0 +1,60 @@
+"""A cursor that replays canned results, for testing route and helper logic without PostgreSQL"""
+from contextlib import contextmanager
+
+
+class ScriptedConnection:
+    def __init__(self):
+        self.committed = False
+        self.rolled_back = False
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+class ScriptedCursor:
+    """Each execute() takes the next scripted result: a list of rows, or
+    {'rows': [...], 'rowcount': n} when the statement's rowcount matters.
+    Statements past the end of the script return no rows.
+    """
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.connection = ScriptedConnection()
+        self.rows = []
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+        result = self.results.pop(0) if self.results else []
+        if isinstance(result, dict):
+            self.rows, self.rowcount = result.get('rows', []), result['rowcount']
+        else:
+            self.rows, self.rowcount = result, len(result)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def ran(self, fragment):
+        """Whether any executed statement contains `fragment`"""
+        return any(fragment in sql for sql, _ in self.statements)
+
+
+def scripted_get_cursor(*cursors):
+    """A get_cursor() replacement handing out the given cursors in order and
+    committing on a clean exit, like database.db.get_cursor()"""
+    remaining = list(cursors)
+
+    @contextmanager
+    def get_cursor():
+        cursor = remaining.pop(0)
+        yield cursor
+        cursor.connection.commit()
+
+    return get_cursor
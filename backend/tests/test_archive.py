@@ -0,0 +1,90 @@
+import os
+import re
+
+import pytest
+
+archive = pytest.importorskip('utils.archive')
+
+from tests.scripted_db import ScriptedCursor, scripted_get_cursor
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'schema.sql')
+
+# Columns the archive tables fill from their own defaults
+ARCHIVE_ONLY_COLUMNS = {'date_archived'}
+
+
+def schema_columns(table):
+    with open(SCHEMA_PATH) as file:
+        body = re.search(rf'CREATE TABLE {table} \((.*?)\n\);', file.read(), re.DOTALL).group(1)
+    return {
+        line.split()[0] for line in body.strip().splitlines()
+        if line.strip() and not line.strip().startswith(('FOREIGN', 'PRIMARY', 'UNIQUE', 'CHECK', 'CONSTRAINT'))
+    }
+
+
+def moves(sql):
+    """{target table: (inserted columns, selected columns)} of each INSERT ... SELECT in a move statement"""
+    result = {}
+    for table, columns, selected in re.findall(r'INSERT INTO (\w+) \((.*?)\)\s*SELECT (.*?)\s+FROM', sql, re.DOTALL):
+        result[table] = (
+            [column.strip() for column in columns.split(',')],
+            [column.strip().split('.')[-1] for column in selected.split(',')],
+        )
+    return result
+
+
+def test_archive_tables_take_every_column_they_store():
+    archived = moves(archive.ARCHIVE_PRODUCTS_SQL)
+
+    for table in ('archived_products', 'archived_product_images', 'archived_reviews'):
+        columns, selected = archived[table]
+        assert set(columns) == schema_columns(table) - ARCHIVE_ONLY_COLUMNS
+        assert selected == columns
+
+
+def test_restore_puts_back_everything_archive_took():
+    archived = moves(archive.ARCHIVE_PRODUCTS_SQL)
+    restored = moves(archive.RESTORE_PRODUCTS_SQL)
+
+    pairs = {'products': 'archived_products', 'product_images': 'archived_product_images', 'reviews': 'archived_reviews'}
+    for live, archived_table in pairs.items():
+        restored_columns, restored_selected = restored[live]
+        archived_columns, _ = archived[archived_table]
+        assert set(archived_columns) <= set(restored_columns)
+        assert set(restored_columns) <= schema_columns(live)
+        assert len(restored_selected) == len(restored_columns)
+
+    # Products come back inactive and touched; everything else is copied as archived
+    columns, selected = restored['products']
+    values = dict(zip(columns, selected))
+    assert values.pop('is_active') == 'false'
+    assert values.pop('date_updated') == 'CURRENT_TIMESTAMP'
+    assert all(column == value for column, value in values.items())
+
+
+def test_archive_and_restore_pass_ids_as_a_list():
+    cursor = ScriptedCursor([{'product_id': 'p1', 'name': 'Cupcake'}], [{'product_id': 'p1', 'name': 'Cupcake'}])
+
+    assert archive.archive_products(cursor, ('p1',)) == [{'product_id': 'p1', 'name': 'Cupcake'}]
+    assert archive.restore_products(cursor, {'p1'}) == [{'product_id': 'p1', 'name': 'Cupcake'}]
+    assert [sql for sql, _ in cursor.statements] == [archive.ARCHIVE_PRODUCTS_SQL, archive.RESTORE_PRODUCTS_SQL]
+    assert all(params == {'product_ids': ['p1']} for _, params in cursor.statements)
+
+
+def test_nothing_to_move_runs_no_statement():
+    cursor = ScriptedCursor()
+
+    assert archive.archive_products(cursor, []) == []
+    assert archive.restore_products(cursor, []) == []
+    assert cursor.statements == []
+
+
+def test_retired_products_are_archived_in_batches(monkeypatch):
+    full = ScriptedCursor([{'product_id': 'p1'}, {'product_id': 'p2'}], [{'product_id': 'p1'}, {'product_id': 'p2'}])
+    short = ScriptedCursor([{'product_id': 'p3'}], [{'product_id': 'p3'}])
+    monkeypatch.setattr(archive, 'get_cursor', scripted_get_cursor(full, short))
+
+    assert archive.archive_retired_products(days=30, batch_size=2) == 3
+    assert full.statements[0][1] == (30, 2)
+    assert full.statements[1][1] == {'product_ids': ['p1', 'p2']}
+    assert full.connection.committed and short.connection.committed
@@ -0,0 +1,28 @@
+import pytest
+
+db = pytest.importorskip('async_api.db')
+
+
+def test_to_asyncpg_numbers_placeholders_in_order():
+    sql = "SELECT * FROM products WHERE store_id = %s AND price < %s LIMIT %s OFFSET %s"
+    assert db.to_asyncpg(sql) == "SELECT * FROM products WHERE store_id = $1 AND price < $2 LIMIT $3 OFFSET $4"
+
+
+def test_to_asyncpg_without_placeholders():
+    assert db.to_asyncpg("SELECT 1") == "SELECT 1"
+
+
+def test_to_asyncpg_unescapes_percent():
+    sql = "SELECT * FROM stores WHERE name ILIKE 'a%%' AND city = %s"
+    assert db.to_asyncpg(sql) == "SELECT * FROM stores WHERE name ILIKE 'a%' AND city = $1"
+
+
+def test_to_asyncpg_keeps_casts():
+    assert db.to_asyncpg("width_bucket(p.price, %s::int[]::numeric[])") == "width_bucket(p.price, $1::int[]::numeric[])"
+
+
+def test_to_asyncpg_matches_shared_sql():
+    products = pytest.importorskip('routes.products')
+    converted = db.to_asyncpg(products.PRODUCT_DETAIL_SQL)
+    assert '%s' not in converted
+    assert '$1' in converted and '$2' not in converted
@@ -0,0 +1,111 @@
+import pytest
+
+auth = pytest.importorskip('utils.auth')
+flask = pytest.importorskip('flask')
+
+app = flask.Flask(__name__)
+
+
+class FakeCursor:
+    """Answers the owner-context queries from a dict of user rows"""
+
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+        self.row = None
+
+    def execute(self, sql, params):
+        self.queries.append(sql)
+        user = self.users.get(params[0])
+        if user is None:
+            self.row = None
+        elif sql == auth.OWNER_USER_SQL:
+            self.row = {field: user[field] for field in ('user_id', 'role', 'is_active')}
+        else:
+            self.row = dict(user)
+
+    def fetchone(self):
+        return self.row
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    auth.owner_context_cache.invalidate()
+    yield
+    auth.owner_context_cache.invalidate()
+
+
+@pytest.fixture
+def users():
+    return {
+        'u1': {'user_id': 'u1', 'role': 'supplier', 'is_active': True, 'supplier_id': 'sp1',
+               'store_id': 's1', 'store_name': 'Sweet Treats', 'store_is_active': True},
+        'u2': {'user_id': 'u2', 'role': 'supplier', 'is_active': True, 'supplier_id': 'sp2',
+               'store_id': None, 'store_name': None, 'store_is_active': None},
+    }
+
+
+def lookup(cursor, user_id):
+    """get_owner_context() as one request would call it"""
+    with app.app_context():
+        return auth.get_owner_context(cursor, user_id)
+
+
+def test_context_is_loaded_once_per_request(users):
+    cursor = FakeCursor(users)
+    with app.app_context():
+        first = auth.get_owner_context(cursor, 'u1')
+        second = auth.get_owner_context(cursor, 'u1')
+    assert first is second
+    assert cursor.queries == [auth.OWNER_CONTEXT_SQL]
+
+
+def test_cached_store_still_reads_user_fresh(users):
+    cursor = FakeCursor(users)
+    lookup(cursor, 'u1')
+    context = lookup(cursor, 'u1')
+    assert cursor.queries == [auth.OWNER_CONTEXT_SQL, auth.OWNER_USER_SQL]
+    assert context['store_id'] == 's1' and context['store_name'] == 'Sweet Treats'
+
+
+def test_deactivation_and_role_change_apply_on_next_request(users):
+    cursor = FakeCursor(users)
+    lookup(cursor, 'u1')
+
+    users['u1']['is_active'] = False
+    users['u1']['role'] = 'customer'
+    context = lookup(cursor, 'u1')
+    assert context['is_active'] is False
+    assert context['role'] == 'customer'
+
+
+def test_missing_store_is_not_cached(users):
+    cursor = FakeCursor(users)
+    assert lookup(cursor, 'u2')['store_id'] is None
+
+    # Created by another worker: visible on the very next request
+    users['u2'].update(store_id='s2', store_name='New Store', store_is_active=True)
+    assert lookup(cursor, 'u2')['store_id'] == 's2'
+    assert cursor.queries == [auth.OWNER_CONTEXT_SQL, auth.OWNER_CONTEXT_SQL]
+
+
+def test_deleted_user_drops_cached_store(users):
+    cursor = FakeCursor(users)
+    lookup(cursor, 'u1')
+
+    del users['u1']
+    assert lookup(cursor, 'u1') is None
+    assert auth.owner_context_cache.get('u1') is None
+
+
+def test_invalidate_forgets_cached_store_and_request_context(users):
+    cursor = FakeCursor(users)
+    lookup(cursor, 'u1')
+    users['u1']['store_name'] = 'Renamed'
+
+    with app.app_context():
+        auth.get_owner_context(cursor, 'u1')
+        auth.invalidate_owner_context('u1')
+        assert 'owner_context' not in flask.g
+        assert auth.get_owner_context(cursor, 'u1')['store_name'] == 'Renamed'
+    assert cursor.queries[-1] == auth.OWNER_CONTEXT_SQL
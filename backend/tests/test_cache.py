@@ -0,0 +1,69 @@
+from utils import cache
+from utils.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(monkeypatch, ttl=10, max_entries=1024):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return TTLCache(ttl, max_entries=max_entries), clock
+
+
+def test_get_returns_value_until_ttl(monkeypatch):
+    ttl_cache, clock = make_cache(monkeypatch)
+    ttl_cache.set('key', {'value': 1})
+
+    clock.now += 10
+    assert ttl_cache.get('key') == {'value': 1}
+
+    clock.now += 0.1
+    assert ttl_cache.get('key') is None
+    assert 'key' not in ttl_cache.entries
+
+
+def test_missing_key(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch)
+    assert ttl_cache.get('missing') is None
+
+
+def test_set_restarts_ttl(monkeypatch):
+    ttl_cache, clock = make_cache(monkeypatch)
+    ttl_cache.set('key', 1)
+    clock.now += 8
+    ttl_cache.set('key', 2)
+    clock.now += 8
+    assert ttl_cache.get('key') == 2
+
+
+def test_full_cache_evicts_oldest(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch, max_entries=2)
+    ttl_cache.set('a', 1)
+    ttl_cache.set('b', 2)
+    ttl_cache.set('a', 3)  # replacing an entry does not evict
+    assert ttl_cache.get('b') == 2
+
+    ttl_cache.set('c', 4)
+    assert ttl_cache.get('a') is None
+    assert ttl_cache.get('b') == 2
+    assert ttl_cache.get('c') == 4
+
+
+def test_invalidate(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch)
+    ttl_cache.set('a', 1)
+    ttl_cache.set('b', 2)
+
+    ttl_cache.invalidate('a')
+    ttl_cache.invalidate('unknown')
+    assert ttl_cache.get('a') is None
+    assert ttl_cache.get('b') == 2
+
+    ttl_cache.invalidate()
+    assert ttl_cache.entries == {}
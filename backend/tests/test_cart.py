@@ -0,0 +1,293 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+cart = pytest.importorskip('routes.cart')
+flask = pytest.importorskip('flask')
+flask_jwt_extended = pytest.importorskip('flask_jwt_extended')
+
+from tests.scripted_db import ScriptedCursor, scripted_get_cursor
+
+SHIPPING = {'shipping_address': '12 Temple Road', 'shipping_city': 'Kandy', 'shipping_phone': '0771234567'}
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'cart-tests-secret-key-of-32-bytes!'
+    flask_jwt_extended.JWTManager(app)
+    app.register_blueprint(cart.cart_bp, url_prefix='/api/cart')
+    return app
+
+
+@pytest.fixture
+def headers(app):
+    with app.app_context():
+        token = flask_jwt_extended.create_access_token(identity='buyer')
+    return {'Authorization': f'Bearer {token}'}
+
+
+def use_cursors(monkeypatch, *cursors):
+    monkeypatch.setattr(cart, 'get_cursor', scripted_get_cursor(*cursors))
+
+
+def cart_row(**fields):
+    row = {
+        'cart_id': 'c1', 'cart_item_id': 'i1', 'product_id': 'p1', 'quantity': 2,
+        'date_added': datetime(2024, 5, 1, 10, 30), 'name': 'Cupcake', 'description': 'Vanilla',
+        'price': Decimal('5.00'), 'sale_price': Decimal('0'), 'stock_quantity': 10, 'available_quantity': 8,
+        'store_name': 'Sweet Treats', 'store_id': 's1', 'primary_image_url': '/uploads/products/a.webp',
+        'effective_price': Decimal('5.00'), 'item_total': Decimal('10.00'),
+        'total_items': 2, 'total_amount': Decimal('10.00'),
+    }
+    row.update(fields)
+    return row
+
+
+# normalize_cart_operations
+
+def test_operations_fold_into_one_per_product():
+    net, error = cart.normalize_cart_operations([
+        {'product_id': 'p1', 'op': 'set', 'quantity': 2},
+        {'product_id': 'p1', 'op': 'increment', 'quantity': 3},
+        {'product_id': 'p2', 'op': 'increment'},
+        {'product_id': 'p3', 'op': 'remove'},
+    ])
+    assert error is None
+    assert net == {'p1': ('set', 5), 'p2': ('increment', 1), 'p3': ('remove', 0)}
+
+
+def test_later_set_overrides_and_set_zero_removes():
+    net, _ = cart.normalize_cart_operations([
+        {'product_id': 'p1', 'op': 'increment', 'quantity': 4},
+        {'product_id': 'p1', 'quantity': 1},
+        {'product_id': 'p2', 'op': 'set', 'quantity': 0},
+    ])
+    assert net == {'p1': ('set', 1), 'p2': ('remove', 0)}
+
+
+def test_increment_after_remove_sets_quantity():
+    net, _ = cart.normalize_cart_operations([
+        {'product_id': 'p1', 'op': 'remove'},
+        {'product_id': 'p1', 'op': 'increment', 'quantity': 2},
+    ])
+    assert net == {'p1': ('set', 2)}
+
+
+@pytest.mark.parametrize('operations, message', [
+    ([], 'operations must be a non-empty list'),
+    ({'product_id': 'p1'}, 'operations must be a non-empty list'),
+    ([{'op': 'set'}], 'Operation 0: product_id is required'),
+    ([{'product_id': 'p1', 'op': 'double'}], 'Operation 0: op must be one of set, increment, remove'),
+    ([{'product_id': 'p1', 'quantity': 'two'}], 'Operation 0: quantity must be an integer'),
+    ([{'product_id': 'p1', 'quantity': -1}], 'Operation 0: invalid quantity -1'),
+    ([{'product_id': 'p1'}, {'product_id': 'p2', 'op': 'increment', 'quantity': 0}],
+     'Operation 1: invalid quantity 0'),
+])
+def test_invalid_operations(operations, message):
+    assert cart.normalize_cart_operations(operations) == (None, message)
+
+
+# Cart reads
+
+def test_fetch_cart_formats_items_and_sql_totals():
+    cursor = ScriptedCursor([cart_row(), cart_row(cart_item_id='i2', product_id='p2', sale_price=Decimal('4.00'))])
+    result = cart.fetch_cart(cursor, 'buyer')
+
+    assert cursor.statements == [(cart.CART_ITEMS_SQL, ('buyer',))]
+    assert result['cart_id'] == 'c1'
+    assert result['total_items'] == 2 and result['total_amount'] == 10.0
+    assert [item['sale_price'] for item in result['items']] == [None, 4.0]
+    assert result['items'][0]['date_added'] == '2024-05-01T10:30:00'
+    assert result['items'][0]['image_url'] == '/uploads/products/a.webp'
+
+
+def test_fetch_cart_with_no_live_items():
+    row = {key: None for key in cart_row()}
+    row.update(cart_id='c1', total_items=0, total_amount=Decimal('0'))
+    assert cart.fetch_cart(ScriptedCursor([row]), 'buyer') == {
+        'cart_id': 'c1', 'items': [], 'total_items': 0, 'total_amount': 0.0
+    }
+    assert cart.fetch_cart(ScriptedCursor([]), 'buyer')['cart_id'] is None
+
+
+def test_fetch_cart_summary():
+    cursor = ScriptedCursor([{'total_items': 3, 'total_amount': Decimal('17.50')}])
+    assert cart.fetch_cart_summary(cursor, 'buyer') == {'total_items': 3, 'total_amount': 17.5}
+    assert cart.fetch_cart_summary(ScriptedCursor([]), 'buyer') == {'total_items': 0, 'total_amount': 0.0}
+
+
+# POST /items
+
+def test_add_to_cart_upserts_in_one_statement(app, headers, monkeypatch):
+    cursor = ScriptedCursor([{'cart_item_id': 'i1', 'quantity': 3, 'name': 'Cupcake'}])
+    use_cursors(monkeypatch, cursor)
+
+    response = app.test_client().post('/api/cart/items', json={'product_id': 'p1', 'quantity': 2}, headers=headers)
+
+    assert response.status_code == 201
+    assert response.get_json()['quantity'] == 3
+    sql, params = cursor.statements[0]
+    assert sql == cart.ADD_TO_CART_SQL and len(cursor.statements) == 1
+    assert params['user_id'] == 'buyer' and params['product_id'] == 'p1' and params['quantity'] == 2
+
+
+def test_add_to_cart_reports_how_many_more_fit(app, headers, monkeypatch):
+    cursor = ScriptedCursor([], [{'name': 'Cupcake', 'is_active': True, 'in_cart': 3, 'available_quantity': 4}])
+    use_cursors(monkeypatch, cursor)
+
+    response = app.test_client().post('/api/cart/items', json={'product_id': 'p1', 'quantity': 2}, headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Cannot add 2 more items. Only 1 more available'
+
+
+def test_add_to_cart_rejects_non_positive_quantity(app, headers, monkeypatch):
+    use_cursors(monkeypatch)
+    response = app.test_client().post('/api/cart/items', json={'product_id': 'p1', 'quantity': 0}, headers=headers)
+    assert response.status_code == 400
+
+
+# PATCH /items
+
+def test_bulk_update_applies_nothing_when_any_line_is_short(app, headers, monkeypatch):
+    cursor = ScriptedCursor(
+        [{'cart_id': 'c1'}],
+        [{'product_id': 'p2', 'product_exists': True, 'is_active': True, 'available_quantity': 1, 'quantity': 3}],
+    )
+    use_cursors(monkeypatch, cursor)
+
+    response = app.test_client().patch('/api/cart/items', json={'operations': [
+        {'product_id': 'p1', 'quantity': 1}, {'product_id': 'p2', 'quantity': 3}
+    ]}, headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'product_id': 'p2', 'message': 'Only 1 items available in stock'}]
+    assert cursor.connection.rolled_back
+    assert not cursor.ran('INSERT INTO cart_items')
+
+
+# POST /checkout
+
+def checkout_cursor(stores, stock_rowcount=None, orders=()):
+    line_count = sum(store['line_count'] for store in stores)
+    return ScriptedCursor(
+        [{'cart_id': 'c1'}],
+        stores,
+        [],  # release_user_reservations
+        {'rows': [], 'rowcount': line_count if stock_rowcount is None else stock_rowcount},
+        list(orders),
+    )
+
+
+def store_row(**fields):
+    return {'store_id': 's1', 'store_name': 'Sweet Treats', 'owner_id': 'seller', 'line_count': 2,
+            'unavailable': None, **fields}
+
+
+def test_checkout_requires_shipping_details(app, headers, monkeypatch):
+    use_cursors(monkeypatch)
+    response = app.test_client().post('/api/cart/checkout', json={'shipping_city': 'Kandy'}, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'shipping_address is required'
+
+
+def test_checkout_creates_one_order_per_store(app, headers, monkeypatch):
+    cursor = checkout_cursor(
+        [store_row(), store_row(store_id='s2', store_name='Cake House', line_count=1)],
+        orders=[
+            {'order_id': 'o1', 'store_id': 's1', 'total_amount': Decimal('10.00'), 'loyalty_points_earned': 2},
+            {'order_id': 'o2', 'store_id': 's2', 'total_amount': Decimal('7.50'), 'loyalty_points_earned': 0},
+        ],
+    )
+    use_cursors(monkeypatch, cursor)
+
+    response = app.test_client().post('/api/cart/checkout', json=SHIPPING, headers=headers)
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['total_amount'] == 17.5
+    assert [(order['order_id'], order['store_name']) for order in body['orders']] == [
+        ('o1', 'Sweet Treats'), ('o2', 'Cake House')
+    ]
+    # Fixed statement count, whatever the number of lines
+    assert len(cursor.statements) == 7
+    assert cursor.ran('DELETE FROM cart_items') and cursor.connection.committed
+    params = cursor.statements[5][1]
+    assert params['store_ids'] == ['s1', 's2'] and len(params['item_ids']) == 3
+
+
+def test_checkout_releases_holds_only_after_validation(app, headers, monkeypatch):
+    cursor = checkout_cursor([store_row()], orders=[
+        {'order_id': 'o1', 'store_id': 's1', 'total_amount': Decimal('10.00'), 'loyalty_points_earned': 0}
+    ])
+    use_cursors(monkeypatch, cursor)
+
+    app.test_client().post('/api/cart/checkout', json=SHIPPING, headers=headers)
+
+    statements = [sql for sql, _ in cursor.statements]
+    release = next(i for i, sql in enumerate(statements) if 'DELETE FROM stock_reservations' in sql)
+    validation = next(i for i, sql in enumerate(statements) if 'unavailable' in sql)
+    stock_update = next(i for i, sql in enumerate(statements) if 'SET stock_quantity' in sql)
+    assert validation < release < stock_update
+    # The user's own holds count as available while validating
+    assert cursor.statements[validation][1] == ('buyer', 'c1')
+
+
+@pytest.mark.parametrize('store, status', [
+    (store_row(unavailable=['Cupcake']), 400),
+    (store_row(owner_id='buyer'), 403),
+])
+def test_failed_checkout_keeps_reservations(app, headers, monkeypatch, store, status):
+    cursor = checkout_cursor([store])
+    use_cursors(monkeypatch, cursor)
+
+    response = app.test_client().post('/api/cart/checkout', json=SHIPPING, headers=headers)
+
+    assert response.status_code == status
+    assert not cursor.ran('DELETE FROM stock_reservations')
+    assert not cursor.ran('SET stock_quantity')
+
+
+def test_checkout_rolls_back_when_stock_moved(app, headers, monkeypatch):
+    cursor = checkout_cursor([store_row()], stock_rowcount=1)
+    use_cursors(monkeypatch, cursor)
+
+    response = app.test_client().post('/api/cart/checkout', json=SHIPPING, headers=headers)
+
+    assert response.status_code == 409
+    assert cursor.connection.rolled_back
+    assert not cursor.ran('INSERT INTO orders')
+
+
+def test_checkout_with_empty_cart(app, headers, monkeypatch):
+    use_cursors(monkeypatch, ScriptedCursor([]))
+    response = app.test_client().post('/api/cart/checkout', json=SHIPPING, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Your cart is empty'
+
+
+# POST /checkout/begin
+
+def test_begin_checkout_rolls_back_partial_holds(app, headers, monkeypatch):
+    cursor = ScriptedCursor([{'cart_id': 'c1'}])
+    use_cursors(monkeypatch, cursor)
+    monkeypatch.setattr(cart, 'reserve_cart', lambda cursor, user_id, cart_id: (False, ['Cupcake']))
+
+    response = app.test_client().post('/api/cart/checkout/begin', headers=headers)
+
+    assert response.status_code == 409
+    assert response.get_json()['unavailable'] == ['Cupcake']
+    assert cursor.connection.rolled_back
+
+
+def test_begin_checkout_returns_expiry(app, headers, monkeypatch):
+    use_cursors(monkeypatch, ScriptedCursor([{'cart_id': 'c1'}]))
+    monkeypatch.setattr(cart, 'reserve_cart',
+                        lambda cursor, user_id, cart_id: (True, datetime(2024, 5, 1, 12, 15)))
+
+    response = app.test_client().post('/api/cart/checkout/begin', headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['expires_at'] == '2024-05-01T12:15:00'
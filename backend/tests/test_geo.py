@@ -0,0 +1,64 @@
+import math
+
+import pytest
+
+geo = pytest.importorskip('utils.geo')
+MultiDict = pytest.importorskip('werkzeug.datastructures').MultiDict
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    dlat, dlng = math.radians(lat2 - lat1), math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return 2 * geo.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def test_bounding_box_is_centred():
+    min_lat, max_lat, min_lng, max_lng = geo.bounding_box(6.93, 79.86, 10)
+    assert min_lat < 6.93 < max_lat and min_lng < 79.86 < max_lng
+    assert max_lat - 6.93 == pytest.approx(6.93 - min_lat)
+    assert max_lng - 79.86 == pytest.approx(79.86 - min_lng)
+
+
+@pytest.mark.parametrize('latitude, longitude', [(6.93, 79.86), (0, 0), (60, 10), (-45, 170)])
+def test_bounding_box_contains_the_circle(latitude, longitude):
+    min_lat, max_lat, min_lng, max_lng = geo.bounding_box(latitude, longitude, 25)
+    # Points on the circle due north, south, east and west lie inside the box
+    assert haversine_km(latitude, longitude, max_lat, longitude) >= 25 * 0.999
+    assert haversine_km(latitude, longitude, min_lat, longitude) >= 25 * 0.999
+    assert haversine_km(latitude, longitude, latitude, max_lng) >= 25 * 0.999
+    assert haversine_km(latitude, longitude, latitude, min_lng) >= 25 * 0.999
+
+
+def test_nearby_query_from_coordinates():
+    params, origin = geo.nearby_query(MultiDict({'lat': '6.93', 'lng': '79.86', 'radius': '5', 'limit': '3'}))
+    assert params[:3] == [6.93, 6.93, 79.86]
+    assert tuple(params[3:7]) == geo.bounding_box(6.93, 79.86, 5)
+    assert params[7:] == [5, 3]
+    assert origin == {'lat': 6.93, 'lng': 79.86, 'radius_km': 5}
+    assert geo.NEARBY_STORES_SQL.count('%s') == len(params)
+
+
+def test_nearby_query_defaults_and_limit_clamp():
+    params, origin = geo.nearby_query(MultiDict({'lat': '7', 'lng': '80', 'limit': '1000'}))
+    assert origin['radius_km'] == geo.DEFAULT_NEARBY_RADIUS_KM
+    assert params[-1] == geo.MAX_NEARBY_LIMIT
+
+
+def test_nearby_query_from_city():
+    params, origin = geo.nearby_query(MultiDict({'city': ' kandy '}))
+    assert (origin['lat'], origin['lng']) == geo.geocode('Kandy')
+    assert params[0] == origin['lat']
+
+
+@pytest.mark.parametrize('args, message', [
+    ({}, 'lat and lng (or city) are required'),
+    ({'lat': '6.9'}, 'lat and lng (or city) are required'),
+    ({'city': 'Atlantis'}, 'Unknown city: Atlantis'),
+    ({'lat': '91', 'lng': '0'}, 'lat must be within [-90, 90] and lng within [-180, 180]'),
+    ({'lat': '6.9', 'lng': '79.8', 'radius': '0'}, 'radius must be between 0 and 100 km'),
+    ({'lat': '6.9', 'lng': '79.8', 'radius': '500'}, 'radius must be between 0 and 100 km'),
+])
+def test_nearby_query_rejects_bad_input(args, message):
+    with pytest.raises(ValueError) as error:
+        geo.nearby_query(MultiDict(args))
+    assert str(error.value) == message
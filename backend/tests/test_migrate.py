@@ -0,0 +1,205 @@
+import os
+
+import pytest
+
+migrate = pytest.importorskip('database.migrate')
+
+from tests.scripted_db import ScriptedCursor
+
+
+class MigrationCursor(ScriptedCursor):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class MigrationConnection:
+    """One psycopg2 connection: every cursor() shares a script, commits and autocommit are recorded"""
+
+    def __init__(self, *results):
+        self.cursor_ = MigrationCursor(*results)
+        self.autocommit = False
+        self.events = []
+
+    def cursor(self, cursor_factory=None):
+        return self.cursor_
+
+    def commit(self):
+        self.events.append('commit')
+
+    def rollback(self):
+        self.events.append('rollback')
+
+    def close(self):
+        self.events.append('close')
+
+
+def write_migration(folder, filename, sql):
+    path = folder / filename
+    path.write_text(sql)
+    return str(path)
+
+
+def test_list_migrations_orders_by_version_and_skips_other_files(tmp_path, monkeypatch):
+    for filename in ('0010_later.sql', '0002_second.sql', '0001_first.sql', 'README.md',
+                     '0003_Bad-Name.sql', '003_short.sql', '0004_draft.sql.bak'):
+        write_migration(tmp_path, filename, '')
+    monkeypatch.setattr(migrate, 'MIGRATIONS_DIR', str(tmp_path))
+
+    assert migrate.list_migrations() == [
+        (1, 'first', str(tmp_path / '0001_first.sql')),
+        (2, 'second', str(tmp_path / '0002_second.sql')),
+        (10, 'later', str(tmp_path / '0010_later.sql')),
+    ]
+    assert migrate.latest_version() == 10
+
+
+def test_shipped_migrations_have_unique_versions():
+    versions = [version for version, _, _ in migrate.list_migrations()]
+
+    assert versions == sorted(set(versions))
+    assert len(versions) == len(os.listdir(migrate.MIGRATIONS_DIR))
+
+
+def test_shipped_no_transaction_migrations_split_into_plain_statements():
+    for _, _, path in migrate.list_migrations():
+        with open(path) as file:
+            sql = file.read()
+        if sql.startswith(migrate.NO_TRANSACTION_MARKER):
+            assert '$$' not in sql and not any(s.upper().startswith('DO ') for s in migrate.split_statements(sql)), path
+
+
+def test_split_statements_drops_comments_and_blank_statements():
+    sql = f"""{migrate.NO_TRANSACTION_MARKER}
+-- the first index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON a (x);
+
+  -- indented comment
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b
+    ON b (y);
+;
+"""
+
+    assert migrate.split_statements(sql) == [
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON a (x)',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b\n    ON b (y)',
+    ]
+
+
+def test_transactional_migration_runs_as_one_script(tmp_path):
+    sql = "ALTER TABLE a ADD COLUMN x INT;\nUPDATE a SET x = 1;\n"
+    path = write_migration(tmp_path, '0005_add_x.sql', sql)
+    connection = MigrationConnection()
+
+    migrate.apply_migration(connection, 5, 'add_x', path)
+
+    assert connection.cursor_.statements[0] == (sql, None)
+    assert connection.cursor_.statements[1][1] == (5, 'add_x')
+    assert connection.events == ['commit']
+    assert connection.autocommit is False
+
+
+def test_marker_only_counts_on_the_first_line(tmp_path):
+    sql = f"-- comment first\n{migrate.NO_TRANSACTION_MARKER}\nCREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON a (x);\n"
+    path = write_migration(tmp_path, '0006_late_marker.sql', sql)
+    connection = MigrationConnection()
+
+    migrate.apply_migration(connection, 6, 'late_marker', path)
+
+    # Run as a single transactional script, where CONCURRENTLY would fail loudly
+    assert connection.cursor_.statements[0] == (sql, None)
+    assert connection.events == ['commit']
+
+
+def test_no_transaction_migration_runs_statement_by_statement(tmp_path):
+    sql = (f"{migrate.NO_TRANSACTION_MARKER}\n"
+           "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON a (x);\n"
+           "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON b (y);\n")
+    path = write_migration(tmp_path, '0007_indexes.sql', sql)
+    autocommit_seen = []
+    connection = MigrationConnection(
+        [{'?column?': 1}],    # idx_a was left INVALID by an interrupted build
+        [],                   # drop it
+        [],                   # idx_b is fine
+    )
+    execute = connection.cursor_.execute
+
+    def recording_execute(statement, params=None):
+        autocommit_seen.append(connection.autocommit)
+        execute(statement, params)
+
+    connection.cursor_.execute = recording_execute
+
+    migrate.apply_migration(connection, 7, 'indexes', path)
+
+    statements = [sql for sql, _ in connection.cursor_.statements]
+    assert statements[1] == 'DROP INDEX CONCURRENTLY IF EXISTS "idx_a"'
+    assert statements[3:5] == [
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON a (x)',
+        'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON b (y)',
+    ]
+    assert connection.cursor_.statements[5][1] == (7, 'indexes')
+    assert all(autocommit_seen)
+    assert connection.autocommit is False
+    assert connection.events == []
+
+
+@pytest.fixture
+def migrations(tmp_path, monkeypatch):
+    write_migration(tmp_path, '0001_first.sql', 'CREATE TABLE a (x INT);')
+    write_migration(tmp_path, '0002_second.sql', 'CREATE TABLE b (y INT);')
+    schema = write_migration(tmp_path, 'schema.sql', 'CREATE TABLE users (user_id INT);')
+    monkeypatch.setattr(migrate, 'MIGRATIONS_DIR', str(tmp_path))
+    monkeypatch.setattr(migrate, 'SCHEMA_PATH', schema)
+
+
+def test_migrate_applies_only_pending_versions_under_the_lock(migrations, monkeypatch):
+    connection = MigrationConnection(
+        [],                                 # pg_advisory_lock
+        [{'tbl': 'users'}],
+        [],                                 # schema_migrations table
+        [{'version': 1}],
+    )
+    monkeypatch.setattr(migrate, 'get_db', lambda: connection)
+
+    assert migrate.migrate() == [2]
+    statements = connection.cursor_.statements
+    assert statements[0] == ("SELECT pg_advisory_lock(%s)", (migrate.MIGRATION_LOCK_ID,))
+    assert ('CREATE TABLE b (y INT);', None) in statements
+    assert ('CREATE TABLE a (x INT);', None) not in statements
+    assert statements[-1] == ("SELECT pg_advisory_unlock(%s)", (migrate.MIGRATION_LOCK_ID,))
+    assert connection.events[-2:] == ['rollback', 'close']
+
+
+def test_migrate_builds_an_empty_database_from_the_schema(migrations, monkeypatch):
+    connection = MigrationConnection(
+        [],
+        [{'tbl': None}],
+        [],
+        [],                                 # schema.sql
+        [], [],                             # record 0001 and 0002
+        [{'version': 1}, {'version': 2}],
+    )
+    monkeypatch.setattr(migrate, 'get_db', lambda: connection)
+
+    assert migrate.migrate() == []
+    recorded = [params for sql, params in connection.cursor_.statements if 'INSERT INTO schema_migrations' in sql]
+    assert recorded == [(1, 'first'), (2, 'second')]
+    assert ('CREATE TABLE users (user_id INT);', None) in connection.cursor_.statements
+
+
+def test_failed_migration_still_releases_the_lock(migrations, monkeypatch):
+    connection = MigrationConnection([], [{'tbl': 'users'}], [], [])
+
+    def failing_apply(connection, version, name, path):
+        raise RuntimeError('syntax error')
+
+    monkeypatch.setattr(migrate, 'get_db', lambda: connection)
+    monkeypatch.setattr(migrate, 'apply_migration', failing_apply)
+
+    with pytest.raises(RuntimeError):
+        migrate.migrate()
+    assert connection.cursor_.statements[-1] == ("SELECT pg_advisory_unlock(%s)", (migrate.MIGRATION_LOCK_ID,))
+    assert connection.events[-1] == 'close'
@@ -0,0 +1,77 @@
+import pytest
+
+transfer = pytest.importorskip('utils.product_transfer')
+
+CATEGORIES = {'cakes': 'cat1', 'cat1': 'cat1'}
+
+
+def row(**fields):
+    return {'name': 'Chocolate Cake', 'category': 'Cakes', 'price': '12.50', **fields}
+
+
+def test_valid_row_becomes_staging_values():
+    values, errors = transfer.validate_row(
+        row(sale_price='10', stock_quantity='4', is_featured='yes'), CATEGORIES, {}
+    )
+    assert errors == []
+    assert values[1:] == ['cat1', 'Chocolate Cake', None, 12.5, 10.0, 4, True, True, 0]
+
+
+@pytest.mark.parametrize('price', ['nan', 'NaN', 'inf', '-inf', '1e12', '100000000', '99999999.999'])
+def test_price_must_be_finite_and_fit_the_column(price):
+    values, errors = transfer.validate_row(row(price=price), CATEGORIES, {})
+    assert values is None
+    assert errors == [f'price must be a number below {transfer.MAX_PRICE}']
+
+
+def test_largest_price_that_fits():
+    values, errors = transfer.validate_row(row(price='99999999.99'), CATEGORIES, {})
+    assert errors == []
+
+
+@pytest.mark.parametrize('sale_price, message', [
+    ('nan', f'sale_price must be a number below {transfer.MAX_PRICE}'),
+    ('inf', f'sale_price must be a number below {transfer.MAX_PRICE}'),
+    ('-1', 'sale_price cannot be negative'),
+    ('12.50', 'sale_price must be less than price'),
+])
+def test_sale_price_errors(sale_price, message):
+    values, errors = transfer.validate_row(row(sale_price=sale_price), CATEGORIES, {})
+    assert values is None
+    assert errors == [message]
+
+
+@pytest.mark.parametrize('field', ['stock_quantity', 'loyalty_points_earned'])
+@pytest.mark.parametrize('value', ['99999999999', '2147483648', 'many', float('inf'), float('nan')])
+def test_integers_must_fit_int4(field, value):
+    values, errors = transfer.validate_row(row(**{field: value}), CATEGORIES, {})
+    assert values is None
+    assert errors == [f'{field} must be a whole number up to {transfer.MAX_INTEGER}']
+
+
+def test_largest_stock_that_fits():
+    values, errors = transfer.validate_row(row(stock_quantity=str(transfer.MAX_INTEGER)), CATEGORIES, {})
+    assert errors == []
+    assert values[6] == transfer.MAX_INTEGER
+
+
+def test_row_errors_are_collected_together():
+    values, errors = transfer.validate_row(
+        {'name': '', 'category': 'Bread', 'price': 'nan', 'stock_quantity': '-1'}, CATEGORIES, {}
+    )
+    assert values is None
+    assert errors == [
+        'name is required',
+        'category does not exist',
+        f'price must be a number below {transfer.MAX_PRICE}',
+        'stock_quantity cannot be negative',
+    ]
+
+
+def test_duplicate_name_points_at_first_line():
+    values, errors = transfer.validate_row(row(name='chocolate cake'), CATEGORIES, {'chocolate cake': 3})
+    assert errors == ['name duplicates line 3']
+
+
+def test_invalid_json_line():
+    assert transfer.validate_row(None, CATEGORIES, {}) == (None, ['Row is not a valid JSON object'])
@@ -0,0 +1,124 @@
+import pytest
+
+products = pytest.importorskip('routes.products')
+
+from utils.facets import PRICE_BUCKET_EDGES
+
+
+def test_bulk_changes_keep_only_given_fields():
+    changes, error = products.normalize_bulk_changes([
+        {'product_id': 'p1', 'price': '12.50'},
+        {'product_id': 'p2', 'stock_quantity': 3, 'sale_price': None},
+    ])
+    assert error is None
+    assert changes == {
+        'p1': {'price': 12.5},
+        'p2': {'stock_quantity': 3, 'sale_price': None},
+    }
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, True), (False, False),
+    ('true', True), ('false', False), ('1', True), ('0', False), ('on', True), ('OFF', False),
+])
+def test_bulk_changes_parse_booleans(value, expected):
+    changes, error = products.normalize_bulk_changes([
+        {'product_id': 'p1', 'is_featured': value, 'is_active': value}
+    ])
+    assert error is None
+    assert changes['p1'] == {'is_featured': expected, 'is_active': expected}
+
+
+@pytest.mark.parametrize('value', [1, 0, 'yes', '', [], {}])
+def test_bulk_changes_reject_non_booleans(value):
+    changes, error = products.normalize_bulk_changes([{'product_id': 'p1', 'is_active': value}])
+    assert changes is None
+    assert error == 'Update 0: is_active must be true or false'
+
+
+def test_bulk_changes_status_sets_is_active():
+    changes, _ = products.normalize_bulk_changes([{'product_id': 'p1', 'status': 'inactive'}])
+    assert changes == {'p1': {'is_active': False}}
+
+    _, error = products.normalize_bulk_changes([{'product_id': 'p1', 'status': 'archived'}])
+    assert error == 'Update 0: status must be "active" or "inactive"'
+
+
+@pytest.mark.parametrize('updates, message', [
+    ([], 'updates must be a non-empty list'),
+    ({'product_id': 'p1'}, 'updates must be a non-empty list'),
+    ([{'price': 10}], 'Update 0: product_id is required'),
+    ([{'product_id': 'p1', 'price': 1}, {'product_id': 'p1', 'price': 2}],
+     'Update 1: product p1 is listed twice'),
+    ([{'product_id': 'p1', 'price': 0}], 'Update 0: price must be greater than 0'),
+    ([{'product_id': 'p1', 'price': 'cheap'}], 'Update 0: invalid numeric value'),
+    ([{'product_id': 'p1', 'stock_quantity': -1}], 'Update 0: stock_quantity cannot be negative'),
+    ([{'product_id': 'p1'}], 'Update 0: no valid fields to update'),
+])
+def test_bulk_changes_errors(updates, message):
+    assert products.normalize_bulk_changes(updates) == (None, message)
+
+
+def test_bulk_changes_limit():
+    updates = [{'product_id': f'p{i}', 'price': 1} for i in range(products.MAX_BULK_UPDATES + 1)]
+    _, error = products.normalize_bulk_changes(updates)
+    assert error == f'At most {products.MAX_BULK_UPDATES} products can be updated at once'
+
+
+def test_facet_query_keeps_category_out_of_where():
+    key, sql, params = products.product_facet_query({'category_id': 'cat1', 'store_id': 's1'})
+    where_clause = sql.split('FROM products p', 1)[1]
+    assert 'WHERE p.is_active = true AND p.store_id = %s' in where_clause
+    assert 'category_id = %s' not in where_clause
+    assert 'FILTER (WHERE category_id = %s)' in sql
+    assert params[:2] == ['cat1', PRICE_BUCKET_EDGES]
+    assert params[2:] == ['s1']
+    assert sql.count('%s') == len(params)
+    assert dict(key)['category_id'] == 'cat1'
+
+
+def test_facet_query_without_category_counts_everything():
+    _, sql, params = products.product_facet_query({})
+    assert 'FILTER (WHERE true)' in sql
+    assert params == [PRICE_BUCKET_EDGES]
+
+
+def test_facet_query_key_ignores_paging_sort_and_search_case():
+    key, _, params = products.product_facet_query({'search': ' Cake ', 'is_featured': 'true'})
+    other_key, _, _ = products.product_facet_query({
+        'search': 'cake', 'is_featured': 'true', 'page': '3', 'limit': '24', 'sort': 'price_asc'
+    })
+    assert key == other_key
+    assert params[-2:] == ['%cake%', '%cake%']
+
+
+def test_facet_query_key_depends_on_filters():
+    key, _, _ = products.product_facet_query({'store_id': 's1'})
+    other_key, _, _ = products.product_facet_query({'store_id': 's2'})
+    assert key != other_key
+
+
+def test_bulk_update_invalidates_facets_once_per_batch():
+    from utils.facets import facet_cache
+    from routes.stores import leaderboard_cache
+
+    facet_cache.set('facets', {'categories': []})
+    leaderboard_cache.set('products', ['store'])
+    products.invalidate_bulk_caches({'p1': {'price': 9.5}, 'p2': {'stock_quantity': 4}})
+
+    assert facet_cache.get('facets') is None
+    assert leaderboard_cache.get('products') == ['store']
+
+
+def test_bulk_status_change_invalidates_product_ranking():
+    from utils.facets import facet_cache
+    from routes.stores import leaderboard_cache
+
+    facet_cache.set('facets', {'categories': []})
+    leaderboard_cache.set('products', ['store'])
+    leaderboard_cache.set('rating', ['store'])
+    products.invalidate_bulk_caches({'p1': {'is_active': False}})
+
+    assert facet_cache.get('facets') is None
+    assert leaderboard_cache.get('products') is None
+    assert leaderboard_cache.get('rating') == ['store']
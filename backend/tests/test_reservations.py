@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+reservations = pytest.importorskip('utils.reservations')
+
+from tests.scripted_db import ScriptedCursor, scripted_get_cursor
+
+EXPIRES_AT = datetime(2024, 5, 1, 12, 15)
+
+
+def test_release_returns_quantities_and_clamps_at_zero():
+    cursor = ScriptedCursor([{'product_id': 'p1', 'quantity': 2}, {'product_id': 'p2', 'quantity': 1}])
+
+    assert reservations.release_user_reservations(cursor, 'buyer') == {'p1': 2, 'p2': 1}
+    sql, params = cursor.statements[0]
+    assert params == ('buyer',)
+    assert 'GREATEST(p.reserved_quantity - per_product.quantity, 0)' in sql
+
+
+def test_reserve_cart_holds_every_line():
+    cursor = ScriptedCursor(
+        [],                                   # release the previous holds
+        [{'line_count': 2}],
+        [{'expires_at': EXPIRES_AT}, {'expires_at': EXPIRES_AT}],
+    )
+
+    assert reservations.reserve_cart(cursor, 'buyer', 'c1', ttl_minutes=10) == (True, EXPIRES_AT)
+    assert cursor.ran('DELETE FROM stock_reservations')
+    params = cursor.statements[2][1]
+    assert params['ttl'] == 10 and len(params['reservation_ids']) == 2
+
+
+def test_reserve_cart_reports_short_lines():
+    cursor = ScriptedCursor(
+        [],
+        [{'line_count': 3}],
+        [{'expires_at': EXPIRES_AT}],
+        [{'name': 'Cupcake'}, {'name': 'Brownie'}],
+    )
+
+    assert reservations.reserve_cart(cursor, 'buyer', 'c1') == (False, ['Cupcake', 'Brownie'])
+    assert cursor.statements[3][1] == ('buyer', 'c1')
+
+
+def test_reserve_empty_cart():
+    cursor = ScriptedCursor([], [{'line_count': 0}], [])
+    assert reservations.reserve_cart(cursor, 'buyer', 'c1') == (True, None)
+
+
+def test_reserve_cart_uses_default_ttl():
+    cursor = ScriptedCursor([], [{'line_count': 1}], [{'expires_at': EXPIRES_AT}])
+    reservations.reserve_cart(cursor, 'buyer', 'c1')
+    assert cursor.statements[2][1]['ttl'] == reservations.RESERVATION_TTL_MINUTES
+
+
+def test_sweep_runs_one_transaction_per_batch(monkeypatch):
+    cursors = [ScriptedCursor([{'released': released}]) for released in (500, 500, 3)]
+    monkeypatch.setattr(reservations, 'get_cursor', scripted_get_cursor(*cursors))
+
+    assert reservations.sweep_expired_reservations(batch_size=500) == 1003
+    assert all(cursor.connection.committed for cursor in cursors)
+    assert all(cursor.statements[0][1] == (500,) for cursor in cursors)
+    assert 'FOR UPDATE SKIP LOCKED' in cursors[0].statements[0][0]
+
+
+def test_sweep_with_nothing_expired(monkeypatch):
+    cursor = ScriptedCursor([{'released': 0}])
+    monkeypatch.setattr(reservations, 'get_cursor', scripted_get_cursor(cursor))
+
+    assert reservations.sweep_expired_reservations(batch_size=100) == 0
+    assert len(cursor.statements) == 1
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+storage = pytest.importorskip('utils.storage')
+
+from tests.scripted_db import ScriptedCursor, scripted_get_cursor
+
+HASH_A = 'aa' * 32
+HASH_B = 'bb' * 32
+
+
+@pytest.fixture
+def products_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'UPLOADS_ROOT', str(tmp_path))
+    monkeypatch.setattr(storage, 'PRODUCTS_FOLDER', str(tmp_path / 'products'))
+    return tmp_path / 'products'
+
+
+def store_file(content_hash, *suffixes):
+    os.makedirs(storage.shard_dir(content_hash), exist_ok=True)
+    paths = [os.path.join(storage.shard_dir(content_hash), f"{content_hash}{suffix}") for suffix in suffixes]
+    for path in paths:
+        with open(path, 'wb') as file:
+            file.write(b'image')
+    return paths
+
+
+def write_temp_upload(data=b'image'):
+    temp_file, temp_path = storage.make_temp_upload()
+    with temp_file:
+        temp_file.write(data)
+    return temp_path
+
+
+def test_commit_temp_upload_moves_and_registers(products_folder, monkeypatch):
+    cursor = ScriptedCursor()
+    monkeypatch.setattr(storage, 'get_cursor', scripted_get_cursor(cursor))
+    temp_path = write_temp_upload()
+
+    stored = storage.commit_temp_upload(temp_path, HASH_A, 5, 'png')
+
+    assert stored == {
+        'content_hash': HASH_A,
+        'url': f"/uploads/products/aa/aa/{HASH_A}.png",
+        'size_bytes': 5,
+        'deduplicated': False
+    }
+    assert not os.path.exists(temp_path)
+    assert os.path.isfile(storage.url_to_path(stored['url']))
+    # The hash is locked before the dedupe check and registered in the same transaction
+    assert cursor.statements[0] == ("SELECT pg_advisory_xact_lock(hashtext(%s))", (HASH_A,))
+    assert cursor.ran('INSERT INTO stored_files')
+    assert cursor.connection.committed
+
+
+def test_commit_temp_upload_dedupes_onto_the_stored_extension(products_folder, monkeypatch):
+    existing, = store_file(HASH_A, '.jpg')
+    cursor = ScriptedCursor()
+    monkeypatch.setattr(storage, 'get_cursor', scripted_get_cursor(cursor))
+    temp_path = write_temp_upload()
+
+    stored = storage.commit_temp_upload(temp_path, HASH_A, 5, 'png')
+
+    assert stored['deduplicated'] is True
+    assert stored['url'].endswith(f"{HASH_A}.jpg")
+    assert not os.path.exists(temp_path)
+    assert os.listdir(os.path.dirname(existing)) == [os.path.basename(existing)]
+    # Registering again restarts the grace period of an orphaned file
+    assert cursor.ran('ON CONFLICT (content_hash) DO UPDATE')
+
+
+def test_commit_temp_upload_removes_the_temp_file_on_failure(products_folder, monkeypatch):
+    cursor = ScriptedCursor()
+
+    def failing_register(cursor, stored):
+        raise RuntimeError('database went away')
+
+    monkeypatch.setattr(storage, 'get_cursor', scripted_get_cursor(cursor))
+    monkeypatch.setattr(storage, 'register_stored_file', failing_register)
+    temp_path = write_temp_upload()
+
+    with pytest.raises(RuntimeError):
+        storage.commit_temp_upload(temp_path, HASH_A, 5, 'png')
+    assert not os.path.exists(temp_path)
+    assert not cursor.connection.committed
+
+
+def test_collect_orphans_commits_the_delete_before_unlinking(products_folder, monkeypatch):
+    files_a = store_file(HASH_A, '.png', '_thumb.webp')
+    delete = ScriptedCursor([{'content_hash': HASH_A}])
+    check = ScriptedCursor([], [])
+    order = []
+
+    def remove_stored_files(content_hash):
+        order.append(('remove', content_hash, delete.connection.committed))
+        for path in files_a:
+            os.remove(path)
+
+    monkeypatch.setattr(storage, 'get_cursor', scripted_get_cursor(delete, check))
+    monkeypatch.setattr(storage, 'remove_stored_files', remove_stored_files)
+
+    assert storage.collect_orphans(batch_size=10, grace_hours=1) == 1
+    assert order == [('remove', HASH_A, True)]
+    assert delete.statements[0][1] == (1, 10)
+    assert 'FOR UPDATE SKIP LOCKED' in delete.statements[0][0]
+    assert check.statements[0] == ("SELECT pg_advisory_xact_lock(hashtext(%s))", (HASH_A,))
+    assert not any(os.path.exists(path) for path in files_a)
+
+
+def test_collect_orphans_keeps_files_registered_again(products_folder, monkeypatch):
+    files_a = store_file(HASH_A, '.png')
+    files_b = store_file(HASH_B, '.png', '_thumb.webp')
+    monkeypatch.setattr(storage, 'get_cursor', scripted_get_cursor(
+        ScriptedCursor([{'content_hash': HASH_A}, {'content_hash': HASH_B}]),
+        ScriptedCursor([], [{'?column?': 1}]),      # an upload re-registered A meanwhile
+        ScriptedCursor([], []),
+    ))
+
+    assert storage.collect_orphans(batch_size=10, grace_hours=0) == 1
+    assert all(os.path.exists(path) for path in files_a)
+    assert not any(os.path.exists(path) for path in files_b)
+
+
+def test_collect_orphans_runs_batches_until_one_is_short(products_folder, monkeypatch):
+    monkeypatch.setattr(storage, 'get_cursor', scripted_get_cursor(
+        ScriptedCursor([{'content_hash': HASH_A}]),
+        ScriptedCursor(),
+        ScriptedCursor([]),
+    ))
+
+    # A's files are already gone; its row still counts as collected
+    assert storage.collect_orphans(batch_size=1) == 1
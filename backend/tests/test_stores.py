@@ -0,0 +1,49 @@
+import base64
+import json
+from decimal import Decimal
+
+import pytest
+
+stores = pytest.importorskip('routes.stores')
+
+
+@pytest.mark.parametrize('sort_value, value_type', [
+    ('Sweet Treats', str),
+    (Decimal('4.50'), Decimal),
+    (42, int),
+])
+def test_directory_cursor_round_trip(sort_value, value_type):
+    cursor = stores.encode_directory_cursor(sort_value, 'store-1')
+    assert stores.decode_directory_cursor(cursor, value_type) == (sort_value, 'store-1')
+
+
+def test_directory_cursor_is_url_safe():
+    cursor = stores.encode_directory_cursor('?>?>~~', 'store-1')
+    assert set(cursor) <= set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=')
+
+
+@pytest.mark.parametrize('cursor, value_type', [
+    ('not base64!', str),
+    (base64.urlsafe_b64encode(b'{"a": 1}').decode(), str),
+    (base64.urlsafe_b64encode(json.dumps(['4.5']).encode()).decode(), Decimal),
+    (base64.urlsafe_b64encode(json.dumps(['many', 's1']).encode()).decode(), int),
+])
+def test_directory_cursor_rejects_foreign_values(cursor, value_type):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        stores.decode_directory_cursor(cursor, value_type)
+
+
+def test_directory_page_cursor_continues_after_last_row():
+    rows = [
+        {'store_id': f's{i}', 'name': f'Store {i}', 'description': '', 'address': '', 'city': 'Kandy',
+         'phone': '', 'logo_url': None, 'avg_rating': Decimal('4.0'), 'product_count': 10 - i}
+        for i in range(3)
+    ]
+    page = stores.store_directory_page(rows, 'products', 2)
+    assert page['has_more'] is True
+    assert [store['store_id'] for store in page['stores']] == ['s0', 's1']
+    assert stores.decode_directory_cursor(page['next_cursor'], int) == (9, 's1')
+
+    last_page = stores.store_directory_page(rows[2:], 'products', 2)
+    assert last_page['has_more'] is False
+    assert last_page['next_cursor'] is None
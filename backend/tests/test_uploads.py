@@ -0,0 +1,205 @@
+import io
+import os
+
+import pytest
+
+flask = pytest.importorskip('flask')
+uploads = pytest.importorskip('utils.uploads')
+storage = pytest.importorskip('utils.storage')
+
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 24
+CONTENT_HASH = 'ab' * 32
+
+
+@pytest.fixture
+def uploads_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, 'UPLOADS_ROOT', str(tmp_path))
+    monkeypatch.setattr(uploads, 'UPLOADS_OFFLOAD', 'none')
+    monkeypatch.setattr(storage, 'PRODUCTS_FOLDER', str(tmp_path / 'products'))
+    return tmp_path
+
+
+def temp_files(root):
+    folder = root / 'products'
+    return sorted(name for name in os.listdir(folder) if name.startswith('.upload-')) if folder.exists() else []
+
+
+def test_format_size():
+    assert uploads.format_size(5 * 1024 * 1024) == '5MB'
+    assert uploads.format_size(1536 * 1024) == '1.5MB'
+    assert uploads.format_size(512 * 1024) == '512KB'
+    assert uploads.format_size(100) == '100 bytes'
+
+
+def test_stream_hashes_and_keeps_the_temp_file(uploads_root):
+    stream = uploads.UploadStream(1024, uploads.IMAGE_TYPES)
+    stream.write(PNG[:5])
+    stream.write(PNG[5:])
+
+    assert stream.image_type == 'png'
+    assert stream.size_bytes == len(PNG)
+    assert os.path.exists(stream.temp_path)
+    stream.discard()
+    assert temp_files(uploads_root) == []
+
+
+def test_stream_over_the_limit_removes_its_temp_file(uploads_root):
+    stream = uploads.UploadStream(16, uploads.IMAGE_TYPES)
+
+    with pytest.raises(RequestEntityTooLarge, match='larger than 16 bytes'):
+        stream.write(PNG)
+    assert temp_files(uploads_root) == []
+
+
+def test_stream_of_the_wrong_type_is_refused(uploads_root):
+    stream = uploads.UploadStream(1024, uploads.IMAGE_TYPES)
+
+    with pytest.raises(UnsupportedMediaType):
+        stream.write(b'GIF89a' + b'\x00' * 20)
+    assert temp_files(uploads_root) == []
+
+
+def test_short_stream_is_sniffed_on_commit(uploads_root, monkeypatch):
+    monkeypatch.setattr(uploads, 'commit_temp_upload', lambda *args: pytest.fail('not committed'))
+    stream = uploads.UploadStream(1024, uploads.IMAGE_TYPES)
+    stream.write(b'\xff\xd8')
+
+    with pytest.raises(UnsupportedMediaType):
+        stream.commit()
+    assert temp_files(uploads_root) == []
+
+
+def test_commit_passes_the_hash_and_sniffed_type(uploads_root, monkeypatch):
+    committed = []
+    monkeypatch.setattr(uploads, 'commit_temp_upload', lambda *args: committed.append(args) or 'products/x.png')
+    stream = uploads.UploadStream(1024, uploads.IMAGE_TYPES)
+    stream.write(PNG)
+
+    assert stream.commit() == 'products/x.png'
+    temp_path, content_hash, size_bytes, extension = committed[0]
+    assert (temp_path, size_bytes, extension) == (stream.temp_path, len(PNG), 'png')
+    assert content_hash == stream.digest.hexdigest()
+    # Closing a committed stream leaves the file to storage
+    stream.close()
+    assert os.path.exists(temp_path)
+
+
+def test_discard_is_idempotent(uploads_root):
+    stream = uploads.UploadStream(1024)
+    stream.write(b'data')
+    stream.discard()
+    stream.discard()
+    assert temp_files(uploads_root) == []
+
+
+@pytest.fixture
+def upload_client(uploads_root):
+    app = flask.Flask(__name__)
+    app.request_class = uploads.UploadRequest
+    seen = []
+
+    @app.route('/upload', methods=['POST'])
+    @uploads.stream_uploads(64)
+    def upload():
+        seen.append(sorted(flask.request.files))
+        return flask.jsonify({'success': True})
+
+    app.seen = seen
+    return app.test_client()
+
+
+def test_aborted_multipart_removes_earlier_parts(upload_client, uploads_root):
+    response = upload_client.post('/upload', content_type='multipart/form-data', data={
+        'first': (io.BytesIO(PNG), 'first.png'),
+        'second': (io.BytesIO(b'GIF89a' + b'\x00' * 20), 'second.gif'),
+    })
+
+    assert response.status_code == 415
+    assert response.get_json()['success'] is False
+    assert temp_files(uploads_root) == []
+
+
+def test_oversized_declared_body_is_refused_with_a_readable_limit(upload_client, uploads_root):
+    body = PNG * 4000
+    response = upload_client.post('/upload', content_type='multipart/form-data', data={
+        'image': (io.BytesIO(body), 'big.png'),
+    })
+
+    assert response.status_code == 413
+    assert response.get_json()['message'] == 'Upload is larger than 64 bytes'
+    assert temp_files(uploads_root) == []
+
+
+def test_uncommitted_uploads_are_removed_when_the_request_ends(upload_client, uploads_root):
+    response = upload_client.post('/upload', content_type='multipart/form-data', data={
+        'image': (io.BytesIO(PNG), 'image.png'),
+    })
+
+    assert response.status_code == 200
+    assert upload_client.application.seen == [['image']]
+    assert temp_files(uploads_root) == []
+
+
+@pytest.fixture
+def serve_client(uploads_root):
+    app = flask.Flask(__name__)
+
+    @app.route('/uploads/<path:relative_path>')
+    def serve(relative_path):
+        return uploads.send_upload(relative_path)
+
+    folder = uploads_root / 'products'
+    folder.mkdir(exist_ok=True)
+    (folder / f'{CONTENT_HASH}.png').write_bytes(PNG)
+    (folder / 'legacy.png').write_bytes(PNG)
+    return app.test_client()
+
+
+def test_send_upload_of_content_addressed_file_is_immutable(serve_client):
+    response = serve_client.get(f'/uploads/products/{CONTENT_HASH}.png')
+
+    assert response.status_code == 200
+    assert response.data == PNG
+    assert response.headers['ETag'] == f'"{CONTENT_HASH}.png"'
+    assert response.headers['Cache-Control'] == uploads.IMMUTABLE_CACHE_CONTROL
+
+
+def test_send_upload_answers_if_none_match_with_304(serve_client):
+    response = serve_client.get(f'/uploads/products/{CONTENT_HASH}.png',
+                                headers={'If-None-Match': f'"{CONTENT_HASH}.png"'})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['Cache-Control'] == uploads.IMMUTABLE_CACHE_CONTROL
+
+
+def test_send_upload_of_legacy_name_revalidates(serve_client):
+    first = serve_client.get('/uploads/products/legacy.png')
+    assert first.headers['Cache-Control'] == uploads.DEFAULT_CACHE_CONTROL
+
+    second = serve_client.get('/uploads/products/legacy.png', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+
+def test_send_upload_serves_ranges(serve_client):
+    response = serve_client.get(f'/uploads/products/{CONTENT_HASH}.png', headers={'Range': 'bytes=0-7'})
+
+    assert response.status_code == 206
+    assert response.data == PNG[:8]
+    assert response.headers['Content-Range'] == f'bytes 0-7/{len(PNG)}'
+
+
+def test_send_upload_refuses_missing_and_escaping_paths(serve_client):
+    assert serve_client.get('/uploads/products/missing.png').status_code == 404
+    assert serve_client.get('/uploads/../app.py').status_code == 404
+
+
+def test_x_accel_hands_the_file_to_nginx(serve_client, monkeypatch):
+    monkeypatch.setattr(uploads, 'UPLOADS_OFFLOAD', 'x-accel')
+    response = serve_client.get(f'/uploads/products/{CONTENT_HASH}.png')
+
+    assert response.headers['X-Accel-Redirect'] == f'{uploads.X_ACCEL_PREFIX}/products/{CONTENT_HASH}.png'
+    assert response.headers['ETag'] == f'"{CONTENT_HASH}.png"'
+    assert response.data == b''
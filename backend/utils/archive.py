@@ -0,0 +1,132 @@
+import os
+import sys
+from database.db import get_cursor
+
+# Inactive products untouched for this long are moved to the archive by the sweep
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '200'))
+
+# Moves products with their images and reviews in one statement. The CTE reads
+# images and reviews from the statement's snapshot, before the cascade removes
+# them; cart/wishlist lines and stock holds are simply dropped by the cascade.
+ARCHIVE_PRODUCTS_SQL = """
+    WITH moved AS (
+        DELETE FROM products
+        WHERE product_id = ANY(%(product_ids)s::varchar[])
+        RETURNING *
+    ),
+    archived AS (
+        INSERT INTO archived_products (
+            product_id, store_id, category_id, name, description, price, sale_price,
+            stock_quantity, is_featured, avg_rating, loyalty_points_earned, date_created, date_updated
+        )
+        SELECT product_id, store_id, category_id, name, description, price, sale_price,
+               stock_quantity, is_featured, avg_rating, loyalty_points_earned, date_created, date_updated
+        FROM moved
+        RETURNING product_id, name
+    ),
+    moved_images AS (
+        INSERT INTO archived_product_images (
+            image_id, product_id, image_url, content_hash, renditions, is_primary, display_order
+        )
+        SELECT pi.image_id, pi.product_id, pi.image_url, pi.content_hash, pi.renditions, pi.is_primary, pi.display_order
+        FROM product_images pi
+        JOIN moved m ON pi.product_id = m.product_id
+    ),
+    moved_reviews AS (
+        INSERT INTO archived_reviews (
+            review_id, product_id, user_id, rating, comment, date_created, is_verified_purchase
+        )
+        SELECT r.review_id, r.product_id, r.user_id, r.rating, r.comment, r.date_created, r.is_verified_purchase
+        FROM reviews r
+        JOIN moved m ON r.product_id = m.product_id
+    )
+    SELECT product_id, name FROM archived
+"""
+
+# The reverse move; restored products come back inactive so the owner decides when to sell them
+RESTORE_PRODUCTS_SQL = """
+    WITH moved AS (
+        DELETE FROM archived_products
+        WHERE product_id = ANY(%(product_ids)s::varchar[])
+        RETURNING *
+    ),
+    restored AS (
+        INSERT INTO products (
+            product_id, store_id, category_id, name, description, price, sale_price,
+            stock_quantity, is_featured, is_active, avg_rating, loyalty_points_earned, date_created, date_updated
+        )
+        SELECT product_id, store_id, category_id, name, description, price, sale_price,
+               stock_quantity, is_featured, false, avg_rating, loyalty_points_earned, date_created, CURRENT_TIMESTAMP
+        FROM moved
+        RETURNING product_id, name
+    ),
+    moved_images AS (
+        INSERT INTO product_images (
+            image_id, product_id, image_url, content_hash, renditions, is_primary, display_order
+        )
+        SELECT ai.image_id, ai.product_id, ai.image_url, ai.content_hash, ai.renditions, ai.is_primary, ai.display_order
+        FROM archived_product_images ai
+        JOIN moved m ON ai.product_id = m.product_id
+    ),
+    moved_reviews AS (
+        INSERT INTO reviews (
+            review_id, product_id, user_id, rating, comment, date_created, is_verified_purchase
+        )
+        SELECT ar.review_id, ar.product_id, ar.user_id, ar.rating, ar.comment, ar.date_created, ar.is_verified_purchase
+        FROM archived_reviews ar
+        JOIN moved m ON ar.product_id = m.product_id
+    )
+    SELECT product_id, name FROM restored
+"""
+
+def archive_products(cursor, product_ids):
+    """Move products, their images and their reviews into the archive tables.
+
+    Runs in the caller's transaction. Returns [{'product_id', 'name'}] of what was archived.
+    """
+    if not product_ids:
+        return []
+    cursor.execute(ARCHIVE_PRODUCTS_SQL, {'product_ids': list(product_ids)})
+    return cursor.fetchall()
+
+def restore_products(cursor, product_ids):
+    """Move archived products back into the live tables, inactive.
+
+    Returns [{'product_id', 'name'}] of what was restored.
+    """
+    if not product_ids:
+        return []
+    cursor.execute(RESTORE_PRODUCTS_SQL, {'product_ids': list(product_ids)})
+    return cursor.fetchall()
+
+def archive_retired_products(days=None, batch_size=None):
+    """Archive products that have been inactive for `days`, one short transaction per batch.
+
+    Returns the number of products archived.
+    """
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    total = 0
+
+    while True:
+        with get_cursor() as cursor:
+            cursor.execute("""
+                SELECT product_id
+                FROM products
+                WHERE is_active = false
+                  AND COALESCE(date_updated, date_created) < CURRENT_TIMESTAMP - make_interval(days => %s)
+                ORDER BY date_updated
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (days, batch_size))
+            product_ids = [row['product_id'] for row in cursor.fetchall()]
+            archived = archive_products(cursor, product_ids)
+
+        total += len(archived)
+        if len(product_ids) < batch_size:
+            return total
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(f"Archived {archive_retired_products(days)} retired products")
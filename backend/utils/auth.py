@@ -1,9 +1,34 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 import bcrypt
+import os
 import uuid
 from database.db import get_cursor
+from utils.cache import TTLCache
+
+# A supplier's store is reused across requests for this long; the user's own
+# role and is_active are read on every request, so they are never stale
+OWNER_CONTEXT_TTL = int(os.getenv('OWNER_CONTEXT_TTL', '30'))
+owner_context_cache = TTLCache(OWNER_CONTEXT_TTL, max_entries=int(os.getenv('OWNER_CONTEXT_CACHE_SIZE', '10000')))
+
+# Everything supplier routes used to look up one query at a time
+OWNER_CONTEXT_SQL = """
+    SELECT u.user_id, u.role, u.is_active,
+           sp.supplier_id,
+           s.store_id, s.name as store_name, s.is_active as store_is_active
+    FROM users u
+    LEFT JOIN suppliers sp ON sp.user_id = u.user_id
+    LEFT JOIN stores s ON s.owner_id = u.user_id
+    WHERE u.user_id = %s
+    ORDER BY s.date_created
+    LIMIT 1
+"""
+
+# The part of the context checked fresh when the store part comes from the cache
+OWNER_USER_SQL = "SELECT user_id, role, is_active FROM users WHERE user_id = %s"
+
+STORE_CONTEXT_FIELDS = ('supplier_id', 'store_id', 'store_name', 'store_is_active')
 
 def hash_password(password):
     """Hash a password using bcrypt"""
@@ -19,6 +44,49 @@ def generate_uuid():
     """Generate a UUID"""
     return str(uuid.uuid4())
 
+def get_owner_context(cursor=None, user_id=None):
+    """The caller's user, role, supplier and store, or None for an unknown user.
+
+    Loaded at most once per request with a single query. Only a found store is
+    reused across requests (for OWNER_CONTEXT_TTL seconds), so a new store shows
+    up at once on every worker and role or is_active changes apply immediately.
+    `cursor` is used when given, else a connection of its own.
+    """
+    user_id = user_id or get_jwt_identity()
+    context = g.get('owner_context')
+    if context is not None and context['user_id'] == user_id:
+        return context
+
+    store = owner_context_cache.get(user_id)
+    row = _fetch_owner_row(cursor, OWNER_USER_SQL if store else OWNER_CONTEXT_SQL, user_id)
+    if not row:
+        owner_context_cache.invalidate(user_id)
+        return None
+
+    if store:
+        context = {**dict(row), **store}
+    else:
+        context = dict(row)
+        if context['store_id'] is not None:
+            owner_context_cache.set(user_id, {field: context[field] for field in STORE_CONTEXT_FIELDS})
+
+    g.owner_context = context
+    return context
+
+def _fetch_owner_row(cursor, sql, user_id):
+    if cursor is None:
+        with get_cursor() as own_cursor:
+            own_cursor.execute(sql, (user_id,))
+            return own_cursor.fetchone()
+    cursor.execute(sql, (user_id,))
+    return cursor.fetchone()
+
+def invalidate_owner_context(user_id):
+    """Forget a user's cached store after changing it in this process"""
+    owner_context_cache.invalidate(user_id)
+    if g.get('owner_context') is not None and g.owner_context['user_id'] == user_id:
+        g.pop('owner_context')
+
 def role_required(*roles):
     """Decorator to check user roles against DB. Admin overrides unless explicitly excluded."""
     def wrapper(fn):
@@ -28,14 +96,12 @@ def role_required(*roles):
             user_id = get_jwt_identity()
 
             try:
-                with get_cursor() as cursor:
-                    cursor.execute("SELECT role FROM users WHERE user_id = %s AND is_active = TRUE", (user_id,))
-                    row = cursor.fetchone()
-                    if not row:
-                        return jsonify({"success": False, "message": "User not found or inactive"}), 401
-                    user_role = row["role"]
+                context = get_owner_context(user_id=user_id)
             except Exception:
                 return jsonify({"success": False, "message": "Authorization lookup failed"}), 500
+            if not context or not context["is_active"]:
+                return jsonify({"success": False, "message": "User not found or inactive"}), 401
+            user_role = context["role"]
 
             # If 'admin' exists, allow unless roles explicitly restrict and 'admin' not included
             if roles and user_role not in roles:
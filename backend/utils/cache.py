@@ -0,0 +1,41 @@
+import threading
+import time
+
+class TTLCache:
+    """Small thread-safe in-process cache whose entries expire after `ttl` seconds.
+
+    Each worker process has its own copy, so only cache what may be `ttl` stale.
+    """
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """The cached value, or None when missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            if key not in self.entries and len(self.entries) >= self.max_entries:
+                # Dicts keep insertion order: drop the oldest entry
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key=None):
+        """Drop one entry, or everything when no key is given"""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
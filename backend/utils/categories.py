@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from database.db import get_cursor
+
+# How often a process asks the database whether categories changed (one tiny query)
+CATEGORY_VERSION_CHECK_SECONDS = float(os.getenv('CATEGORY_VERSION_CHECK_SECONDS', '30'))
+
+CATEGORIES_SQL = "SELECT category_id, name, description FROM categories ORDER BY name"
+# Bumped by the categories_version trigger on every change to the table
+CATEGORY_VERSION_SQL = "SELECT version FROM registry_versions WHERE name = 'categories'"
+
+def format_category(category):
+    return {
+        'category_id': category['category_id'],
+        'name': category['name'],
+        'description': category['description']
+    }
+
+class CategoryRegistry:
+    """In-memory copy of the categories table, reloaded when its version changes.
+
+    Lookups never touch the database; refresh() costs one version query at most
+    every `check_interval` seconds, plus a reload when the version moved.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self.version = None
+        self.categories = []
+        self.by_id = {}
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def start_check(self):
+        """True when this caller should check the version; at most one caller per interval"""
+        with self.lock:
+            now = time.monotonic()
+            if self.version is not None and now - self.checked_at < self.check_interval:
+                return False
+            self.checked_at = now
+            return True
+
+    def replace(self, version, rows):
+        categories = [format_category(row) for row in rows]
+        with self.lock:
+            self.categories = categories
+            self.by_id = {category['category_id']: category for category in categories}
+            self.version = version
+
+    def refresh(self):
+        if not self.start_check():
+            return
+        try:
+            with get_cursor() as cursor:
+                cursor.execute(CATEGORY_VERSION_SQL)
+                row = cursor.fetchone()
+                version = row['version'] if row else 0
+                if version != self.version:
+                    cursor.execute(CATEGORIES_SQL)
+                    self.replace(version, cursor.fetchall())
+        except Exception as e:
+            if self.version is None:
+                raise
+            # Keep serving the loaded copy; the next interval retries
+            print(f"Error checking category version: {e}")
+
+    def name(self, category_id, default=None):
+        category = self.by_id.get(category_id)
+        return category['name'] if category else default
+
+category_registry = CategoryRegistry(CATEGORY_VERSION_CHECK_SECONDS)
+
+def refresh_categories():
+    """Make sure the registry is loaded and no more than one check interval stale"""
+    category_registry.refresh()
+    return category_registry
+
+def category_name(category_id, default=None):
+    return category_registry.name(category_id, default)
+
+def preload_categories():
+    """Load the registry as a worker starts; a failure here only defers it to first use"""
+    try:
+        refresh_categories()
+    except Exception as e:
+        print(f"Error preloading categories: {e}")
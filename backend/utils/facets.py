@@ -0,0 +1,87 @@
+import os
+from utils.cache import TTLCache
+from utils.categories import category_name
+
+# Upper edges of the price histogram buckets: [0, 10), [10, 25), ... [100, ∞)
+PRICE_BUCKET_EDGES = [10, 25, 50, 100]
+
+FACET_CACHE_TTL = int(os.getenv('FACET_CACHE_TTL', '60'))
+facet_cache = TTLCache(FACET_CACHE_TTL, max_entries=int(os.getenv('FACET_CACHE_SIZE', '2048')))
+
+# GROUPING() bitmask of each grouping set (category_id, price_bucket, is_featured)
+CATEGORY_SET, PRICE_SET, FEATURED_SET = 0b011, 0b101, 0b110
+
+# All facets in one pass over the matching products. {where_clause} leaves out
+# the category filter so every category keeps its count while one is selected;
+# the price and featured facets apply it through {category_match}.
+FACETS_SQL = """
+    SELECT
+        GROUPING(category_id, price_bucket, is_featured) AS grouping_set,
+        category_id, price_bucket, is_featured,
+        COUNT(*) AS any_category_count,
+        COUNT(*) FILTER (WHERE {category_match}) AS product_count
+    FROM (
+        SELECT p.category_id, p.is_featured,
+               width_bucket(p.price, %s::int[]::numeric[]) AS price_bucket
+        FROM products p
+        WHERE {where_clause}
+    ) matching
+    GROUP BY GROUPING SETS ((category_id), (price_bucket), (is_featured))
+"""
+
+def normalize_filters(args):
+    """The listing filters that change facet counts, in a canonical form (paging and sort do not)"""
+    return {
+        'category_id': args.get('category_id') or None,
+        'store_id': args.get('store_id') or None,
+        # ILIKE ignores case, so 'Cake' and 'cake' share a cache entry
+        'search': args.get('search', '').strip().lower(),
+        'is_featured': 'true' if args.get('is_featured') == 'true' else None,
+    }
+
+def facet_cache_key(filters):
+    return tuple(sorted(filters.items()))
+
+def facet_query(where_clause, params, category_id):
+    """(sql, params) for FACETS_SQL; where_clause/params must not include the category filter"""
+    if category_id:
+        category_match, match_params = "category_id = %s", [category_id]
+    else:
+        category_match, match_params = "true", []
+    sql = FACETS_SQL.format(category_match=category_match, where_clause=where_clause)
+    return sql, match_params + [PRICE_BUCKET_EDGES] + list(params)
+
+def price_range(bucket):
+    edges = [0] + PRICE_BUCKET_EDGES
+    return {
+        'min': edges[bucket],
+        'max': edges[bucket + 1] if bucket + 1 < len(edges) else None
+    }
+
+def format_facets(rows):
+    """Facets from FACETS_SQL rows; the category registry must be loaded"""
+    categories = []
+    price_counts = {}
+    featured_count = 0
+
+    for row in rows:
+        if row['grouping_set'] == CATEGORY_SET and row['category_id'] is not None:
+            categories.append({
+                'category_id': row['category_id'],
+                'name': category_name(row['category_id']),
+                'product_count': row['any_category_count']
+            })
+        elif row['grouping_set'] == PRICE_SET and row['price_bucket'] is not None:
+            price_counts[row['price_bucket']] = row['product_count']
+        elif row['grouping_set'] == FEATURED_SET and row['is_featured']:
+            featured_count = row['product_count']
+
+    categories.sort(key=lambda category: category['name'] or '')
+    return {
+        'categories': categories,
+        'price_ranges': [
+            {**price_range(bucket), 'product_count': price_counts.get(bucket, 0)}
+            for bucket in range(len(PRICE_BUCKET_EDGES) + 1)
+        ],
+        'featured_count': featured_count
+    }
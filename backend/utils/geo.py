@@ -0,0 +1,156 @@
+import csv
+import functools
+import math
+import os
+import re
+import sys
+from database.db import get_cursor
+
+# Local gazetteer (name,latitude,longitude); geocoding never goes to the network
+GAZETTEER_PATH = os.getenv(
+    'GAZETTEER_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'gazetteer.csv')
+)
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LATITUDE = 111.045
+
+DEFAULT_NEARBY_RADIUS_KM = 10
+MAX_NEARBY_RADIUS_KM = 100
+DEFAULT_NEARBY_LIMIT = 20
+MAX_NEARBY_LIMIT = 100
+GEOCODE_BATCH_SIZE = 500
+
+NON_WORD = re.compile(r'[^a-z0-9]+')
+
+# Stores within a radius, nearest first. The bounding box is the indexed part
+# (idx_stores_location); the haversine distance trims its corners and sorts.
+NEARBY_STORES_SQL = f"""
+    SELECT *
+    FROM (
+        SELECT s.store_id, s.name, s.address, s.city, s.phone, s.logo_url,
+               COALESCE(s.avg_rating, 0) as avg_rating,
+               s.active_product_count as product_count,
+               s.latitude, s.longitude,
+               2 * {EARTH_RADIUS_KM} * asin(sqrt(
+                   power(sin(radians(s.latitude - %s) / 2), 2)
+                   + cos(radians(%s)) * cos(radians(s.latitude)) * power(sin(radians(s.longitude - %s) / 2), 2)
+               )) as distance_km
+        FROM stores s
+        WHERE s.is_active = true
+          AND s.latitude BETWEEN %s AND %s
+          AND s.longitude BETWEEN %s AND %s
+    ) candidates
+    WHERE distance_km <= %s
+    ORDER BY distance_km, store_id
+    LIMIT %s
+"""
+
+def normalize_place(text):
+    return NON_WORD.sub(' ', (text or '').lower()).strip()
+
+@functools.lru_cache(maxsize=1)
+def load_gazetteer():
+    """{normalized place name: (latitude, longitude)} from GAZETTEER_PATH"""
+    places = {}
+    with open(GAZETTEER_PATH, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            places[normalize_place(row['name'])] = (float(row['latitude']), float(row['longitude']))
+    return places
+
+def geocode(city, address=None):
+    """(latitude, longitude) for a store's city, else the longest place named in its address; None if unknown"""
+    places = load_gazetteer()
+    location = places.get(normalize_place(city))
+    if location:
+        return location
+
+    address = f" {normalize_place(address)} "
+    for name in sorted(places, key=len, reverse=True):
+        if f" {name} " in address:
+            return places[name]
+    return None
+
+def store_location(city, address=None):
+    """(latitude, longitude) to store on a stores row; (None, None) when the place is unknown"""
+    return geocode(city, address) or (None, None)
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing the circle"""
+    lat_delta = radius_km / KM_PER_DEGREE_LATITUDE
+    lng_delta = radius_km / (KM_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - lat_delta, latitude + lat_delta, longitude - lng_delta, longitude + lng_delta
+
+def nearby_query(args):
+    """(params for NEARBY_STORES_SQL, origin) from lat/lng or a city name; ValueError for bad input"""
+    radius = args.get('radius', DEFAULT_NEARBY_RADIUS_KM, type=float)
+    limit = args.get('limit', DEFAULT_NEARBY_LIMIT, type=int)
+    if radius is None or not 0 < radius <= MAX_NEARBY_RADIUS_KM:
+        raise ValueError(f'radius must be between 0 and {MAX_NEARBY_RADIUS_KM} km')
+    limit = max(1, min(limit or DEFAULT_NEARBY_LIMIT, MAX_NEARBY_LIMIT))
+
+    latitude = args.get('lat', type=float)
+    longitude = args.get('lng', type=float)
+    if latitude is None or longitude is None:
+        if not args.get('city'):
+            raise ValueError('lat and lng (or city) are required')
+        location = geocode(args.get('city'))
+        if not location:
+            raise ValueError(f"Unknown city: {args.get('city')}")
+        latitude, longitude = location
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('lat must be within [-90, 90] and lng within [-180, 180]')
+
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius)
+    params = [latitude, latitude, longitude, min_lat, max_lat, min_lng, max_lng, radius, limit]
+    return params, {'lat': latitude, 'lng': longitude, 'radius_km': radius}
+
+def format_nearby_store(store):
+    return {
+        'store_id': store['store_id'],
+        'name': store['name'],
+        'address': store['address'],
+        'city': store['city'],
+        'phone': store['phone'],
+        'logo_url': store['logo_url'],
+        'avg_rating': float(store['avg_rating']),
+        'product_count': store['product_count'],
+        'latitude': float(store['latitude']),
+        'longitude': float(store['longitude']),
+        'distance_km': round(float(store['distance_km']), 2)
+    }
+
+def geocode_stores(all_stores=False):
+    """Fill stores.latitude/longitude from the gazetteer; returns (geocoded, unknown) counts"""
+    geocoded = unknown = 0
+    last_id = ''
+    while True:
+        with get_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT store_id, city, address
+                FROM stores
+                WHERE store_id > %s {'' if all_stores else 'AND latitude IS NULL'}
+                ORDER BY store_id
+                LIMIT %s
+            """, (last_id, GEOCODE_BATCH_SIZE))
+            stores = cursor.fetchall()
+
+            for store in stores:
+                latitude, longitude = store_location(store['city'], store['address'])
+                if latitude is None:
+                    unknown += 1
+                    continue
+                cursor.execute(
+                    "UPDATE stores SET latitude = %s, longitude = %s WHERE store_id = %s",
+                    (latitude, longitude, store['store_id'])
+                )
+                geocoded += 1
+
+        if len(stores) < GEOCODE_BATCH_SIZE:
+            return geocoded, unknown
+        last_id = stores[-1]['store_id']
+
+if __name__ == "__main__":
+    # Backfill coordinates; --all re-geocodes stores that already have them
+    geocoded, unknown = geocode_stores(all_stores='--all' in sys.argv[1:])
+    print(f"Geocoded {geocoded} stores ({unknown} with no gazetteer match)")
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from database.db import get_cursor
+from utils.storage import url_to_path
+
+# Longest edge in pixels for each rendition; images are never upscaled
+RENDITION_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1200
+}
+
+# Pillow format name, file extension and encoder options per output format
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True})
+}
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def rendition_names(base_name):
+    """{size: {format: filename}} for every rendition of an image"""
+    return {
+        size_name: {
+            format_key: f"{base_name}_{size_name}.{extension}"
+            for format_key, (_, extension, _) in RENDITION_FORMATS.items()
+        }
+        for size_name in RENDITION_SIZES
+    }
+
+def generate_renditions(image_url):
+    """Write every size/format rendition of an image next to it and return their URLs.
+
+    Renditions are named after the original, so for content-addressed uploads
+    an image that is already processed is not processed again.
+    Orientation is fixed from EXIF and then dropped together with all other
+    metadata, since the renditions are re-encoded from pixel data only.
+    Returns {'thumb': {'webp': url, 'jpeg': url}, 'card': {...}, 'detail': {...}}.
+    """
+    # Pillow is only needed by the image workers, so it is not imported at startup
+    from PIL import Image, ImageOps
+
+    source_path = url_to_path(image_url)
+    output_dir = os.path.dirname(source_path)
+    url_prefix = image_url.rsplit('/', 1)[0]
+    names = rendition_names(os.path.splitext(os.path.basename(image_url))[0])
+    renditions = {
+        size_name: {format_key: f"{url_prefix}/{filename}" for format_key, filename in formats.items()}
+        for size_name, formats in names.items()
+    }
+
+    if all(os.path.exists(os.path.join(output_dir, filename))
+           for formats in names.values() for filename in formats.values()):
+        return renditions
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            # JPEG has no alpha channel; flatten transparent PNG/WebP onto white
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+
+        for size_name, max_edge in RENDITION_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            for format_key, (pil_format, _, options) in RENDITION_FORMATS.items():
+                resized.save(os.path.join(output_dir, names[size_name][format_key]), pil_format, **options)
+
+    return renditions
+
+def process_product_image(image_id, image_url):
+    """Generate renditions for a stored product image and record them on its row"""
+    try:
+        renditions = generate_renditions(image_url)
+
+        with get_cursor() as cursor:
+            cursor.execute(
+                "UPDATE product_images SET renditions = %s::jsonb WHERE image_id = %s",
+                (json.dumps(renditions), image_id)
+            )
+        return renditions
+    except Exception as e:
+        # The original upload is still served, so a failed rendition is not fatal
+        print(f"Error generating renditions for image {image_id}: {e}")
+        return None
+
+def queue_product_image(image_id, image_url):
+    """Process an image in the background worker pool so the upload request can return"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image-worker')
+        return _executor.submit(process_product_image, image_id, image_url)
+
+def reset_image_workers():
+    """Forget a pool inherited through fork(); its threads only exist in the parent"""
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+def shutdown_image_workers(wait=True):
+    """Let queued rendition jobs finish before the process exits"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+def rendition_sql(size_name, alias='pi'):
+    """SQL expression for a rendition URL of a product_images row, falling back to the original"""
+    return f"COALESCE({alias}.renditions->'{size_name}'->>'webp', {alias}.image_url)"
+
+if __name__ == "__main__":
+    # Backfill renditions for images uploaded before the pipeline existed
+    with get_cursor() as cursor:
+        cursor.execute("SELECT image_id, image_url FROM product_images WHERE renditions IS NULL")
+        pending = cursor.fetchall()
+
+    for row in pending:
+        process_product_image(row['image_id'], row['image_url'])
+    print(f"Generated renditions for {len(pending)} images")
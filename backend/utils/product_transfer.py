@@ -0,0 +1,290 @@
+import csv
+import io
+import json
+import math
+import uuid
+from psycopg2.extras import RealDictCursor
+
+# Columns shared by import and export, so an exported file can be edited and imported again
+TRANSFER_COLUMNS = [
+    'name', 'description', 'category', 'price', 'sale_price',
+    'stock_quantity', 'is_featured', 'is_active', 'loyalty_points_earned'
+]
+
+# Valid rows are sent to COPY in batches of this many, so memory stays flat for any file size
+COPY_BATCH_SIZE = 1000
+# The report lists at most this many failed rows; the failed count is always exact
+MAX_REPORTED_ERRORS = 500
+
+# Column bounds of the staging table, checked per row so COPY never fails on a value:
+# DECIMAL(10,2) holds up to 99999999.99, INTEGER is a signed 32-bit int
+MAX_PRICE = 10 ** 8
+MAX_INTEGER = 2 ** 31 - 1
+
+IMPORT_STAGING_SQL = """
+    CREATE TEMP TABLE product_import (
+        line_number INTEGER NOT NULL,
+        product_id VARCHAR(36) NOT NULL,
+        category_id VARCHAR(36) NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        description TEXT,
+        price DECIMAL(10,2) NOT NULL,
+        sale_price DECIMAL(10,2),
+        stock_quantity INTEGER NOT NULL,
+        is_featured BOOLEAN NOT NULL,
+        is_active BOOLEAN NOT NULL,
+        loyalty_points_earned INTEGER NOT NULL
+    ) ON COMMIT DROP
+"""
+
+STAGING_COLUMNS = [
+    'line_number', 'product_id', 'category_id', 'name', 'description', 'price', 'sale_price',
+    'stock_quantity', 'is_featured', 'is_active', 'loyalty_points_earned'
+]
+
+# Rows match existing products of the store by name (case-insensitive):
+# matches are updated, everything else is inserted, both in one statement each
+IMPORT_MERGE_SQL = """
+    WITH updated AS (
+        UPDATE products p
+        SET category_id = i.category_id,
+            description = i.description,
+            price = i.price,
+            sale_price = i.sale_price,
+            stock_quantity = i.stock_quantity,
+            is_featured = i.is_featured,
+            is_active = i.is_active,
+            loyalty_points_earned = i.loyalty_points_earned,
+            date_updated = CURRENT_TIMESTAMP
+        FROM product_import i
+        WHERE p.store_id = %(store_id)s AND lower(p.name) = lower(i.name)
+        RETURNING i.line_number
+    ),
+    inserted AS (
+        INSERT INTO products (
+            product_id, store_id, category_id, name, description, price, sale_price,
+            stock_quantity, is_featured, is_active, loyalty_points_earned, date_created
+        )
+        SELECT
+            i.product_id, %(store_id)s, i.category_id, i.name, i.description, i.price, i.sale_price,
+            i.stock_quantity, i.is_featured, i.is_active, i.loyalty_points_earned, CURRENT_TIMESTAMP
+        FROM product_import i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM products p
+            WHERE p.store_id = %(store_id)s AND lower(p.name) = lower(i.name)
+        )
+        RETURNING product_id
+    )
+    SELECT
+        (SELECT COUNT(DISTINCT line_number) FROM updated) as updated,
+        (SELECT COUNT(*) FROM inserted) as inserted
+"""
+
+EXPORT_SQL = """
+    SELECT p.product_id, p.name, p.description, c.name as category, p.price, p.sale_price,
+           p.stock_quantity, p.is_featured, p.is_active, p.loyalty_points_earned
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.category_id
+    WHERE p.store_id = %s
+    ORDER BY p.date_created, p.product_id
+"""
+
+def load_category_map(cursor):
+    """{lower-cased name or id: category_id} so rows can name a category either way"""
+    cursor.execute("SELECT category_id, name FROM categories")
+    categories = {}
+    for category in cursor.fetchall():
+        categories[category['name'].strip().lower()] = category['category_id']
+        categories[category['category_id'].lower()] = category['category_id']
+    return categories
+
+def iter_rows(text_stream, file_format):
+    """Yield (line_number, row dict) from a CSV or JSON Lines stream without reading it all"""
+    if file_format == 'csv':
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text_stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, row if isinstance(row, dict) else None
+
+def _parse_bool(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ['true', '1', 'yes', 'on']
+
+def _parse_price(value):
+    """A finite price that fits DECIMAL(10,2) once rounded, else None"""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(price) or abs(round(price, 2)) >= MAX_PRICE:
+        return None
+    return price
+
+def _parse_integer(value):
+    """A whole number that fits INTEGER (empty means 0), else None"""
+    try:
+        number = int(value or 0)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return number if -MAX_INTEGER - 1 <= number <= MAX_INTEGER else None
+
+def validate_row(row, categories, seen_names):
+    """Check one import row.
+
+    Returns (staging values, []) for a valid row, or (None, [error messages]).
+    """
+    if row is None:
+        return None, ['Row is not a valid JSON object']
+
+    errors = []
+    name = str(row.get('name') or '').strip()
+    if not name:
+        errors.append('name is required')
+    elif len(name) > 255:
+        errors.append('name is longer than 255 characters')
+    elif name.lower() in seen_names:
+        errors.append(f"name duplicates line {seen_names[name.lower()]}")
+
+    category_id = categories.get(str(row.get('category') or row.get('category_id') or '').strip().lower())
+    if not category_id:
+        errors.append('category does not exist')
+
+    price = _parse_price(row.get('price'))
+    if price is None:
+        errors.append(f'price must be a number below {MAX_PRICE}')
+    elif price <= 0:
+        errors.append('price must be greater than 0')
+
+    sale_price = row.get('sale_price')
+    if sale_price in (None, ''):
+        sale_price = None
+    else:
+        sale_price = _parse_price(sale_price)
+        if sale_price is None:
+            errors.append(f'sale_price must be a number below {MAX_PRICE}')
+        elif sale_price < 0:
+            errors.append('sale_price cannot be negative')
+        elif price is not None and sale_price >= price:
+            errors.append('sale_price must be less than price')
+
+    stock_quantity = _parse_integer(row.get('stock_quantity'))
+    if stock_quantity is None:
+        errors.append(f'stock_quantity must be a whole number up to {MAX_INTEGER}')
+    elif stock_quantity < 0:
+        errors.append('stock_quantity cannot be negative')
+
+    loyalty_points_earned = _parse_integer(row.get('loyalty_points_earned'))
+    if loyalty_points_earned is None:
+        errors.append(f'loyalty_points_earned must be a whole number up to {MAX_INTEGER}')
+
+    if errors:
+        return None, errors
+
+    return [
+        str(uuid.uuid4()), category_id, name, str(row.get('description') or '').strip() or None,
+        price, sale_price, stock_quantity,
+        _parse_bool(row.get('is_featured'), False), _parse_bool(row.get('is_active'), True),
+        loyalty_points_earned
+    ], []
+
+def _copy_batch(cursor, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY product_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+def import_products(cursor, store_id, text_stream, file_format):
+    """Validate rows as they are read, COPY the valid ones into a staging table and merge.
+
+    Runs in the caller's transaction. Returns a report:
+    {'inserted', 'updated', 'failed', 'errors': [{'line', 'errors'}]}.
+    """
+    categories = load_category_map(cursor)
+    cursor.execute(IMPORT_STAGING_SQL)
+
+    seen_names = {}
+    batch = []
+    failed = 0
+    errors = []
+
+    for line_number, row in iter_rows(text_stream, file_format):
+        values, row_errors = validate_row(row, categories, seen_names)
+        if row_errors:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line_number, 'errors': row_errors})
+            continue
+
+        seen_names[values[2].lower()] = line_number
+        # COPY csv reads an empty unquoted field as NULL
+        batch.append([line_number] + ['' if value is None else value for value in values])
+        if len(batch) >= COPY_BATCH_SIZE:
+            _copy_batch(cursor, batch)
+            batch = []
+
+    if batch:
+        _copy_batch(cursor, batch)
+
+    cursor.execute(IMPORT_MERGE_SQL, {'store_id': store_id})
+    counts = cursor.fetchone()
+
+    return {
+        'inserted': counts['inserted'],
+        'updated': counts['updated'],
+        'failed': failed,
+        'errors': errors
+    }
+
+def export_rows(connection, store_id, itersize=COPY_BATCH_SIZE):
+    """Yield a store's products from a server-side cursor, `itersize` rows per round trip"""
+    cursor = connection.cursor(name=f"product_export_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+    cursor.itersize = itersize
+    try:
+        cursor.execute(EXPORT_SQL, (store_id,))
+        for product in cursor:
+            yield product
+    finally:
+        cursor.close()
+
+def format_export_row(product, file_format):
+    """One exported product as a CSV or JSON Lines line"""
+    values = {
+        'product_id': product['product_id'],
+        **{column: product[column] for column in TRANSFER_COLUMNS}
+    }
+    for column in ('price', 'sale_price'):
+        if values[column] is not None:
+            values[column] = float(values[column])
+
+    if file_format == 'jsonl':
+        return json.dumps(values) + '\n'
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([
+        '' if values[column] is None else values[column]
+        for column in ['product_id'] + TRANSFER_COLUMNS
+    ])
+    return buffer.getvalue()
+
+def export_header(file_format):
+    if file_format == 'jsonl':
+        return ''
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(['product_id'] + TRANSFER_COLUMNS)
+    return buffer.getvalue()
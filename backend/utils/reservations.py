@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+import uuid
+from database.db import get_cursor
+
+# How long a checkout hold keeps stock aside, and how the expiry sweeper batches its work
+RESERVATION_TTL_MINUTES = int(os.getenv('RESERVATION_TTL_MINUTES', '15'))
+SWEEP_BATCH_SIZE = int(os.getenv('RESERVATION_SWEEP_BATCH_SIZE', '500'))
+SWEEP_INTERVAL_SECONDS = int(os.getenv('RESERVATION_SWEEP_INTERVAL', '60'))
+
+# products.reserved_quantity is the maintained sum of active holds per product,
+# so available stock is always stock_quantity - reserved_quantity without a SUM
+AVAILABLE_STOCK_SQL = "GREATEST(p.stock_quantity - p.reserved_quantity, 0)"
+
+def release_user_reservations(cursor, user_id):
+    """Drop all holds for a user and give their quantity back to the products.
+
+    Returns {product_id: quantity} of what was released.
+    """
+    cursor.execute("""
+        WITH released AS (
+            DELETE FROM stock_reservations
+            WHERE user_id = %s
+            RETURNING product_id, quantity
+        ),
+        per_product AS (
+            SELECT product_id, SUM(quantity) as quantity
+            FROM released
+            GROUP BY product_id
+        )
+        UPDATE products p
+        SET reserved_quantity = GREATEST(p.reserved_quantity - per_product.quantity, 0)
+        FROM per_product
+        WHERE p.product_id = per_product.product_id
+        RETURNING p.product_id, per_product.quantity
+    """, (user_id,))
+    return {row['product_id']: row['quantity'] for row in cursor.fetchall()}
+
+def reserve_cart(cursor, user_id, cart_id, ttl_minutes=None):
+    """Hold stock for every line of a cart, replacing any holds the user already has.
+
+    All-or-nothing: returns (True, expires_at) when every line was reserved,
+    otherwise (False, [product names that are short]) and the caller should roll back.
+    """
+    ttl_minutes = ttl_minutes or RESERVATION_TTL_MINUTES
+    release_user_reservations(cursor, user_id)
+
+    cursor.execute("SELECT COUNT(*) as line_count FROM cart_items WHERE cart_id = %s", (cart_id,))
+    line_count = cursor.fetchone()['line_count']
+
+    cursor.execute("""
+        WITH reserved AS (
+            UPDATE products p
+            SET reserved_quantity = p.reserved_quantity + ci.quantity
+            FROM cart_items ci
+            WHERE ci.cart_id = %(cart_id)s
+              AND ci.product_id = p.product_id
+              AND p.is_active = true
+              AND p.stock_quantity - p.reserved_quantity >= ci.quantity
+            RETURNING p.product_id, ci.quantity
+        )
+        INSERT INTO stock_reservations (reservation_id, user_id, product_id, quantity, expires_at)
+        SELECT
+            (%(reservation_ids)s::varchar[])[row_number() OVER (ORDER BY product_id)],
+            %(user_id)s, product_id, quantity,
+            CURRENT_TIMESTAMP + make_interval(mins => %(ttl)s)
+        FROM reserved
+        RETURNING expires_at
+    """, {
+        'cart_id': cart_id,
+        'user_id': user_id,
+        'ttl': ttl_minutes,
+        'reservation_ids': [str(uuid.uuid4()) for _ in range(line_count)]
+    })
+    reserved = cursor.fetchall()
+
+    if len(reserved) == line_count:
+        return True, (reserved[0]['expires_at'] if reserved else None)
+
+    cursor.execute("""
+        SELECT p.name
+        FROM cart_items ci
+        JOIN products p ON ci.product_id = p.product_id
+        LEFT JOIN stock_reservations r ON r.user_id = %s AND r.product_id = p.product_id
+        WHERE ci.cart_id = %s AND r.reservation_id IS NULL
+    """, (user_id, cart_id))
+    return False, [row['name'] for row in cursor.fetchall()]
+
+def sweep_expired_reservations(batch_size=None):
+    """Release expired holds in batches, one short transaction per batch.
+
+    SKIP LOCKED lets several sweepers (or a sweeper and a checkout) run side by side.
+    Returns the number of holds released.
+    """
+    batch_size = batch_size or SWEEP_BATCH_SIZE
+    total = 0
+
+    while True:
+        with get_cursor() as cursor:
+            cursor.execute("""
+                WITH expired AS (
+                    DELETE FROM stock_reservations
+                    WHERE reservation_id IN (
+                        SELECT reservation_id
+                        FROM stock_reservations
+                        WHERE expires_at < CURRENT_TIMESTAMP
+                        ORDER BY expires_at
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING product_id, quantity
+                ),
+                per_product AS (
+                    SELECT product_id, SUM(quantity) as quantity, COUNT(*) as holds
+                    FROM expired
+                    GROUP BY product_id
+                ),
+                updated AS (
+                    UPDATE products p
+                    SET reserved_quantity = GREATEST(p.reserved_quantity - per_product.quantity, 0)
+                    FROM per_product
+                    WHERE p.product_id = per_product.product_id
+                )
+                SELECT COALESCE(SUM(holds), 0) as released FROM per_product
+            """, (batch_size,))
+            released = int(cursor.fetchone()['released'])
+
+        total += released
+        if released < batch_size:
+            return total
+
+def start_reservation_sweeper(interval=None):
+    """Run sweep_expired_reservations() every `interval` seconds in a daemon thread"""
+    interval = interval or SWEEP_INTERVAL_SECONDS
+
+    def run():
+        while True:
+            try:
+                released = sweep_expired_reservations()
+                if released:
+                    print(f"Released {released} expired stock reservations")
+            except Exception as e:
+                print(f"Reservation sweep failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='reservation-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    print(f"Released {sweep_expired_reservations()} expired stock reservations")
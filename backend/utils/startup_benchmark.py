@@ -0,0 +1,50 @@
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold start (fresh interpreter, import app, create_app()) must stay under this
+STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '800'))
+RUNS = int(os.getenv('STARTUP_BENCHMARK_RUNS', '5'))
+
+# A non-routable address: if startup tried to connect it would hang until the
+# timeout and blow the budget, so passing also proves startup never touches the DB
+UNREACHABLE_DB = {'DB_HOST': '10.255.255.1', 'DB_PORT': '5432', 'PGCONNECT_TIMEOUT': '10'}
+
+MEASURE_SNIPPET = """
+import time
+started = time.perf_counter()
+from app import create_app
+create_app({mode!r})
+print((time.perf_counter() - started) * 1000)
+"""
+
+def measure_startup(mode, runs=RUNS):
+    """Milliseconds for each of `runs` cold starts in a fresh interpreter"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, **UNREACHABLE_DB, 'PYTHONDONTWRITEBYTECODE': '1'}
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', MEASURE_SNIPPET.format(mode=mode)],
+            cwd=backend_dir, env=env, capture_output=True, text=True, timeout=60
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"create_app({mode!r}) failed:\n{result.stderr}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+def run_benchmark(budget_ms=STARTUP_BUDGET_MS):
+    """Measure eager and lazy startup; returns True when both medians are within budget"""
+    within_budget = True
+    for mode in ('eager', 'lazy'):
+        timings = measure_startup(mode)
+        median = statistics.median(timings)
+        verdict = 'ok' if median <= budget_ms else 'OVER BUDGET'
+        print(f"{mode:<6} median {median:7.1f} ms  (min {min(timings):.1f}, max {max(timings):.1f}, "
+              f"budget {budget_ms:.0f} ms)  {verdict}")
+        within_budget = within_budget and median <= budget_ms
+    return within_budget
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
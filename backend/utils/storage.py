@@ -0,0 +1,250 @@
+import glob
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from database.db import get_cursor
+
+UPLOADS_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
+PRODUCTS_FOLDER = os.path.join(UPLOADS_ROOT, 'products')
+PRODUCTS_URL = '/uploads/products'
+
+CHUNK_SIZE = 64 * 1024
+
+# Orphans are kept for a while so an upload that dedupes onto a just-orphaned
+# file cannot lose it to a concurrent sweep
+ORPHAN_GRACE_HOURS = int(os.getenv('ORPHAN_GRACE_HOURS', '24'))
+GC_BATCH_SIZE = int(os.getenv('STORAGE_GC_BATCH_SIZE', '200'))
+GC_INTERVAL_SECONDS = int(os.getenv('STORAGE_GC_INTERVAL', '3600'))
+
+def url_to_path(file_url):
+    """Map a /uploads/... URL to its file on disk"""
+    relative = file_url.split('/uploads/', 1)[-1]
+    return os.path.join(UPLOADS_ROOT, *relative.split('/'))
+
+def normalize_extension(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    return 'jpg' if extension == 'jpeg' else extension
+
+def shard_dir(content_hash):
+    """Two levels of 256-way sharding keep directories small: ab/cd/abcd...."""
+    return os.path.join(PRODUCTS_FOLDER, content_hash[:2], content_hash[2:4])
+
+def content_url(content_hash, extension):
+    return f"{PRODUCTS_URL}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.{extension}"
+
+def existing_content_path(content_hash):
+    """Path of an already stored file with this hash, whatever its extension"""
+    matches = glob.glob(os.path.join(shard_dir(content_hash), f"{content_hash}.*"))
+    return matches[0] if matches else None
+
+def make_temp_upload():
+    """Open a temp file on the same filesystem as the store, so commit is a rename"""
+    os.makedirs(PRODUCTS_FOLDER, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=PRODUCTS_FOLDER, prefix='.upload-')
+    return os.fdopen(fd, 'w+b'), temp_path
+
+def lock_content_hash(cursor, content_hash):
+    """Serialize uploads and GC of one hash until the cursor's transaction ends"""
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (content_hash,))
+
+def commit_temp_upload(temp_path, content_hash, size_bytes, extension):
+    """Move a fully written and hashed temp file into content-addressed storage.
+
+    The temp file is dropped instead if that content is already stored. The
+    file is checked and registered in stored_files under the hash lock, so GC
+    cannot remove it between the dedupe and the registration.
+    Returns {'content_hash', 'url', 'size_bytes', 'deduplicated'}.
+    """
+    try:
+        with get_cursor() as cursor:
+            lock_content_hash(cursor, content_hash)
+            existing = existing_content_path(content_hash)
+
+            if existing:
+                os.remove(temp_path)
+                extension = existing.rsplit('.', 1)[-1]
+            else:
+                os.makedirs(shard_dir(content_hash), exist_ok=True)
+                os.replace(temp_path, os.path.join(shard_dir(content_hash), f"{content_hash}.{extension}"))
+
+            stored = {
+                'content_hash': content_hash,
+                'url': content_url(content_hash, extension),
+                'size_bytes': size_bytes,
+                'deduplicated': existing is not None
+            }
+            register_stored_file(cursor, stored)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return stored
+
+def store_stream(stream, extension):
+    """Copy a stream to content-addressed storage, hashing it on the way"""
+    digest = hashlib.sha256()
+    size_bytes = 0
+
+    temp_file, temp_path = make_temp_upload()
+    try:
+        with temp_file:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp_file.write(chunk)
+                size_bytes += len(chunk)
+
+        return commit_temp_upload(temp_path, digest.hexdigest(), size_bytes, extension)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def register_stored_file(cursor, stored):
+    """Record a stored file so product_images rows can reference it.
+
+    An unreferenced file stays orphaned, with its grace period restarted, until
+    a product_images row commits; ref_count is maintained by the product_images
+    trigger in the schema.
+    """
+    cursor.execute("""
+        INSERT INTO stored_files (content_hash, file_url, size_bytes, ref_count, orphaned_at)
+        VALUES (%s, %s, %s, 0, CURRENT_TIMESTAMP)
+        ON CONFLICT (content_hash) DO UPDATE
+        SET orphaned_at = CASE WHEN stored_files.ref_count <= 0 THEN CURRENT_TIMESTAMP END
+    """, (stored['content_hash'], stored['url'], stored['size_bytes']))
+
+def remove_stored_files(content_hash):
+    """Delete a stored file and all of its renditions from disk"""
+    for path in glob.glob(os.path.join(shard_dir(content_hash), f"{content_hash}*")):
+        os.remove(path)
+
+def remove_unregistered_files(content_hash):
+    """Delete a collected hash's files, unless an upload registered it again meanwhile"""
+    with get_cursor() as cursor:
+        lock_content_hash(cursor, content_hash)
+        cursor.execute("SELECT 1 FROM stored_files WHERE content_hash = %s", (content_hash,))
+        if cursor.fetchone():
+            return False
+        remove_stored_files(content_hash)
+        return True
+
+def collect_orphans(batch_size=None, grace_hours=None):
+    """Delete files no product_images row references any more, in batches.
+
+    Rows are claimed with SKIP LOCKED and their deletion commits first; the
+    files go afterwards, each under the hash lock uploads take, so a rollback
+    never leaves a row without its file and a concurrent dedupe keeps its file.
+    A crash between the two can leak a file, never break an image.
+    Returns the number of files removed.
+    """
+    batch_size = batch_size or GC_BATCH_SIZE
+    grace_hours = ORPHAN_GRACE_HOURS if grace_hours is None else grace_hours
+    total = 0
+
+    while True:
+        with get_cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM stored_files
+                WHERE content_hash IN (
+                    SELECT content_hash
+                    FROM stored_files
+                    WHERE ref_count <= 0
+                      AND orphaned_at < CURRENT_TIMESTAMP - make_interval(hours => %s)
+                    ORDER BY orphaned_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING content_hash
+            """, (grace_hours, batch_size))
+            orphans = cursor.fetchall()
+
+        for orphan in orphans:
+            if remove_unregistered_files(orphan['content_hash']):
+                total += 1
+
+        if len(orphans) < batch_size:
+            return total
+
+def start_storage_gc(interval=None):
+    """Run collect_orphans() every `interval` seconds in a daemon thread.
+
+    Deleting product images only marks their files orphaned; this is what
+    actually frees the disk space once the grace period has passed.
+    """
+    interval = interval or GC_INTERVAL_SECONDS
+
+    def run():
+        while True:
+            try:
+                removed = collect_orphans()
+                if removed:
+                    print(f"Removed {removed} orphaned upload files")
+            except Exception as e:
+                print(f"Storage GC failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='storage-gc', daemon=True)
+    thread.start()
+    return thread
+
+def backfill_legacy_uploads():
+    """Move uuid-named uploads into content-addressed storage and repoint product_images.
+
+    Duplicate uploads collapse onto one file; the old copies are deleted.
+    Returns (images updated, files removed).
+    """
+    with get_cursor() as cursor:
+        cursor.execute("""
+            SELECT image_id, image_url, renditions
+            FROM product_images
+            WHERE content_hash IS NULL AND image_url LIKE %s
+        """, (f"{PRODUCTS_URL}/%",))
+        legacy_images = cursor.fetchall()
+
+    updated = 0
+    legacy_paths = set()
+    for image in legacy_images:
+        legacy_path = os.path.join(PRODUCTS_FOLDER, os.path.basename(image['image_url']))
+        if not os.path.isfile(legacy_path):
+            continue
+
+        with open(legacy_path, 'rb') as legacy_file:
+            stored = store_stream(legacy_file, normalize_extension(legacy_path))
+
+        with get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE product_images
+                SET image_url = %s, content_hash = %s, renditions = NULL
+                WHERE image_id = %s
+            """, (stored['url'], stored['content_hash'], image['image_id']))
+
+        legacy_paths.add(legacy_path)
+        for formats in (image['renditions'] or {}).values():
+            legacy_paths.update(url_to_path(url) for url in formats.values())
+        updated += 1
+
+    removed = 0
+    for legacy_path in legacy_paths:
+        if os.path.isfile(legacy_path):
+            os.remove(legacy_path)
+            removed += 1
+
+    return updated, removed
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'gc'
+    if command == 'gc':
+        print(f"Removed {collect_orphans()} orphaned files")
+    elif command == 'backfill':
+        updated, removed = backfill_legacy_uploads()
+        print(f"Moved {updated} images to content-addressed storage, removed {removed} legacy files")
+    else:
+        print("Usage: python -m utils.storage [gc|backfill]")
+        sys.exit(1)
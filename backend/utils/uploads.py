@@ -0,0 +1,277 @@
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+from functools import wraps
+from flask import Request, abort, jsonify, make_response, request, send_file
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.security import safe_join
+from utils.storage import UPLOADS_ROOT, commit_temp_upload, make_temp_upload
+
+# How upload bytes leave the process:
+#   'none'       - Werkzeug streams the file (via wsgi.file_wrapper, i.e. sendfile() under gunicorn)
+#   'x-sendfile' - Apache/lighttpd send the file named in the X-Sendfile header
+#   'x-accel'    - nginx sends the file from the internal location in X-Accel-Redirect
+UPLOADS_OFFLOAD = os.getenv('UPLOADS_OFFLOAD', 'none').lower()
+X_ACCEL_PREFIX = os.getenv('UPLOADS_X_ACCEL_PREFIX', '/protected-uploads')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+# <sha256>.<ext> or <sha256>_<rendition>.<ext>, as written by utils/storage.py and utils/images.py
+CONTENT_ADDRESSED_NAME = re.compile(r'^(?P<hash>[0-9a-f]{64})(_[a-z]+)?\.[a-z0-9]+$')
+
+MANIFEST_PATH = os.path.join(UPLOADS_ROOT, 'manifest.json')
+
+# Leading bytes of each accepted image type; WebP is RIFF....WEBP
+IMAGE_SIGNATURES = {
+    'jpg': ((0, b'\xff\xd8\xff'),),
+    'png': ((0, b'\x89PNG\r\n\x1a\n'),),
+    'webp': ((0, b'RIFF'), (8, b'WEBP'))
+}
+IMAGE_TYPES = frozenset(IMAGE_SIGNATURES)
+SNIFF_BYTES = 12
+
+# Room for the non-file form fields and multipart boundaries on top of a route's file limit
+MULTIPART_OVERHEAD = 64 * 1024
+
+def format_size(size_bytes):
+    """A byte limit for error messages: whole MB, else KB, else bytes"""
+    for unit, scale in (('MB', 1024 * 1024), ('KB', 1024)):
+        if size_bytes >= scale:
+            size = size_bytes / scale
+            return f"{size:.0f}{unit}" if size == int(size) else f"{size:.1f}{unit}"
+    return f"{size_bytes} bytes"
+
+def content_hash_of(relative_path):
+    """The SHA-256 a content-addressed file is named after, or None for legacy names"""
+    match = CONTENT_ADDRESSED_NAME.match(os.path.basename(relative_path))
+    return match.group('hash') if match else None
+
+def cache_headers(relative_path):
+    """Cache-Control and a strong ETag (where the name gives one) for an upload"""
+    content_hash = content_hash_of(relative_path)
+    if not content_hash:
+        return DEFAULT_CACHE_CONTROL, None
+
+    # Renditions share the original's hash, so the ETag is the whole file name
+    return IMMUTABLE_CACHE_CONTROL, os.path.basename(relative_path)
+
+def send_upload(relative_path):
+    """Serve a file below uploads/ with caching, conditional and range support"""
+    path = safe_join(UPLOADS_ROOT, relative_path)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    cache_control, etag = cache_headers(relative_path)
+
+    if UPLOADS_OFFLOAD == 'x-accel':
+        # nginx answers conditional and range requests itself
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{X_ACCEL_PREFIX}/{relative_path}"
+        response.headers['Content-Type'] = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if etag:
+            response.headers['ETag'] = f'"{etag}"'
+    else:
+        # conditional=True handles If-None-Match/If-Modified-Since (304) and Range (206)
+        response = send_file(path, conditional=True, etag=etag or True)
+
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def sniff_image_type(head):
+    """Image type ('jpg', 'png', 'webp') from a file's first bytes, or None"""
+    for image_type, signature in IMAGE_SIGNATURES.items():
+        if all(head[offset:offset + len(magic)] == magic for offset, magic in signature):
+            return image_type
+    return None
+
+class UploadStream:
+    """Temp file a multipart file part is streamed into as Werkzeug parses the body.
+
+    Every chunk is counted, hashed and written straight to disk, so an upload
+    is never held in memory and is never read twice. The first bytes are
+    sniffed, and an oversized or wrongly typed file aborts the parse before
+    the rest of the body is read.
+    """
+
+    def __init__(self, max_bytes, allowed_types=None):
+        self.max_bytes = max_bytes
+        self.allowed_types = allowed_types
+        self.digest = hashlib.sha256()
+        self.size_bytes = 0
+        self.image_type = None
+        self.head = b''
+        self.committed = False
+        self.file, self.temp_path = make_temp_upload()
+
+    def write(self, data):
+        self.size_bytes += len(data)
+        if self.size_bytes > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(f"File is larger than {format_size(self.max_bytes)}")
+
+        if self.allowed_types and len(self.head) < SNIFF_BYTES:
+            self.head += data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self.check_type()
+
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def check_type(self):
+        self.image_type = sniff_image_type(self.head)
+        if self.image_type not in self.allowed_types:
+            self.discard()
+            raise UnsupportedMediaType(f"Only {', '.join(sorted(self.allowed_types))} images are allowed")
+
+    def commit(self, extension=None):
+        """Move the upload into content-addressed storage; see storage.commit_temp_upload()"""
+        if self.allowed_types and self.image_type is None:
+            # Shorter than SNIFF_BYTES, so never sniffed while streaming
+            self.check_type()
+
+        self.file.close()
+        self.committed = True
+        return commit_temp_upload(self.temp_path, self.digest.hexdigest(), self.size_bytes,
+                                  self.image_type or extension or 'bin')
+
+    def discard(self):
+        self.file.close()
+        if not self.committed and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def close(self):
+        # Called by Request.close() at the end of every request, so uncommitted uploads never linger
+        self.discard()
+
+    def __getattr__(self, name):
+        # seek/read/tell etc. go to the temp file, as FileStorage expects a file object
+        return getattr(self.file, name)
+
+class UploadRequest(Request):
+    """Request that streams file parts into UploadStream on routes using @stream_uploads"""
+
+    upload_limit = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Every stream of this request, including parts of a body whose parse was
+        # aborted and that therefore never reached request.files
+        self.upload_streams = []
+
+    @property
+    def max_content_length(self):
+        # Per-route MAX_CONTENT_LENGTH; Werkzeug also applies it to chunked bodies
+        if self.upload_limit:
+            return self.upload_limit[0] + MULTIPART_OVERHEAD
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not self.upload_limit:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = UploadStream(*self.upload_limit)
+        self.upload_streams.append(stream)
+        return stream
+
+    def discard_uploads(self):
+        """Remove the temp files of all uncommitted uploads of this request"""
+        for stream in self.upload_streams:
+            stream.discard()
+
+    def close(self):
+        # Flask calls this when the request ends, aborted parse or not
+        try:
+            super().close()
+        finally:
+            self.discard_uploads()
+
+def stream_uploads(max_bytes, allowed_types=IMAGE_TYPES):
+    """Limit and stream the multipart uploads of a route.
+
+    A declared Content-Length over the limit is refused before any of the body
+    is read; otherwise the form is parsed here, through UploadStream, so a
+    rejected file ends the request as soon as it is detected.
+    Pass allowed_types=None to accept any file type.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.mimetype == 'multipart/form-data':
+                request.upload_limit = (max_bytes, allowed_types)
+                try:
+                    if request.content_length and request.content_length > request.max_content_length:
+                        raise RequestEntityTooLarge(f"Upload is larger than {format_size(max_bytes)}")
+                    request.files
+                except HTTPException as e:
+                    # Parts streamed before the rejected one are not in request.files
+                    request.discard_uploads()
+                    return jsonify({
+                        'success': False,
+                        'message': e.description
+                    }), e.code
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def build_manifest():
+    """Describe every upload so a front proxy can serve them without calling Python.
+
+    Returns {relative_path: {'size', 'content_type', 'etag', 'cache_control'}}.
+    """
+    manifest = {}
+    for root, _, files in os.walk(UPLOADS_ROOT):
+        for filename in files:
+            if filename.startswith('.') or filename == os.path.basename(MANIFEST_PATH):
+                continue
+
+            path = os.path.join(root, filename)
+            relative_path = os.path.relpath(path, UPLOADS_ROOT).replace(os.sep, '/')
+            cache_control, etag = cache_headers(relative_path)
+            manifest[relative_path] = {
+                'size': os.path.getsize(path),
+                'content_type': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                'etag': etag,
+                'cache_control': cache_control
+            }
+    return manifest
+
+def nginx_config():
+    """nginx locations that serve uploads straight from disk with the same headers as send_upload()"""
+    return f"""# Generated by: python -m utils.uploads nginx
+location ~ "^/uploads/(.*/)?[0-9a-f]{{64}}(_[a-z]+)?\\.[a-z0-9]+$" {{
+    root {os.path.dirname(UPLOADS_ROOT)};
+    add_header Cache-Control "{IMMUTABLE_CACHE_CONTROL}";
+    etag on;
+    sendfile on;
+}}
+
+location /uploads/ {{
+    root {os.path.dirname(UPLOADS_ROOT)};
+    add_header Cache-Control "{DEFAULT_CACHE_CONTROL}";
+    etag on;
+    sendfile on;
+}}
+
+# Used when UPLOADS_OFFLOAD=x-accel
+location {X_ACCEL_PREFIX}/ {{
+    internal;
+    alias {UPLOADS_ROOT}/;
+    sendfile on;
+}}
+"""
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'manifest'
+    if command == 'manifest':
+        manifest = build_manifest()
+        with open(MANIFEST_PATH, 'w') as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        print(f"Wrote {len(manifest)} entries to {MANIFEST_PATH}")
+    elif command == 'nginx':
+        print(nginx_config())
+    else:
+        print("Usage: python -m utils.uploads [manifest|nginx]")
+        sys.exit(1)
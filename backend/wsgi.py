@@ -0,0 +1,9 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+`python app.py` remains the single-process development server.
+"""
+from app import create_app
+
+app = create_app()
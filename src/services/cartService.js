@@ -11,6 +11,16 @@ export const cartService = {
     }
   },
 
+  // Get cart item count and total without item rows
+  getCartSummary: async () => {
+    try {
+      const response = await apiClient.get('/cart/', { params: { summary: true } });
+      return response.data;
+    } catch (error) {
+      throw error.response ? error.response.data : error;
+    }
+  },
+
   // Add item to cart
   addToCart: async (productId, quantity = 1) => {
     try {
@@ -24,6 +34,27 @@ export const cartService = {
     }
   },
 
+  // Apply many set/increment/remove operations in one request
+  // operations: [{ product_id, op: 'set' | 'increment' | 'remove', quantity }]
+  applyCartOperations: async (operations) => {
+    try {
+      const response = await apiClient.patch('/cart/items', { operations });
+      return response.data;
+    } catch (error) {
+      throw error.response ? error.response.data : error;
+    }
+  },
+
+  // Merge a guest (localStorage) cart into the server cart at login
+  mergeGuestCart: async (guestItems) => {
+    const operations = guestItems.map(item => ({
+      product_id: item.product_id,
+      op: 'increment',
+      quantity: item.quantity
+    }));
+    return cartService.applyCartOperations(operations);
+  },
+
   // Update cart item quantity
   updateCartItem: async (cartItemId, quantity) => {
     try {
@@ -56,6 +87,26 @@ export const cartService = {
     }
   },
 
+  // Reserve stock for the cart while the user pays
+  beginCheckout: async () => {
+    try {
+      const response = await apiClient.post('/cart/checkout/begin');
+      return response.data;
+    } catch (error) {
+      throw error.response ? error.response.data : error;
+    }
+  },
+
+  // Place orders for everything in the cart (one order per store)
+  checkout: async (shippingDetails) => {
+    try {
+      const response = await apiClient.post('/cart/checkout', shippingDetails);
+      return response.data;
+    } catch (error) {
+      throw error.response ? error.response.data : error;
+    }
+  },
+
   // Get cart item count
   getCartCount: async () => {
     try {